@@ -1,10 +1,12 @@
-import pandas as pd
-import json
-import sqlite3
+import os
 import pyotp
-import requests
+import argparse
 from datetime import datetime
 from SmartApi.smartConnect import SmartConnect
+from SmartApi.snapshotPipeline import SnapshotPipeline
+from SmartApi.snapshotDaemon import QuoteClient, SnapshotDaemon, TradingCalendar
+from SmartApi.historyStore import HistoryStore, history_store_available
+from SmartApi.instrumentMaster import load_instrument_master
 
 # --- CONFIG ---
 api_key = "inWmCiU4"
@@ -15,59 +17,22 @@ X_ClientLocalIP = "192.168.1.3"
 X_ClientPublicIP = "2402:a00:405:3f5d:dd2d:1e1:9780:1dcd"
 X_MACAddress = "1a:8d:23:71:5e:7f"
 SCRIPTMASTER_FILE = "OpenAPIScripMaster.json"
+INSTRUMENT_CACHE_DIR = "instrument_master_file"  # converted once a day from SCRIPTMASTER_FILE
+# Only the cash and stock derivative rows are kept, so the daily conversion fits small workers
+INSTRUMENT_FILTERS = {"exch_seg": ("NSE", "NFO"), "instrumenttype": ("", "FUTSTK", "OPTSTK")}
 DB_FILE = "/Users/rahul/Downloads/smartapi_python/market_data.db"
+HISTORY_DIR = "/Users/rahul/Downloads/smartapi_python/history"
 BATCH_SIZE = 40
+HOLIDAYS_FILE = "nse_holidays.txt"  # one YYYY-MM-DD per line; weekends are always closed
+FETCH_WORKERS = 4
+DECODE_WORKERS = 1
 
 # --- FUNCTIONS ---
 def fetch_token_batches():
-    with open(SCRIPTMASTER_FILE, "r") as f:
-        data = json.load(f)
-    df = pd.DataFrame(data)
-    
-    fno_df = df[
-        (df['exch_seg'] == 'NFO') &
-        (df['instrumenttype'].isin(['FUTSTK', 'OPTSTK']))
-    ]
-    fno_names = fno_df['name'].dropna().unique()
-
-    nse_df = df[
-        (df['exch_seg'] == 'NSE') &
-        (df['name'].isin(fno_names))
-    ][['name', 'symbol', 'token']].drop_duplicates().sort_values('name')
-
-    nse_df['symbol'] = nse_df['symbol'].str.replace('-EQ', '', regex=False).str.strip()
-    tokens = [str(token) for token in nse_df['token'].dropna()]
+    master = load_instrument_master(INSTRUMENT_CACHE_DIR, SCRIPTMASTER_FILE, **INSTRUMENT_FILTERS)
+    tokens = master.fno_underlying_tokens()
     return [tokens[i:i + BATCH_SIZE] for i in range(0, len(tokens), BATCH_SIZE)]
 
-def initialize_database():
-    conn = sqlite3.connect(DB_FILE)
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS market_data (
-            symbol TEXT,
-            date TEXT,
-            buy_sell_volume_percent TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
-
-def save_to_database(symbol, date, buy_percent, sell_percent):
-    try:
-        conn = sqlite3.connect(DB_FILE)
-        cursor = conn.cursor()
-        volume_percent = f"{buy_percent}/{sell_percent}"
-        cursor.execute('''
-            INSERT INTO market_data (symbol, date, buy_sell_volume_percent)
-            VALUES (?, ?, ?)
-        ''', (symbol, date, volume_percent))
-        conn.commit()
-        conn.close()
-        return True
-    except Exception as e:
-        print(f"❌ DB Error saving {symbol}: {e}")
-        return False
-
 def generate_new_session(smart_api):
     try:
         totp = pyotp.TOTP(totp_key).now()
@@ -79,13 +44,8 @@ def generate_new_session(smart_api):
         print(f"❌ Session error: {e}")
     return None
 
-def process_batch(token_batch, jwt_token):
-    url = "https://apiconnect.angelone.in/rest/secure/angelbroking/market/v1/quote/"
-    payload = {
-        "mode": "FULL",
-        "exchangeTokens": {"NSE": token_batch}
-    }
-    headers = {
+def quote_headers():
+    return {
         'X-PrivateKey': api_key,
         'Accept': 'application/json',
         'X-SourceID': 'WEB',
@@ -93,58 +53,60 @@ def process_batch(token_batch, jwt_token):
         'X-ClientPublicIP': X_ClientPublicIP,
         'X-MACAddress': X_MACAddress,
         'X-UserType': 'USER',
-        'Authorization': jwt_token,
         'Content-Type': 'application/json'
     }
-    try:
-        response = requests.post(url, headers=headers, json=payload, timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Request error: {e}")
-    return None
 
-def clean_symbol(symbol):
-    return symbol.replace("-EQ", "") if symbol.endswith("-EQ") else symbol
+def run_daemon(smart_api, token_batches, interval):
+    calendar = TradingCalendar.from_file(HOLIDAYS_FILE) if os.path.exists(HOLIDAYS_FILE) else TradingCalendar()
+    client = QuoteClient(lambda: generate_new_session(smart_api), quote_headers(), pool_size=FETCH_WORKERS)
+    history_store = HistoryStore(HISTORY_DIR) if history_store_available() else None
+    daemon = SnapshotDaemon(client, token_batches, DB_FILE, interval=interval, calendar=calendar,
+                            workers=FETCH_WORKERS, decode_workers=DECODE_WORKERS, history_store=history_store)
+    print(f"🕒 Snapshotting {sum(len(batch) for batch in token_batches)} tokens every {interval}s during market hours (Ctrl+C to stop)")
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        daemon.stop()
+    finally:
+        client.close()
+    stats = daemon.stats()
+    print(f"\n🎯 {stats['cycles_run']} snapshots, {stats['cycles_skipped']} skipped, {stats['rows_written']} rows saved.")
+    if stats['bottleneck']:
+        print(f"⏱️ Mean cycle {stats['mean_cycle_seconds']:.2f}s, slowest stage: {stats['bottleneck']}.")
 
 # --- MAIN ---
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Snapshot the buy/sell quantities of the F&O universe")
+    parser.add_argument("--every", type=int, metavar="SECONDS",
+                        help="keep running and take a snapshot every SECONDS during market hours")
+    args = parser.parse_args()
     print("📊 Starting market data fetch...")
 
     smart_api = SmartConnect(api_key=api_key)
-    initialize_database()
 
     TOKEN_BATCHES = fetch_token_batches()
     print(f"✅ Loaded {len(TOKEN_BATCHES)} token batches.")
 
-    jwt_token = generate_new_session(smart_api)
-    if not jwt_token:
-        print("❌ Failed to get session token")
-        exit(1)
+    if args.every:
+        run_daemon(smart_api, TOKEN_BATCHES, args.every)
+        exit(0)
 
     current_date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    success_count = 0
-
-    for batch_num, token_batch in enumerate(TOKEN_BATCHES, 1):
-        print(f"\n⚙️ Processing batch {batch_num}/{len(TOKEN_BATCHES)}")
-        batch_data = process_batch(token_batch, jwt_token)
-        if not batch_data or not batch_data.get("status"):
-            print(f"⚠️ Batch {batch_num} failed")
-            continue
 
-        for instrument in batch_data['data']['fetched']:
-            symbol = clean_symbol(instrument.get("tradingSymbol", f"Token_{instrument.get('token')}"))
-            buy_qty = instrument.get("totBuyQuan", 0)
-            sell_qty = instrument.get("totSellQuan", 0)
-            total_qty = buy_qty + sell_qty
-            buy_pct = round((buy_qty / total_qty) * 100) if total_qty > 0 else 0
-            sell_pct = round((sell_qty / total_qty) * 100) if total_qty > 0 else 0
-
-            if save_to_database(symbol, current_date, buy_pct, sell_pct):
-                success_count += 1
-                print(f"✅ Saved {symbol} ({buy_pct}%/{sell_pct}%)")
-            else:
-                print(f"❌ Failed to save {symbol}")
-
-    print(f"\n🎯 Completed: {success_count} records saved.")
+    # Fetching, decoding and writing run as overlapped stages joined by bounded queues
+    client = QuoteClient(lambda: generate_new_session(smart_api), quote_headers(), pool_size=FETCH_WORKERS)
+    history_store = HistoryStore(HISTORY_DIR) if history_store_available() else None
+    pipeline = SnapshotPipeline(client.fetch, DB_FILE, fetch_workers=FETCH_WORKERS, decode_workers=DECODE_WORKERS,
+                                history_store=history_store)
+    try:
+        stats = pipeline.run(TOKEN_BATCHES, current_date)
+    finally:
+        client.close()
+
+    for name, stage in stats['stages'].items():
+        print(f"⏱️ {name}: {stage['items']} batches, {stage['busy_seconds']:.2f}s busy over {stage['workers']} worker(s), "
+              f"{stage['wait_seconds']:.2f}s waiting")
+    if stats['failed_batches']:
+        print(f"⚠️ {stats['failed_batches']} of {stats['batches']} batches failed")
+    print(f"\n🎯 Completed: {stats['rows_written']} records saved in {stats['seconds']:.2f}s (slowest stage: {stats['bottleneck']}).")
     print(f"📁 Database: {DB_FILE}")
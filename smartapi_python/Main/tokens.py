@@ -1,9 +1,7 @@
+import os
 import streamlit as st
 import pandas as pd
-from datetime import datetime
-import requests
-from io import StringIO
-import numpy as np
+from SmartApi.kiteInstruments import KiteInstrumentCache
 
 st.set_page_config(page_title="F&O Tokens Dashboard", layout="centered")
 
@@ -13,53 +11,30 @@ st.markdown("""
 Extracts **only instrument tokens** for all current F&O stocks from Zerodha's API.
 """)
 
+INSTRUMENT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "kite_instruments")
+
+@st.cache_resource
+def instrument_cache():
+    return KiteInstrumentCache(INSTRUMENT_CACHE_DIR)
+
 @st.cache_data(ttl=3600)  # Cache for 1 hour
-def fetch_instruments():
-    url = "https://api.kite.trade/instruments"
+def fetch_fno_tokens():
+    # Only the instruments that changed since the last refresh are looked at again
+    cache = instrument_cache()
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        df = pd.read_csv(StringIO(response.text))
-        
-        # Convert expiry to datetime for proper comparison
-        df['expiry'] = pd.to_datetime(df['expiry'], errors='coerce')
-        return df
+        cache.refresh()
     except Exception as e:
         st.error(f"Failed to fetch data: {e}")
-        return pd.DataFrame()
+    return cache.fno_tokens()
 
 # Load data
 with st.spinner("Fetching instrument data..."):
-    df = fetch_instruments()
+    # Latest expiry future of every current F&O stock (no indices)
+    unique_tokens = fetch_fno_tokens()
 
-if df.empty:
+if not unique_tokens:
     st.stop()
 
-# Filter for current F&O stocks (no indices)
-current_date = datetime.now()
-
-# First create a mask for index instruments
-is_index = (
-    df['name'].str.contains('NIFTY|BANKNIFTY|FINNIFTY', case=False, regex=True, na=False)
-)
-
-# Then filter the DataFrame
-fno_stocks = df[
-    (df['exchange'] == 'NFO') &
-    (df['name'].notna()) &
-    (~is_index) &
-    (df['expiry'] >= current_date) &
-    (df['instrument_type'] == 'FUT')
-]
-
-# Get unique tokens (latest expiry per stock)
-unique_tokens = (
-    fno_stocks.sort_values('expiry')
-    .drop_duplicates('name', keep='last')['instrument_token']
-    .astype(str)
-    .tolist()
-)
-
 # Split into batches
 batch_size = 40
 batches = [
@@ -4,18 +4,17 @@ import traceback
 import pandas as pd
 from datetime import datetime, timedelta
 import numpy as np
-import requests
-import sqlite3
 import os
+from SmartApi.snapshotQuery import fetch_buy_sell_history, buy_sell_percent_labels
+from SmartApi.historyStore import HistoryStore, cached_bhavcopy, history_store_available, to_nselib_frame
+from SmartApi.instrumentMaster import get_instrument_master
 
 st.set_page_config(page_title="NSE Trading Metrics", layout="wide")
 st.title("📊 NSE Multi-Symbol Trading Activity Analysis")
 
-# Database connection function
-def get_db_connection():
-    db_path = os.path.join(os.path.dirname(__file__), "market_data.db")
-    conn = sqlite3.connect(db_path)
-    return conn
+DB_PATH = os.path.join(os.path.dirname(__file__), "market_data.db")
+HISTORY_DIR = os.path.join(os.path.dirname(__file__), "history")
+INSTRUMENT_CACHE_DIR = os.path.join(os.path.dirname(__file__), "instrument_master_eq")
 
 # Sidebar Inputs
 st.sidebar.header("Input Parameters")
@@ -23,59 +22,26 @@ st.sidebar.header("Input Parameters")
 @st.cache_data(ttl=3600)
 def get_all_equity_symbols():
     try:
-        url = "https://margincalculator.angelone.in/OpenAPI_File/files/OpenAPIScripMaster.json"
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        df = pd.DataFrame(data)
-
-        # Filter for NSE segment and equity instrument type
-        eq_df = df[
-            (df["exch_seg"] == "NSE") &
-            (df["symbol"].str.endswith("-EQ", na=False))
-        ]
-
-        # Remove "-EQ" suffix and whitespace from symbols
-        eq_df["clean_symbol"] = eq_df["symbol"].str.replace("-EQ", "", regex=False).str.strip()
-
-        # Get unique sorted symbol list
-        all_symbols = sorted(eq_df["clean_symbol"].dropna().unique().tolist())
-
-        return all_symbols
-
+        return get_instrument_master(INSTRUMENT_CACHE_DIR, exch_seg="NSE", symbol_suffix="-EQ").equity_symbols()
     except Exception as e:
         print(f"❌ Failed to fetch equity symbols: {e}")
         return []
 
 # Database functions
-def fetch_buy_sell_volume(symbol, start_date, end_date):
-    """Fetch buy/sell volume percentage from database for a specific symbol and date range"""
+def load_buy_sell_history(symbols, start_date, end_date):
+    """Fetch the buy/sell volume history of all selected symbols with one indexed query"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Convert dates to strings in the format stored in your database
-        start_date_str = start_date.strftime("%Y-%m-%d")
-        end_date_str = end_date.strftime("%Y-%m-%d")
-        
-        cursor.execute("""
-            SELECT date, buy_sell_volume_percent 
-            FROM market_data 
-            WHERE symbol = ? AND date(date) BETWEEN date(?) AND date(?)
-            ORDER BY date DESC
-        """, (symbol, start_date_str, end_date_str))
-        
-        rows = cursor.fetchall()
-        conn.close()
-        
-        if rows:
-            df = pd.DataFrame(rows, columns=['Date', 'BUY/SELL VOLUME%'])
-            df['Date'] = pd.to_datetime(df['Date'])  # Convert to datetime for merge compatibility
-            return df
-        return pd.DataFrame()
+        return fetch_buy_sell_history(DB_PATH, symbols, start_date, end_date)
     except Exception as e:
-        st.error(f"❌ Error fetching buy/sell volume for {symbol}: {e}")
+        st.error(f"❌ Error fetching buy/sell volume: {e}")
+        return None
+
+def fetch_buy_sell_volume(history, symbol):
+    """Buy/sell volume percentage of one symbol, taken from the history loaded for all symbols"""
+    if history is None or symbol not in history.index.get_level_values("symbol"):
         return pd.DataFrame()
+    rows = history.xs(symbol, level="symbol")
+    return pd.DataFrame({"Date": rows.index, "BUY/SELL VOLUME%": buy_sell_percent_labels(rows).to_numpy()})
 
 ALL_COMPANIES = get_all_equity_symbols()
 
@@ -92,19 +58,37 @@ to_date = st.sidebar.date_input("To Date", value=datetime.now() - timedelta(days
 
 fetch_button = st.sidebar.button("📥 Fetch Data")
 
+def fetch_from_nselib(symbol, from_date, to_date):
+    return capital_market.price_volume_and_deliverable_position_data(
+        symbol=symbol,
+        from_date=from_date.strftime("%d-%m-%Y"),
+        to_date=to_date.strftime("%d-%m-%Y")
+    )
+
 @st.cache_data(ttl=3600)
 def get_symbol_data(symbol, from_date, to_date):
     try:
-        data = capital_market.price_volume_and_deliverable_position_data(
-            symbol=symbol,
-            from_date=from_date.strftime("%d-%m-%Y"),
-            to_date=to_date.strftime("%d-%m-%Y")
-        )
-        return data
+        return fetch_from_nselib(symbol, from_date, to_date)
     except Exception as e:
         st.error(f"Error fetching data for {symbol}: {str(e)}")
         return pd.DataFrame()
 
+def load_bhavcopy(symbols, from_date, to_date):
+    """Read price/volume history of all symbols from the Parquet store, fetching only days it does not have yet"""
+    if not history_store_available():
+        return None
+    try:
+        return cached_bhavcopy(HistoryStore(HISTORY_DIR), symbols, from_date, to_date, fetch_from_nselib)
+    except Exception as e:
+        st.warning(f"⚠️ History store unavailable, fetching from NSE: {e}")
+        return None
+
+def symbol_bhavcopy(bhavcopy, symbol, from_date, to_date):
+    """Price/volume rows of one symbol in nselib's layout, from the store when it is available"""
+    if bhavcopy is None:
+        return get_symbol_data(symbol, from_date, to_date)
+    return to_nselib_frame(bhavcopy[bhavcopy["symbol"] == symbol])
+
 def color_ltp_based_on_change(df):
     styles = []
     for _, row in df.iterrows():
@@ -150,6 +134,8 @@ if fetch_button:
         all_results = []
         progress_bar = st.progress(0)
         status_text = st.empty()
+        buy_sell_history = load_buy_sell_history(symbols, from_date, to_date)
+        bhavcopy = load_bhavcopy(symbols, from_date, to_date)
 
         for i, symbol in enumerate(symbols):
             try:
@@ -158,8 +144,8 @@ if fetch_button:
                 status_text.text(f"Fetching data for {symbol} ({i+1}/{len(symbols)})...")
 
                 # Get data from both sources
-                nse_data = get_symbol_data(symbol, from_date, to_date)
-                buy_sell_data = fetch_buy_sell_volume(symbol, from_date, to_date)
+                nse_data = symbol_bhavcopy(bhavcopy, symbol, from_date, to_date)
+                buy_sell_data = fetch_buy_sell_volume(buy_sell_history, symbol)
 
                 if not nse_data.empty:
                     df = nse_data.copy()
@@ -1,11 +1,11 @@
-from __future__ import unicode_literals,absolute_import
-
-from SmartApi.smartConnect import SmartConnect
-# from SmartApi.webSocket import WebSocket
-from SmartApi.smartApiWebsocket import SmartWebSocket
-
-__all__ = ["SmartConnect","SmartWebSocket"]
-
-
-
-
+from __future__ import unicode_literals,absolute_import
+
+from SmartApi.smartConnect import SmartConnect
+# from SmartApi.webSocket import WebSocket
+from SmartApi.smartApiWebsocket import SmartWebSocket
+
+__all__ = ["SmartConnect","SmartWebSocket"]
+
+
+
+
@@ -0,0 +1,224 @@
+import threading
+import numpy as np
+
+
+# One depth level as sent in SmartStream DEPTH packets: quantity, price, number of orders
+DEPTH_LEVEL_DTYPE = np.dtype([("quantity", "<i4"), ("price", "<i4"), ("orders", "<i2")])
+DEPTH_LEVELS = 20
+# The 20 buy levels followed by the 20 sell levels start right after the packet header
+DEPTH_REGION_OFFSET = 43
+DEPTH_REGION_SIZE = 2 * DEPTH_LEVELS * DEPTH_LEVEL_DTYPE.itemsize
+
+BUY = 0
+SELL = 1
+
+
+class DepthBookEngine(object):
+    """
+    Current 20-level order book for every DEPTH token, held in fixed numpy arrays.
+
+    Each packet's 400-byte book region is decoded with a single np.frombuffer call and
+    copied into the token's slot; spread, mid, microprice, cumulative depth and top-N
+    imbalance are recomputed for that slot only. Prices and quantities are kept in the
+    raw units sent by the server.
+    """
+
+    def __init__(self, capacity=50, imbalance_levels=5):
+        self.imbalance_levels = imbalance_levels
+        self._lock = threading.Lock()
+        self._index = {}
+        self._keys = []
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        shape = (capacity, 2, DEPTH_LEVELS)
+        self.quantity = np.zeros(shape, dtype=np.int64)
+        self.price = np.zeros(shape, dtype=np.int64)
+        self.orders = np.zeros(shape, dtype=np.int32)
+        self.cumulative_quantity = np.zeros(shape, dtype=np.int64)
+        self.best_bid = np.zeros(capacity, dtype=np.float64)
+        self.best_ask = np.zeros(capacity, dtype=np.float64)
+        self.spread = np.full(capacity, np.nan)
+        self.mid = np.full(capacity, np.nan)
+        self.microprice = np.full(capacity, np.nan)
+        self.imbalance = np.full(capacity, np.nan)
+        self.timestamp = np.zeros(capacity, dtype=np.int64)
+        self.updates = np.zeros(capacity, dtype=np.int64)
+
+    def _grow(self):
+        old = {name: getattr(self, name) for name in self._array_names()}
+        self._allocate(2 * len(self.timestamp))
+        for name, values in old.items():
+            getattr(self, name)[:len(values)] = values
+
+    @staticmethod
+    def _array_names():
+        return ("quantity", "price", "orders", "cumulative_quantity", "best_bid", "best_ask", "spread",
+                "mid", "microprice", "imbalance", "timestamp", "updates")
+
+    def _slot(self, key):
+        slot = self._index.get(key)
+        if slot is None:
+            slot = len(self._keys)
+            if slot == len(self.timestamp):
+                self._grow()
+            self._index[key] = slot
+            self._keys.append(key)
+        return slot
+
+    def update(self, exchange_type, token, binary_data, timestamp=0, offset=DEPTH_REGION_OFFSET):
+        """
+            Decode the book region of a DEPTH packet into the token's slot and refresh its metrics.
+            Returns a DepthBook view of the token.
+        """
+        levels = np.frombuffer(binary_data, dtype=DEPTH_LEVEL_DTYPE, count=2 * DEPTH_LEVELS,
+                               offset=offset).reshape(2, DEPTH_LEVELS)
+        with self._lock:
+            slot = self._slot((exchange_type, token))
+            quantity = self.quantity[slot]
+            quantity[:] = levels["quantity"]
+            self.price[slot] = levels["price"]
+            self.orders[slot] = levels["orders"]
+            np.cumsum(quantity, axis=1, out=self.cumulative_quantity[slot])
+            self._update_metrics(slot)
+            self.timestamp[slot] = timestamp
+            self.updates[slot] += 1
+        return DepthBook(self, slot, exchange_type, token)
+
+    def _update_metrics(self, slot):
+        quantity = self.quantity[slot]
+        price = self.price[slot]
+        bid_qty = quantity[BUY, 0]
+        ask_qty = quantity[SELL, 0]
+        bid = price[BUY, 0] if bid_qty > 0 else 0
+        ask = price[SELL, 0] if ask_qty > 0 else 0
+        self.best_bid[slot] = bid
+        self.best_ask[slot] = ask
+        if bid and ask:
+            self.spread[slot] = ask - bid
+            self.mid[slot] = (ask + bid) / 2.0
+            self.microprice[slot] = (bid * ask_qty + ask * bid_qty) / float(bid_qty + ask_qty)
+        else:
+            self.spread[slot] = np.nan
+            self.mid[slot] = np.nan
+            self.microprice[slot] = np.nan
+        level = min(self.imbalance_levels, DEPTH_LEVELS) - 1
+        cumulative = self.cumulative_quantity[slot]
+        buy_depth = cumulative[BUY, level]
+        sell_depth = cumulative[SELL, level]
+        total = buy_depth + sell_depth
+        self.imbalance[slot] = (buy_depth - sell_depth) / float(total) if total else np.nan
+
+    def book(self, exchange_type, token):
+        """
+            DepthBook view of a token, or None if no packet has been seen for it
+        """
+        slot = self._index.get((exchange_type, token))
+        return DepthBook(self, slot, exchange_type, token) if slot is not None else None
+
+    def tokens(self):
+        return list(self._keys)
+
+    def metrics(self):
+        """
+            Copy of the derived metrics of every token as {(exchange_type, token): dict}
+        """
+        with self._lock:
+            return {key: DepthBook(self, slot, *key).metrics() for key, slot in self._index.items()}
+
+
+class DepthBook(object):
+    """
+    View of one token's slot in a DepthBookEngine. Attributes read the engine's arrays
+    directly, so a view reflects later updates; use snapshot() for a stable copy.
+    """
+
+    __slots__ = ("engine", "slot", "exchange_type", "token")
+
+    def __init__(self, engine, slot, exchange_type, token):
+        self.engine = engine
+        self.slot = slot
+        self.exchange_type = exchange_type
+        self.token = token
+
+    @property
+    def bid_prices(self):
+        return self.engine.price[self.slot, BUY]
+
+    @property
+    def bid_quantities(self):
+        return self.engine.quantity[self.slot, BUY]
+
+    @property
+    def ask_prices(self):
+        return self.engine.price[self.slot, SELL]
+
+    @property
+    def ask_quantities(self):
+        return self.engine.quantity[self.slot, SELL]
+
+    @property
+    def cumulative_bid_quantities(self):
+        return self.engine.cumulative_quantity[self.slot, BUY]
+
+    @property
+    def cumulative_ask_quantities(self):
+        return self.engine.cumulative_quantity[self.slot, SELL]
+
+    @property
+    def imbalance(self):
+        return float(self.engine.imbalance[self.slot])
+
+    @property
+    def microprice(self):
+        return float(self.engine.microprice[self.slot])
+
+    @property
+    def spread(self):
+        return float(self.engine.spread[self.slot])
+
+    @property
+    def mid(self):
+        return float(self.engine.mid[self.slot])
+
+    def metrics(self):
+        engine = self.engine
+        slot = self.slot
+        return {
+            "best_bid": float(engine.best_bid[slot]),
+            "best_ask": float(engine.best_ask[slot]),
+            "spread": float(engine.spread[slot]),
+            "mid": float(engine.mid[slot]),
+            "microprice": float(engine.microprice[slot]),
+            "imbalance": float(engine.imbalance[slot]),
+            "total_buy_depth": int(engine.cumulative_quantity[slot, BUY, -1]),
+            "total_sell_depth": int(engine.cumulative_quantity[slot, SELL, -1]),
+            "timestamp": int(engine.timestamp[slot]),
+            "updates": int(engine.updates[slot])
+        }
+
+    def snapshot(self):
+        """
+            Stable copy of the book arrays and metrics
+        """
+        engine = self.engine
+        with engine._lock:
+            data = self.metrics()
+            data["quantity"] = engine.quantity[self.slot].copy()
+            data["price"] = engine.price[self.slot].copy()
+            data["orders"] = engine.orders[self.slot].copy()
+        return data
+
+    def to_dict(self):
+        """
+            Book in the depth_20_buy_data / depth_20_sell_data layout produced by SmartWebSocketV2
+        """
+        engine = self.engine
+        sides = {}
+        for side, name in ((BUY, "depth_20_buy_data"), (SELL, "depth_20_sell_data")):
+            sides[name] = [
+                {"quantity": int(q), "price": int(p), "num_of_orders": int(o)}
+                for q, p, o in zip(engine.quantity[self.slot, side], engine.price[self.slot, side],
+                                   engine.orders[self.slot, side])
+            ]
+        return sides
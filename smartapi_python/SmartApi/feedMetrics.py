@@ -0,0 +1,205 @@
+import bisect
+import threading
+
+
+class LatencyHistogram(object):
+    """
+    Fixed-bucket latency histogram in milliseconds.
+    """
+
+    BUCKET_BOUNDS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BUCKET_BOUNDS_MS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value_ms):
+        self.counts[bisect.bisect_left(self.BUCKET_BOUNDS_MS, value_ms)] += 1
+        self.count += 1
+        self.total += value_ms
+        if self.min is None or value_ms < self.min:
+            self.min = value_ms
+        if self.max is None or value_ms > self.max:
+            self.max = value_ms
+
+    def percentile(self, pct):
+        """
+            Upper bound of the bucket holding the pct-th percentile (max for the overflow bucket)
+        """
+        if not self.count:
+            return None
+        rank = pct / 100.0 * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank and bucket_count:
+                return self.BUCKET_BOUNDS_MS[i] if i < len(self.BUCKET_BOUNDS_MS) else self.max
+        return self.max
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "buckets": dict(zip([str(b) for b in self.BUCKET_BOUNDS_MS] + ["+inf"], self.counts))
+        }
+
+
+class TokenFeedStats(object):
+    """
+    Sequence and latency bookkeeping for a single (exchange_type, token).
+    """
+
+    __slots__ = ("packets", "gaps", "missing", "reordered", "resets", "last_sequence", "last_exchange_timestamp",
+                 "exchange_latency")
+
+    def __init__(self):
+        self.packets = 0
+        self.gaps = 0
+        self.missing = 0
+        self.reordered = 0
+        self.resets = 0
+        self.last_sequence = None
+        self.last_exchange_timestamp = None
+        self.exchange_latency = LatencyHistogram()
+
+    def to_dict(self):
+        return {
+            "packets": self.packets,
+            "gaps": self.gaps,
+            "missing": self.missing,
+            "reordered": self.reordered,
+            "resets": self.resets,
+            "last_sequence": self.last_sequence,
+            "last_exchange_timestamp": self.last_exchange_timestamp,
+            "exchange_latency_ms": self.exchange_latency.to_dict()
+        }
+
+
+class FeedMetrics(object):
+    """
+    Per-token instrumentation of SmartStream packets.
+
+    For every decoded packet it checks sequence_number against the last one seen for the
+    token (a jump is a gap, a step backwards or repeat is a reorder, and a step back of more
+    than REORDER_WINDOW is the counter wrapping around or restarting, which starts the token
+    over from the new number instead of flagging every later packet) and records two latencies:
+    exchange_timestamp -> frame received (broker + network) and frame received -> on_data
+    invoked (our own decoding). Anomalies are returned to the caller so they can be surfaced
+    as control messages; everything else is read through snapshot().
+    """
+
+    SEQUENCE_GAP = "sequence_gap"
+    SEQUENCE_REORDER = "sequence_reorder"
+    SEQUENCE_RESET = "sequence_reset"
+
+    # A packet at most this far behind the last one is late; further back the sequence restarted
+    REORDER_WINDOW = 1000
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self.exchange_latency = LatencyHistogram()
+        self.decode_latency = LatencyHistogram()
+        self.packets = 0
+        self.gaps = 0
+        self.reordered = 0
+        self.resets = 0
+
+    def record_packet(self, parsed_data, received_at_ms):
+        """
+            Record a decoded packet received at received_at_ms (epoch milliseconds).
+            Returns a control message dict when the packet reveals a gap, reorder or reset, else None.
+        """
+        key = (parsed_data.get("exchange_type"), parsed_data.get("token"))
+        sequence = parsed_data.get("sequence_number")
+        exchange_timestamp = parsed_data.get("exchange_timestamp")
+        event = None
+        with self._lock:
+            stats = self._tokens.get(key)
+            if stats is None:
+                stats = self._tokens[key] = TokenFeedStats()
+            stats.packets += 1
+            self.packets += 1
+            if sequence is not None:
+                last = stats.last_sequence
+                if last is not None and sequence != last + 1:
+                    if sequence > last:
+                        stats.gaps += 1
+                        stats.missing += sequence - last - 1
+                        self.gaps += 1
+                        event = self._event(self.SEQUENCE_GAP, key, last, sequence)
+                    elif last - sequence > self.REORDER_WINDOW:
+                        stats.resets += 1
+                        self.resets += 1
+                        event = self._event(self.SEQUENCE_RESET, key, last, sequence)
+                        # Start the token over from the new number
+                        last = None
+                    else:
+                        stats.reordered += 1
+                        self.reordered += 1
+                        event = self._event(self.SEQUENCE_REORDER, key, last, sequence)
+                if last is None or sequence > last:
+                    stats.last_sequence = sequence
+            if exchange_timestamp:
+                latency = received_at_ms - exchange_timestamp
+                stats.last_exchange_timestamp = exchange_timestamp
+                stats.exchange_latency.add(latency)
+                self.exchange_latency.add(latency)
+        return event
+
+    def record_decode(self, latency_ms):
+        with self._lock:
+            self.decode_latency.add(latency_ms)
+
+    @staticmethod
+    def _event(control_type, key, last_sequence, sequence):
+        return {
+            "control_type": control_type,
+            "exchange_type": key[0],
+            "token": key[1],
+            "last_sequence_number": last_sequence,
+            "sequence_number": sequence
+        }
+
+    def token_stats(self, exchange_type, token):
+        with self._lock:
+            stats = self._tokens.get((exchange_type, token))
+            return stats.to_dict() if stats else None
+
+    def snapshot(self, per_token=False):
+        """
+            Current metrics as a plain dict; per_token adds the breakdown for every token
+        """
+        with self._lock:
+            data = {
+                "packets": self.packets,
+                "gaps": self.gaps,
+                "reordered": self.reordered,
+                "resets": self.resets,
+                "tokens": len(self._tokens),
+                "exchange_to_receive_ms": self.exchange_latency.to_dict(),
+                "receive_to_callback_ms": self.decode_latency.to_dict()
+            }
+            if per_token:
+                data["per_token"] = {
+                    "%s:%s" % key: stats.to_dict() for key, stats in self._tokens.items()
+                }
+        return data
+
+    def reset(self):
+        with self._lock:
+            self._tokens.clear()
+            self.exchange_latency = LatencyHistogram()
+            self.decode_latency = LatencyHistogram()
+            self.packets = 0
+            self.gaps = 0
+            self.reordered = 0
+            self.resets = 0
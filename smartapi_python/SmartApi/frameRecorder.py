@@ -0,0 +1,175 @@
+import os
+import mmap
+import glob
+import time
+import struct
+import threading
+from logzero import logger
+
+
+# Segment header: magic, format version, reserved
+SEGMENT_HEADER = struct.Struct("<4sHH8x")
+SEGMENT_MAGIC = b"SMFR"
+SEGMENT_VERSION = 1
+# Record header: receive time in epoch nanoseconds, payload length
+RECORD_HEADER = struct.Struct("<qI")
+
+
+class FrameRecorder(object):
+    """
+    Append-only recorder of raw SmartStream binary frames.
+
+    Frames are written into memory-mapped segment files of segment_size bytes named
+    <prefix>-000000.frames, <prefix>-000001.frames, ... Each record is the receive time in
+    epoch nanoseconds, the payload length and the untouched payload. Segments are
+    preallocated, so an all-zero record header marks the end of the data; close() trims
+    the unused tail of the last segment.
+    """
+
+    DEFAULT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+    def __init__(self, directory, prefix="smartstream", segment_size=DEFAULT_SEGMENT_SIZE):
+        self.directory = directory
+        self.prefix = prefix
+        self.segment_size = segment_size
+        self.frames = 0
+        self.bytes_written = 0
+        self._lock = threading.Lock()
+        self._file = None
+        self._mmap = None
+        self._offset = 0
+        os.makedirs(directory, exist_ok=True)
+        existing = segment_paths(directory, prefix)
+        self._segment_index = _segment_number(existing[-1]) + 1 if existing else 0
+        self._open_segment()
+
+    def _open_segment(self):
+        path = os.path.join(self.directory, "%s-%06d.frames" % (self.prefix, self._segment_index))
+        self._file = open(path, "w+b")
+        self._file.truncate(self.segment_size)
+        self._mmap = mmap.mmap(self._file.fileno(), self.segment_size)
+        SEGMENT_HEADER.pack_into(self._mmap, 0, SEGMENT_MAGIC, SEGMENT_VERSION, 0)
+        self._offset = SEGMENT_HEADER.size
+        self._segment_index += 1
+        logger.info(f"Recording frames to {path}")
+
+    def _close_segment(self):
+        if self._mmap is None:
+            return
+        self._mmap.flush()
+        self._mmap.close()
+        self._file.truncate(self._offset)
+        self._file.close()
+        self._mmap = None
+        self._file = None
+
+    def write(self, frame, received_at_ns=None):
+        """
+            Append one frame; received_at_ns defaults to the current time
+        """
+        if received_at_ns is None:
+            received_at_ns = time.time_ns()
+        size = len(frame)
+        needed = RECORD_HEADER.size + size
+        if needed + SEGMENT_HEADER.size + RECORD_HEADER.size > self.segment_size:
+            raise ValueError(f"Frame of {size} bytes does not fit in a {self.segment_size} byte segment")
+        with self._lock:
+            if self._mmap is None:
+                raise ValueError("Recorder is closed")
+            # Keep room for the zero end marker after the record
+            if self._offset + needed + RECORD_HEADER.size > self.segment_size:
+                self._close_segment()
+                self._open_segment()
+            offset = self._offset
+            RECORD_HEADER.pack_into(self._mmap, offset, received_at_ns, size)
+            self._mmap[offset + RECORD_HEADER.size:offset + needed] = frame
+            self._offset = offset + needed
+            self.frames += 1
+            self.bytes_written += needed
+
+    def flush(self):
+        with self._lock:
+            if self._mmap is not None:
+                self._mmap.flush()
+
+    def close(self):
+        with self._lock:
+            self._close_segment()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FrameReplayer(object):
+    """
+    Reads frames written by FrameRecorder and feeds them back through a SmartWebSocketV2.
+
+    replay() passes every frame through the websocket's own decoding with its recorded
+    receive time, so metrics and the user callbacks see the frames as they did live, and
+    the websocket's recorder is bypassed rather than recording them a second time.
+    speed=1 keeps the recorded spacing, speed=N plays N times faster and speed=None
+    replays as fast as possible.
+    """
+
+    def __init__(self, directory, prefix="smartstream"):
+        self.directory = directory
+        self.prefix = prefix
+
+    def frames(self):
+        """
+            Yield (received_at_ns, frame_bytes) for every recorded frame in order
+        """
+        for path in segment_paths(self.directory, self.prefix):
+            with open(path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                if size < SEGMENT_HEADER.size:
+                    continue
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    magic, version, _ = SEGMENT_HEADER.unpack_from(mm, 0)
+                    if magic != SEGMENT_MAGIC or version != SEGMENT_VERSION:
+                        logger.warning(f"Skipping {path}: not a frame segment")
+                        continue
+                    offset = SEGMENT_HEADER.size
+                    while offset + RECORD_HEADER.size <= size:
+                        received_at_ns, length = RECORD_HEADER.unpack_from(mm, offset)
+                        if received_at_ns == 0 and length == 0:
+                            break
+                        start = offset + RECORD_HEADER.size
+                        if start + length > size:
+                            logger.warning(f"Truncated frame at offset {offset} in {path}")
+                            break
+                        yield received_at_ns, mm[start:start + length]
+                        offset = start + length
+
+    def replay(self, smart_websocket, speed=1.0, data_type=2):
+        """
+            Feed every recorded frame to smart_websocket and return the number replayed
+        """
+        replayed = 0
+        first_ns = None
+        started = time.perf_counter()
+        for received_at_ns, frame in self.frames():
+            if speed:
+                if first_ns is None:
+                    first_ns = received_at_ns
+                due = (received_at_ns - first_ns) / 1e9 / speed
+                wait = due - (time.perf_counter() - started)
+                if wait > 0:
+                    time.sleep(wait)
+            if data_type == 2:
+                smart_websocket._handle_binary_data(smart_websocket.wsapp, frame, received_at_ns)
+            else:
+                smart_websocket._on_data(smart_websocket.wsapp, frame, data_type, False)
+            replayed += 1
+        return replayed
+
+
+def segment_paths(directory, prefix="smartstream"):
+    return sorted(glob.glob(os.path.join(directory, "%s-[0-9]*.frames" % prefix)), key=_segment_number)
+
+
+def _segment_number(path):
+    return int(os.path.basename(path).rsplit("-", 1)[1].split(".", 1)[0])
@@ -0,0 +1,171 @@
+import os
+import time
+import threading
+from logzero import logger
+
+
+class ScheduledTask(object):
+    """
+    Repeating callback registered with a HeartbeatScheduler.
+    """
+
+    __slots__ = ("scheduler", "interval", "callback", "name", "due_tick", "cancelled")
+
+    def __init__(self, scheduler, interval, callback, name):
+        self.scheduler = scheduler
+        self.interval = interval
+        self.callback = callback
+        self.name = name
+        self.due_tick = 0
+        self.cancelled = False
+
+    def cancel(self):
+        self.scheduler.cancel(self)
+
+
+class HeartbeatScheduler(object):
+    """
+    Process-wide hashed timer wheel that runs the heartbeats and staleness checks of every
+    websocket client on a single daemon thread.
+
+    Clients schedule repeating callbacks when a socket opens and cancel them when it closes,
+    so the number of threads stays at one however many sockets or reconnects there are.
+    Callbacks run on the scheduler thread and must not block; exceptions are logged.
+    Use get_scheduler() rather than creating instances directly.
+
+    clock and threaded are for tests: with threaded=False no thread is started and the
+    caller runs the ticks that are due on clock with run_due().
+    """
+
+    TICK_SECONDS = 0.5
+    WHEEL_SLOTS = 256
+
+    def __init__(self, tick_seconds=TICK_SECONDS, wheel_slots=WHEEL_SLOTS, clock=time.monotonic, threaded=True):
+        self.tick_seconds = tick_seconds
+        self.wheel_slots = wheel_slots
+        self.clock = clock
+        self.threaded = threaded
+        self._wheel = [[] for _ in range(wheel_slots)]
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._running = False
+        self._tick = 0
+        self._started_at = None if threaded else clock()
+        self._tasks = 0
+
+    def schedule(self, interval, callback, name=None):
+        """
+            Run callback every interval seconds (rounded to the wheel tick) until cancelled.
+            Returns the ScheduledTask handle.
+        """
+        task = ScheduledTask(self, interval, callback, name or getattr(callback, "__name__", "task"))
+        with self._lock:
+            self._insert(task)
+            self._tasks += 1
+            if self.threaded:
+                self._ensure_thread()
+        return task
+
+    def cancel(self, task):
+        if task is None:
+            return
+        with self._lock:
+            if not task.cancelled:
+                task.cancelled = True
+                self._tasks -= 1
+
+    def task_count(self):
+        with self._lock:
+            return self._tasks
+
+    def run_due(self):
+        """
+            Run, on the calling thread, every tick that is due on the clock; returns the
+            number of ticks run. For a scheduler created with threaded=False.
+        """
+        ticks = 0
+        while True:
+            with self._lock:
+                if self._deadline() > self.clock():
+                    return ticks
+            self._run_tick()
+            ticks += 1
+
+    def shutdown(self):
+        with self._lock:
+            self._running = False
+            self._wakeup.set()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+
+    def _insert(self, task):
+        ticks = max(1, int(round(task.interval / self.tick_seconds)))
+        task.due_tick = self._tick + ticks
+        self._wheel[task.due_tick % self.wheel_slots].append(task)
+
+    def _ensure_thread(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._running = True
+        self._wakeup.clear()
+        self._started_at = self.clock() - self._tick * self.tick_seconds
+        self._thread = threading.Thread(target=self._run, name="smartapi-heartbeat", daemon=True)
+        self._thread.start()
+
+    def _deadline(self):
+        # Deadlines are derived from the start time so the wheel does not drift
+        return self._started_at + (self._tick + 1) * self.tick_seconds
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._running:
+                    return
+                deadline = self._deadline()
+            delay = deadline - self.clock()
+            if delay > 0 and self._wakeup.wait(delay):
+                continue
+            self._run_tick()
+
+    def _run_tick(self):
+        due = []
+        with self._lock:
+            self._tick += 1
+            slot = self._wheel[self._tick % self.wheel_slots]
+            pending = []
+            for task in slot:
+                if task.cancelled:
+                    continue
+                if task.due_tick <= self._tick:
+                    due.append(task)
+                else:
+                    pending.append(task)
+            slot[:] = pending
+            for task in due:
+                self._insert(task)
+        for task in due:
+            if task.cancelled:
+                continue
+            try:
+                task.callback()
+            except Exception as e:
+                logger.error(f"Scheduled task {task.name} failed: {e}")
+
+
+_scheduler = None
+_scheduler_pid = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """
+        The shared HeartbeatScheduler of this process (a forked child gets its own)
+    """
+    global _scheduler, _scheduler_pid
+    with _scheduler_lock:
+        if _scheduler is None or _scheduler_pid != os.getpid():
+            _scheduler = HeartbeatScheduler()
+            _scheduler_pid = os.getpid()
+        return _scheduler
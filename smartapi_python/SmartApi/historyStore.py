@@ -0,0 +1,473 @@
+import os
+import json
+import time
+import uuid
+import threading
+from datetime import date, datetime, timedelta
+import numpy as np
+import pandas as pd
+from logzero import logger
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, only HistoryStore needs it
+    pa = ds = pq = None
+
+try:
+    import duckdb
+except ImportError:  # duckdb is optional, only HistoryStore.duckdb() needs it
+    duckdb = None
+
+
+SNAPSHOTS = "snapshots"
+QUOTES = "quotes"
+BHAVCOPY = "bhavcopy"
+
+# Columns of each dataset besides the trade_date partition column, and the columns that
+# identify a row within a day (a rewritten row replaces the stored one)
+DATASET_COLUMNS = {
+    SNAPSHOTS: [
+        ("symbol", "string"), ("snapshot_time", "int32"), ("buy_qty", "int64"), ("sell_qty", "int64"),
+        ("buy_pct", "float64"), ("sell_pct", "float64")
+    ],
+    # record is the packed quoteRecord.QUOTE_DTYPE record of market_quotes
+    QUOTES: [
+        ("symbol", "string"), ("snapshot_time", "int32"), ("record", "binary")
+    ],
+    BHAVCOPY: [
+        ("symbol", "string"), ("series", "string"), ("prev_close", "float64"), ("open_price", "float64"),
+        ("high_price", "float64"), ("low_price", "float64"), ("last_price", "float64"), ("close_price", "float64"),
+        ("average_price", "float64"), ("total_traded_quantity", "int64"), ("turnover", "float64"),
+        ("trades", "int64"), ("deliverable_qty", "int64"), ("delivery_pct", "float64")
+    ]
+}
+DATASET_KEYS = {
+    SNAPSHOTS: ["symbol", "snapshot_time"],
+    QUOTES: ["symbol", "snapshot_time"],
+    BHAVCOPY: ["symbol", "series"]
+}
+
+# nselib price_volume_and_deliverable_position_data column names, with spaces removed
+NSELIB_COLUMNS = {
+    "Symbol": "symbol", "Series": "series", "Date": "trade_date", "PrevClose": "prev_close",
+    "OpenPrice": "open_price", "HighPrice": "high_price", "LowPrice": "low_price", "LastPrice": "last_price",
+    "ClosePrice": "close_price", "AveragePrice": "average_price", "TotalTradedQuantity": "total_traded_quantity",
+    "TurnoverInRs": "turnover", "No.ofTrades": "trades", "DeliverableQty": "deliverable_qty",
+    "%DlyQttoTradedQty": "delivery_pct"
+}
+NSELIB_DATE_FORMAT = "%d-%b-%Y"
+
+PARTITION_PREFIX = "trade_date="
+DATA_FILE = "data.parquet"
+PART_PREFIX = "part-"
+PART_SUFFIX = ".parquet"
+FETCHED_FILE = "_fetched.json"
+ROW_GROUP_SIZE = 4096
+COMPACT_PARTS = 64
+READ_ATTEMPTS = 3
+
+
+def history_store_available():
+    return pa is not None
+
+
+def trade_date_of(value):
+    """
+        YYYYMMDD integer of a date, datetime, "YYYY-MM-DD" or "DD-MM-YYYY" string
+    """
+    if isinstance(value, (datetime, date)):
+        return value.year * 10000 + value.month * 100 + value.day
+    text = str(value).strip()
+    if len(text) == 10 and text[2] == "-" and text[5] == "-":
+        return int(text[6:10]) * 10000 + int(text[3:5]) * 100 + int(text[0:2])
+    return int(text[:10].replace("-", ""))
+
+
+def _date_of(trade_date):
+    return date(trade_date // 10000, trade_date // 100 % 100, trade_date % 100)
+
+
+def _next_day(trade_date):
+    return trade_date_of(_date_of(trade_date) + timedelta(days=1))
+
+
+def merge_ranges(ranges):
+    """
+        Sorted, non-overlapping (start, end) trade_date ranges covering the same days as ranges
+    """
+    merged = []
+    for start, end in sorted((int(start), int(end)) for start, end in ranges):
+        if merged and start <= _next_day(merged[-1][1]):
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def missing_ranges(start, end, covered):
+    """
+        The (start, end) ranges of the days from start to end that no range of covered holds
+    """
+    missing = []
+    for covered_start, covered_end in merge_ranges(covered):
+        if covered_end < start or covered_start > end:
+            continue
+        if covered_start > start:
+            missing.append((start, trade_date_of(_date_of(covered_start) - timedelta(days=1))))
+        start = _next_day(covered_end)
+        if start > end:
+            return missing
+    missing.append((start, end))
+    return missing
+
+
+def _arrow_schema(dataset, with_trade_date=False):
+    types = {"string": pa.string(), "int32": pa.int32(), "int64": pa.int64(), "float64": pa.float64(),
+             "binary": pa.binary()}
+    fields = [(name, types[dtype]) for name, dtype in DATASET_COLUMNS[dataset]]
+    if with_trade_date:
+        fields.append(("trade_date", pa.int32()))
+    return pa.schema(fields)
+
+
+def _numeric(series):
+    if not pd.api.types.is_numeric_dtype(series):
+        series = series.astype(str).str.replace(",", "", regex=False).str.strip()
+    return pd.to_numeric(series, errors="coerce")
+
+
+def normalize_bhavcopy(frame):
+    """
+        Typed bhavcopy rows (see DATASET_COLUMNS) from a DataFrame returned by nselib
+    """
+    frame = frame.rename(columns=lambda c: c.replace("\ufeff", "").replace("ï»¿", "").replace('"', "").strip().replace(" ", ""))
+    frame = frame.rename(columns=NSELIB_COLUMNS)
+    typed = pd.DataFrame(index=frame.index)
+    dates = pd.to_datetime(frame["trade_date"], format=NSELIB_DATE_FORMAT, errors="coerce")
+    typed["trade_date"] = (dates.dt.year * 10000 + dates.dt.month * 100 + dates.dt.day).astype("Int64")
+    for name, dtype in DATASET_COLUMNS[BHAVCOPY]:
+        if name not in frame.columns:
+            typed[name] = pd.Series(pd.NA, index=frame.index, dtype="string" if dtype == "string" else "Float64")
+        elif dtype == "string":
+            typed[name] = frame[name].astype("string").str.strip()
+        elif dtype == "int64":
+            typed[name] = _numeric(frame[name]).round().astype("Int64")
+        else:
+            typed[name] = _numeric(frame[name]).astype("float64")
+    return typed[typed["trade_date"].notna()].astype({"trade_date": "int64"})
+
+
+def to_nselib_frame(frame):
+    """
+        Typed bhavcopy rows renamed back to the (space-stripped) nselib columns the dashboards expect
+    """
+    columns = {typed: name for name, typed in NSELIB_COLUMNS.items()}
+    result = frame.rename(columns=columns)
+    if "Date" in result.columns:
+        trade_date = result["Date"].astype("int64")
+        result["Date"] = pd.to_datetime(pd.DataFrame({
+            "year": trade_date // 10000, "month": trade_date // 100 % 100, "day": trade_date % 100
+        })).dt.strftime(NSELIB_DATE_FORMAT)
+    return result
+
+
+class HistoryStore(object):
+    """
+    Columnar history of snapshots, their full quotes and NSE bhavcopy rows in Parquet files.
+
+    Each dataset is hive-partitioned by day (<root>/<dataset>/trade_date=YYYYMMDD/), and
+    every file is sorted by symbol with small row groups, so a read only opens the days in
+    its range and skips row groups whose symbol statistics cannot match. A write appends
+    one part file per day it touches and never reads what is stored, so a day written every
+    minute costs the same per write at the close as at the open. Reads merge a day's part
+    files in write order (the last write of a key wins), and compact() folds them into the
+    day's data.parquet; a day is compacted by the write that brings it to COMPACT_PARTS
+    part files. read() applies column projection and the symbol/date predicate inside
+    pyarrow. duckdb() returns a DuckDB connection with each dataset registered as a SQL view.
+    fetched_ranges() / add_fetched() keep the day ranges already requested from a source,
+    so cached_bhavcopy() asks nselib for each day of a symbol once.
+    """
+
+    def __init__(self, root):
+        if pa is None:
+            raise ImportError("HistoryStore requires pyarrow (pip install pyarrow)")
+        self.root = os.path.abspath(root)
+        self._lock = threading.Lock()
+        self.rows_written = 0
+        self.files_written = 0
+        self.write_seconds = 0.0
+
+    def dataset_path(self, dataset):
+        if dataset not in DATASET_COLUMNS:
+            raise ValueError(f"Unknown dataset {dataset}")
+        return os.path.join(self.root, dataset)
+
+    def _partition(self, dataset, trade_date):
+        return os.path.join(self.dataset_path(dataset), f"{PARTITION_PREFIX}{int(trade_date)}")
+
+    def _day_files(self, dataset, trade_date):
+        """
+            Files of a day in write order: data.parquet, then the part files written since it
+        """
+        partition = self._partition(dataset, trade_date)
+        try:
+            names = os.listdir(partition)
+        except FileNotFoundError:
+            return []
+        parts = sorted(name for name in names if name.startswith(PART_PREFIX) and name.endswith(PART_SUFFIX))
+        files = [DATA_FILE] if DATA_FILE in names else []
+        return [os.path.join(partition, name) for name in files + parts]
+
+    def trade_dates(self, dataset):
+        """
+            Sorted trade dates that have data in dataset
+        """
+        path = self.dataset_path(dataset)
+        if not os.path.isdir(path):
+            return []
+        dates = []
+        for name in os.listdir(path):
+            if name.startswith(PARTITION_PREFIX) and self._day_files(dataset, int(name[len(PARTITION_PREFIX):])):
+                dates.append(int(name[len(PARTITION_PREFIX):]))
+        return sorted(dates)
+
+    def _write_file(self, partition, name, table):
+        temporary = os.path.join(partition, f".{uuid.uuid4().hex}.tmp")
+        pq.write_table(table, temporary, compression="zstd", row_group_size=ROW_GROUP_SIZE)
+        os.replace(temporary, os.path.join(partition, name))
+        self.files_written += 1
+
+    def write(self, dataset, frame):
+        """
+            Store rows of dataset (a DataFrame with trade_date plus the dataset columns); returns the rows written
+        """
+        if frame is None or frame.empty:
+            return 0
+        started = time.perf_counter()
+        schema = _arrow_schema(dataset)
+        key = DATASET_KEYS[dataset]
+        names = [name for name, _ in DATASET_COLUMNS[dataset]]
+        with self._lock:
+            for trade_date, day in frame.groupby("trade_date", sort=True):
+                partition = self._partition(dataset, trade_date)
+                os.makedirs(partition, exist_ok=True)
+                day = day[names].drop_duplicates(key, keep="last").sort_values(key, kind="stable")
+                table = pa.Table.from_pandas(day, schema=schema, preserve_index=False)
+                # time_ns keeps the part names in write order
+                self._write_file(partition, f"{PART_PREFIX}{time.time_ns():020d}-{uuid.uuid4().hex[:8]}{PART_SUFFIX}",
+                                 table)
+                if len(self._day_files(dataset, trade_date)) > COMPACT_PARTS:
+                    self._compact_day(dataset, int(trade_date))
+            self.rows_written += len(frame)
+            self.write_seconds += time.perf_counter() - started
+        return len(frame)
+
+    def _compact_day(self, dataset, trade_date):
+        files = self._day_files(dataset, trade_date)
+        parts = [file for file in files if os.path.basename(file) != DATA_FILE]
+        if not parts:
+            return False
+        schema = _arrow_schema(dataset)
+        key = DATASET_KEYS[dataset]
+        day = pd.concat([pq.read_table(file, schema=schema).to_pandas() for file in files], ignore_index=True)
+        day = day.drop_duplicates(key, keep="last").sort_values(key, kind="stable")
+        self._write_file(self._partition(dataset, trade_date), DATA_FILE,
+                         pa.Table.from_pandas(day, schema=schema, preserve_index=False))
+        for part in parts:
+            os.remove(part)
+        return True
+
+    def compact(self, dataset, trade_dates=None):
+        """
+            Fold the part files of each day (all days by default) into its data.parquet; returns the days compacted
+        """
+        with self._lock:
+            days = self.trade_dates(dataset) if trade_dates is None else [trade_date_of(d) for d in trade_dates]
+            return sum(1 for trade_date in days if self._compact_day(dataset, trade_date))
+
+    def write_snapshots(self, rows):
+        """
+            Store market_snapshots rows, as (symbol, trade_date, snapshot_time, buy_qty, sell_qty, buy_pct, sell_pct) tuples
+        """
+        frame = pd.DataFrame.from_records(rows, columns=["symbol", "trade_date", "snapshot_time", "buy_qty",
+                                                         "sell_qty", "buy_pct", "sell_pct"])
+        return self.write(SNAPSHOTS, frame)
+
+    def write_quotes(self, rows):
+        """
+            Store market_quotes rows, as (symbol, trade_date, snapshot_time, record) tuples
+        """
+        frame = pd.DataFrame.from_records(rows, columns=["symbol", "trade_date", "snapshot_time", "record"])
+        return self.write(QUOTES, frame)
+
+    def write_bhavcopy(self, frame):
+        """
+            Store a DataFrame returned by nselib price_volume_and_deliverable_position_data
+        """
+        return self.write(BHAVCOPY, normalize_bhavcopy(frame))
+
+    def read_table(self, dataset, symbols=None, start_date=None, end_date=None, columns=None):
+        """
+            pyarrow Table of the rows of symbols between start_date and end_date (inclusive, None for open),
+            with only the given columns (trade_date is always included)
+        """
+        for attempt in range(READ_ATTEMPTS):
+            try:
+                return self._read_table(dataset, symbols, start_date, end_date, columns)
+            except FileNotFoundError:
+                # A concurrent compaction removed part files between listing and reading them
+                if attempt == READ_ATTEMPTS - 1:
+                    raise
+
+    def _read_table(self, dataset, symbols, start_date, end_date, columns):
+        start = trade_date_of(start_date) if start_date is not None else None
+        end = trade_date_of(end_date) if end_date is not None else None
+        days = [d for d in self.trade_dates(dataset) if (start is None or d >= start) and (end is None or d <= end)]
+        if columns is not None:
+            columns = [column for column in columns if column != "trade_date"]
+        schema = _arrow_schema(dataset, with_trade_date=True)
+        if not days:
+            empty = schema.empty_table()
+            return empty.select(columns + ["trade_date"]) if columns is not None else empty
+        predicate = None
+        if symbols is not None:
+            predicate = ds.field("symbol").isin([str(symbol).strip().upper() for symbol in symbols])
+        selected = None if columns is None else columns + ["trade_date"]
+
+        single, layered = [], []
+        for day in days:
+            files = self._day_files(dataset, day)
+            if len(files) == 1:
+                single.extend(files)
+            else:
+                layered.append(files)
+        tables = []
+        if single:
+            tables.append(self._scan(dataset, single, selected, predicate))
+        for files in layered:
+            tables.append(self._read_layered(dataset, files, selected, predicate))
+        return pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+
+    def _scan(self, dataset, files, columns, predicate):
+        path = self.dataset_path(dataset)
+        partitioning = ds.partitioning(pa.schema([("trade_date", pa.int32())]), flavor="hive")
+        dataset_files = ds.dataset(files, format="parquet", schema=_arrow_schema(dataset, with_trade_date=True),
+                                   partitioning=partitioning, partition_base_dir=path)
+        return dataset_files.to_table(columns=columns, filter=predicate)
+
+    def _read_layered(self, dataset, files, columns, predicate):
+        # One day in several files: read them in write order and keep the last row of each key
+        key = DATASET_KEYS[dataset]
+        needed = None if columns is None else columns + [name for name in key if name not in columns]
+        table = pa.concat_tables([self._scan(dataset, [file], needed, predicate) for file in files])
+        table = table.append_column("_order", pa.array(np.arange(len(table))))
+        last = table.group_by(key).aggregate([("_order", "max")]).column("_order_max")
+        table = table.take(np.sort(last.to_numpy())).drop_columns(["_order"])
+        return table if columns is None else table.select(columns)
+
+    def read(self, dataset, symbols=None, start_date=None, end_date=None, columns=None):
+        """
+            read_table() as a pandas DataFrame sorted by symbol and trade_date
+        """
+        frame = self.read_table(dataset, symbols, start_date, end_date, columns).to_pandas()
+        sort_by = [column for column in ("symbol", "trade_date") if column in frame.columns]
+        return frame.sort_values(sort_by, kind="stable").reset_index(drop=True)
+
+    def duckdb(self):
+        """
+            DuckDB connection with a SQL view per non-empty dataset (snapshots, quotes, bhavcopy); the
+            datasets are compacted first, so each key appears once
+        """
+        if duckdb is None:
+            raise ImportError("HistoryStore.duckdb requires duckdb (pip install duckdb)")
+        conn = duckdb.connect()
+        for dataset in DATASET_COLUMNS:
+            if self.trade_dates(dataset):
+                self.compact(dataset)
+                pattern = os.path.join(self.dataset_path(dataset), f"{PARTITION_PREFIX}*", f"*{PART_SUFFIX}")
+                pattern = pattern.replace("'", "''")
+                conn.execute(f"CREATE VIEW {dataset} AS SELECT * FROM read_parquet('{pattern}', hive_partitioning = true)")
+        return conn
+
+    def fetched_ranges(self, dataset):
+        """
+            {symbol: [(start, end), ...]} of the trade_date ranges already requested from the source of dataset
+        """
+        try:
+            with open(os.path.join(self.dataset_path(dataset), FETCHED_FILE)) as f:
+                stored = json.load(f)
+        except FileNotFoundError:
+            return {}
+        return {symbol: [tuple(r) for r in ranges] for symbol, ranges in stored.items()}
+
+    def add_fetched(self, dataset, ranges):
+        """
+            Record {symbol: [(start, end), ...]} as requested from the source of dataset
+        """
+        if not ranges:
+            return
+        path = self.dataset_path(dataset)
+        with self._lock:
+            os.makedirs(path, exist_ok=True)
+            stored = self.fetched_ranges(dataset)
+            for symbol, added in ranges.items():
+                stored[symbol] = merge_ranges(stored.get(symbol, []) + list(added))
+            temporary = os.path.join(path, f".{uuid.uuid4().hex}.tmp")
+            with open(temporary, "w") as f:
+                json.dump({symbol: [list(r) for r in stored[symbol]] for symbol in sorted(stored)}, f)
+            os.replace(temporary, os.path.join(path, FETCHED_FILE))
+
+    def stats(self):
+        return {
+            "rows_written": self.rows_written,
+            "files_written": self.files_written,
+            "write_seconds": self.write_seconds,
+            "rows_per_second": self.rows_written / self.write_seconds if self.write_seconds else None
+        }
+
+
+def cached_bhavcopy(store, symbols, from_date, to_date, fetch, today=None):
+    """
+        Bhavcopy rows of symbols between from_date and to_date, read from store. Only the days
+        of a symbol that were never requested before are passed to fetch(symbol, from_date,
+        to_date) (e.g. nselib); what it returns is stored and the requested range is recorded,
+        so holidays, symbols without trades and gaps inside the stored range are asked for
+        once. A day before today counts as requested once fetched; today only once its rows
+        are published. Ranges that are only a weekend are not fetched.
+        Returns the typed rows of all symbols, sorted by symbol and trade_date.
+    """
+    start, end = trade_date_of(from_date), trade_date_of(to_date)
+    yesterday = trade_date_of((today or date.today()) - timedelta(days=1))
+    symbols = [str(symbol).strip().upper() for symbol in symbols]
+    covered = store.fetched_ranges(BHAVCOPY)
+    stored = store.read(BHAVCOPY, symbols, start, end)
+    fetched = []
+    requested = {}
+    for symbol in symbols:
+        for missing_start, missing_end in missing_ranges(start, end, covered.get(symbol, [])):
+            if not np.busday_count(_date_of(missing_start), _date_of(missing_end) + timedelta(days=1)):
+                continue
+            try:
+                frame = fetch(symbol, _date_of(missing_start), _date_of(missing_end))
+            except Exception as e:
+                logger.warning(f"Bhavcopy fetch failed for {symbol} {missing_start}-{missing_end}: {e}")
+                continue
+            last_day = 0
+            if frame is not None and not frame.empty:
+                rows = normalize_bhavcopy(frame)
+                fetched.append(rows)
+                last_day = int(rows["trade_date"].max()) if not rows.empty else 0
+            settled = min(missing_end, max(yesterday, last_day))
+            if settled >= missing_start:
+                requested.setdefault(symbol, []).append((missing_start, settled))
+    if not fetched:
+        store.add_fetched(BHAVCOPY, requested)
+        return stored
+    new_rows = pd.concat(fetched, ignore_index=True)
+    store.write(BHAVCOPY, new_rows)
+    store.add_fetched(BHAVCOPY, requested)
+    combined = pd.concat([stored, new_rows[stored.columns]], ignore_index=True)
+    combined = combined.drop_duplicates(["symbol", "series", "trade_date"], keep="last")
+    return combined.sort_values(["symbol", "trade_date"], kind="stable").reset_index(drop=True)
@@ -0,0 +1,383 @@
+import os
+import json
+import uuid
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+import numpy as np
+import pandas as pd
+import requests
+from logzero import logger
+from SmartApi.scripMasterParser import CHUNK_SIZE, ScripMasterFilter, scrip_master_columns, source_chunks
+
+
+SCRIPMASTER_URL = "https://margincalculator.angelone.in/OpenAPI_File/files/OpenAPIScripMaster.json"
+DEFAULT_CACHE_DIR = "instrument_master"
+
+CURRENT_FILE = "current.json"
+BUILD_PREFIX = "build-"
+
+SOURCE_FIELDS = ("token", "symbol", "name", "expiry", "strike", "lotsize", "instrumenttype", "exch_seg", "tick_size")
+CATEGORY_COLUMNS = ("name", "exch_seg", "instrumenttype")
+OPTION_TYPES = ("", "CE", "PE")
+EXPIRY_FORMAT = "%d%b%Y"
+
+# Column -> dtype of the converted master. name / exch_seg / instrumenttype are stored as
+# int32 codes into the category lists kept in current.json, option_type as an index into
+# OPTION_TYPES, expiry as YYYYMMDD (0 for none) and strike in rupees (the file's value / 100,
+# -0.01 for instruments without one). symbol is fixed-width bytes so it can be memory-mapped.
+COLUMN_DTYPES = {
+    "token": "int32",
+    "symbol": None,
+    "name": "int32",
+    "exch_seg": "int32",
+    "instrumenttype": "int32",
+    "option_type": "int8",
+    "expiry": "int32",
+    "strike": "float64",
+    "lotsize": "int32",
+    "tick_size": "float32",
+}
+
+
+def _is_url(source):
+    return str(source).startswith(("http://", "https://"))
+
+
+def _numbers(values, dtype, missing):
+    parsed = pd.to_numeric(pd.Series(values, dtype=object), errors="coerce")
+    return parsed.fillna(missing).to_numpy().astype(dtype)
+
+
+def _expiry_dates(values):
+    # A few hundred distinct expiries for ~100k rows: parse each distinct value once
+    codes, uniques = pd.factorize(pd.Series(values, dtype=object).fillna(""))
+    parsed = pd.to_datetime(pd.Series(uniques, dtype=object), format=EXPIRY_FORMAT, errors="coerce")
+    as_int = (parsed.dt.year * 10000 + parsed.dt.month * 100 + parsed.dt.day).fillna(0).to_numpy().astype("int32")
+    return as_int[codes] if len(uniques) else np.zeros(len(values), dtype="int32")
+
+
+def expiry_key(value):
+    """
+        YYYYMMDD integer of an expiry given as a date, an integer, "YYYY-MM-DD" or "26JUN2025"
+    """
+    if isinstance(value, (datetime, date)):
+        return value.year * 10000 + value.month * 100 + value.day
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    text = str(value).strip()
+    if len(text) == 10 and text[4] == "-":
+        return int(text.replace("-", ""))
+    return expiry_key(datetime.strptime(text.upper(), EXPIRY_FORMAT))
+
+
+def convert_scrip_master(source_columns):
+    """
+        Columns (as numpy arrays) and category lists of the scrip master's
+        {field: list of values} columns, as read by scrip_master_columns
+    """
+    columns = {}
+    categories = {}
+    for name in CATEGORY_COLUMNS:
+        codes, uniques = pd.factorize(pd.Series(source_columns[name], dtype=object).fillna(""))
+        columns[name] = codes.astype("int32")
+        categories[name] = [str(value) for value in uniques]
+    symbols = pd.Series(source_columns["symbol"], dtype=object).fillna("").str.strip()
+    columns["symbol"] = symbols.to_numpy().astype("S")
+    options = categories["instrumenttype"]
+    is_option = np.isin(columns["instrumenttype"], [i for i, value in enumerate(options) if value.startswith("OPT")])
+    columns["option_type"] = np.where(is_option & symbols.str.endswith("CE").to_numpy(), 1,
+                                      np.where(is_option & symbols.str.endswith("PE").to_numpy(), 2, 0)).astype("int8")
+    columns["token"] = _numbers(source_columns["token"], "int32", -1)
+    columns["expiry"] = _expiry_dates(source_columns["expiry"])
+    columns["strike"] = _numbers(source_columns["strike"], "float64", -1) / 100
+    columns["lotsize"] = _numbers(source_columns["lotsize"], "int32", 0)
+    columns["tick_size"] = _numbers(source_columns["tick_size"], "float32", 0)
+    return columns, categories
+
+
+class InstrumentMaster(object):
+    """
+    Read-only view of a converted scrip master.
+
+    Columns are memory-mapped .npy files, so opening a master costs a few milliseconds and
+    the pages are shared by every process reading the same build. Lookups go through hash
+    indexes that are built on first use: by (exch_seg, token), (exch_seg, symbol), name and
+    (exch_seg, name, expiry, strike, option_type). Use load_instrument_master() to get one.
+    """
+
+    def __init__(self, directory, meta):
+        self.directory = directory
+        self.meta = meta
+        self.categories = meta["categories"]
+        self.columns = {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode="r") for name in COLUMN_DTYPES}
+        self._codes = {name: {value: code for code, value in enumerate(values)}
+                       for name, values in self.categories.items()}
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.columns["token"])
+
+    @property
+    def built_on(self):
+        return self.meta["built_on"]
+
+    def code(self, column, value):
+        """
+            Category code of value in column, or -1 if the master does not have it
+        """
+        return self._codes[column].get(value, -1)
+
+    def _index(self, kind):
+        index = self._indexes.get(kind)
+        if index is None:
+            with self._lock:
+                index = self._indexes.get(kind)
+                if index is None:
+                    index = self._indexes[kind] = self._build_index(kind)
+        return index
+
+    def _build_index(self, kind):
+        rows = range(len(self))
+        exch_seg = self.columns["exch_seg"].tolist()
+        if kind == "token":
+            keys = zip(exch_seg, self.columns["token"].tolist())
+        elif kind == "symbol":
+            keys = zip(exch_seg, np.char.decode(self.columns["symbol"], "utf-8").tolist())
+        elif kind == "contract":
+            keys = zip(exch_seg, self.columns["name"].tolist(), self.columns["expiry"].tolist(),
+                       self.columns["strike"].tolist(), self.columns["option_type"].tolist())
+        elif kind == "name":
+            codes = np.asarray(self.columns["name"])
+            order = np.argsort(codes, kind="stable")
+            bounds = np.flatnonzero(np.diff(codes[order])) + 1
+            return {int(codes[group[0]]): group for group in np.split(order, bounds) if len(group)}
+        else:
+            raise ValueError(f"Unknown index {kind}")
+        index = {}
+        for key, row in zip(keys, rows):
+            # Keep the first row of a duplicated key, as the file lists it
+            index.setdefault(key, row)
+        return index
+
+    def by_token(self, token, exch_seg="NSE"):
+        """
+            Row position of an instrument token, or None
+        """
+        return self._index("token").get((self.code("exch_seg", exch_seg), int(token)))
+
+    def by_symbol(self, symbol, exch_seg="NSE"):
+        """
+            Row position of a trading symbol such as "RELIANCE-EQ", or None
+        """
+        return self._index("symbol").get((self.code("exch_seg", exch_seg), symbol))
+
+    def by_name(self, name):
+        """
+            Row positions of every instrument of an underlying name, in file order
+        """
+        return self._index("name").get(self.code("name", name), np.empty(0, dtype="int64"))
+
+    def by_contract(self, name, expiry, strike=None, option_type="", exch_seg="NFO"):
+        """
+            Row position of a derivative contract, or None
+            Parameters
+            ------
+            expiry: date, YYYYMMDD integer, "YYYY-MM-DD" or "26JUN2025"
+            strike: float
+                in rupees; leave out for futures
+            option_type: "CE", "PE" or "" for futures
+        """
+        key = (self.code("exch_seg", exch_seg), self.code("name", name), expiry_key(expiry),
+               -0.01 if strike is None else float(strike), OPTION_TYPES.index(option_type))
+        return self._index("contract").get(key)
+
+    def select(self, exch_seg=None, instrumenttype=None, names=None):
+        """
+            Row positions matching every given filter; each accepts a value or a list of values
+        """
+        mask = np.ones(len(self), dtype=bool)
+        for column, values in (("exch_seg", exch_seg), ("instrumenttype", instrumenttype), ("name", names)):
+            if values is None:
+                continue
+            values = [values] if isinstance(values, str) else values
+            mask &= np.isin(self.columns[column], [self.code(column, value) for value in values])
+        return np.flatnonzero(mask)
+
+    def names(self, rows):
+        """
+            Distinct underlying names of rows
+        """
+        categories = self.categories["name"]
+        return [categories[code] for code in np.unique(self.columns["name"][rows]) if categories[code]]
+
+    def frame(self, rows=None, columns=None):
+        """
+            DataFrame of rows (all rows when None) with category columns as pandas Categoricals
+        """
+        rows = slice(None) if rows is None else rows
+        data = {}
+        for column in columns or COLUMN_DTYPES:
+            values = self.columns[column][rows]
+            if column in self.categories:
+                data[column] = pd.Categorical.from_codes(values, categories=self.categories[column])
+            elif column == "option_type":
+                data[column] = pd.Categorical.from_codes(values, categories=list(OPTION_TYPES))
+            elif column == "symbol":
+                data[column] = np.char.decode(values, "utf-8").astype(object)
+            else:
+                data[column] = np.asarray(values)
+        return pd.DataFrame(data)
+
+    def equity_symbols(self, exch_seg="NSE"):
+        """
+            Sorted symbols of the exchange's -EQ series, without the suffix
+        """
+        symbols = self.columns["symbol"][self.select(exch_seg=exch_seg)]
+        equities = np.char.decode(symbols[np.char.endswith(symbols, b"-EQ")], "utf-8")
+        return sorted(set(symbol[:-3].strip() for symbol in equities.tolist()))
+
+    def fno_underlying_tokens(self, exch_seg="NSE", derivatives=("FUTSTK", "OPTSTK"), derivative_seg="NFO"):
+        """
+            Tokens (as strings, sorted by name) of the exch_seg instruments whose name has
+            stock futures or options on derivative_seg, i.e. the cash leg of the F&O universe
+        """
+        names = self.names(self.select(exch_seg=derivative_seg, instrumenttype=list(derivatives)))
+        frame = self.frame(self.select(exch_seg=exch_seg, names=names), ["name", "symbol", "token"])
+        frame = frame.drop_duplicates().sort_values("name", key=lambda name: name.astype(str), kind="stable")
+        return [str(token) for token in frame["token"]]
+
+
+def _read_meta(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, CURRENT_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_meta(cache_dir, meta):
+    path = os.path.join(cache_dir, CURRENT_FILE)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(temp_path, path)
+
+
+@contextmanager
+def _open_source(source, meta, timeout):
+    """
+        (chunks, validators) of source; chunks is None when it has not changed since meta
+    """
+    if not _is_url(source):
+        mtime = os.path.getmtime(source)
+        if meta is not None and meta.get("source_mtime") == mtime:
+            yield None, {"source_mtime": mtime}
+        else:
+            yield source_chunks(source), {"source_mtime": mtime}
+        return
+    headers = {}
+    if meta is not None and meta.get("etag"):
+        headers["If-None-Match"] = meta["etag"]
+    if meta is not None and meta.get("last_modified"):
+        headers["If-Modified-Since"] = meta["last_modified"]
+    with requests.get(source, headers=headers, timeout=timeout, stream=True) as response:
+        validators = {"etag": response.headers.get("ETag"), "last_modified": response.headers.get("Last-Modified")}
+        if response.status_code == 304:
+            yield None, validators
+            return
+        response.raise_for_status()
+        yield response.iter_content(CHUNK_SIZE), validators
+
+
+def build_instrument_master(cache_dir, chunks, meta, row_filter=None):
+    """
+        Convert the scrip master read from chunks (iterable of bytes) into a new build under
+        cache_dir and make it current; only the rows passing row_filter are kept
+    """
+    row_filter = row_filter or ScripMasterFilter()
+    # Parsed as it streams in, straight into one list per field
+    columns, categories = convert_scrip_master(scrip_master_columns(chunks, SOURCE_FIELDS, row_filter=row_filter))
+    build = f"{BUILD_PREFIX}{datetime.now():%Y%m%dT%H%M%S%f}-{uuid.uuid4().hex[:8]}"
+    directory = os.path.join(cache_dir, build)
+    os.makedirs(directory)
+    for name, values in columns.items():
+        np.save(os.path.join(directory, name + ".npy"), values)
+    meta = dict(meta, build=build, rows=len(columns["token"]), categories=categories, filters=row_filter.to_dict())
+    previous = (_read_meta(cache_dir) or {}).get("build")
+    _write_meta(cache_dir, meta)
+    # The previous build is kept: a process that read current.json just before this one
+    # replaced it may be about to open it. Builds named before it (names start with their
+    # build time) are removed; one still mapped elsewhere simply fails to be removed on
+    # systems where open files cannot be deleted, and is retried next time.
+    if previous is not None:
+        for entry in os.listdir(cache_dir):
+            if entry.startswith(BUILD_PREFIX) and entry < previous and entry != build:
+                shutil.rmtree(os.path.join(cache_dir, entry), ignore_errors=True)
+    return meta
+
+
+def load_instrument_master(cache_dir=DEFAULT_CACHE_DIR, source=SCRIPMASTER_URL, timeout=30, refresh=True,
+                           exch_seg=None, instrumenttype=None, symbol_suffix=None):
+    """
+        The converted instrument master of source (the scrip master URL or a local JSON file)
+        Parameters
+        ------
+        cache_dir: string
+            directory holding the converted builds
+        refresh: bool
+            check the source when the current build was not made today; False always uses
+            the current build if there is one
+        exch_seg, instrumenttype, symbol_suffix:
+            keep only the matching rows (see ScripMasterFilter); a cache_dir holds the builds
+            of one source and one set of filters, changing either converts the source again
+        The source is converted at most once a day: the first load of a day asks the server
+        with If-None-Match / If-Modified-Since (or compares a local file's mtime) and only
+        downloads and converts it again when it changed. The file is parsed as it is read,
+        so the conversion never holds more than the kept rows in memory. If the check or the
+        download fails and a build exists, the existing build is used.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    row_filter = ScripMasterFilter(exch_seg, instrumenttype, symbol_suffix)
+    meta = _read_meta(cache_dir)
+    if meta is not None and meta.get("filters", {}) != row_filter.to_dict():
+        logger.info(f"Instrument master in {cache_dir} was built with other filters, converting {source} again")
+        meta = None
+    elif meta is not None and meta.get("source") != str(source):
+        logger.info(f"Instrument master in {cache_dir} was built from {meta.get('source')}, converting {source} again")
+        meta = None
+    today = date.today().isoformat()
+    if meta is not None and (meta.get("built_on") == today or not refresh):
+        return InstrumentMaster(os.path.join(cache_dir, meta["build"]), meta)
+    try:
+        with _open_source(source, meta, timeout) as (chunks, validators):
+            if chunks is None:
+                meta = dict(meta, built_on=today, **{key: value for key, value in validators.items() if value})
+                _write_meta(cache_dir, meta)
+            else:
+                meta = build_instrument_master(cache_dir, chunks, dict(validators, source=str(source), built_on=today),
+                                               row_filter)
+                logger.info(f"Converted scrip master {source}: {meta['rows']} instruments")
+    except Exception as e:
+        if meta is None:
+            raise
+        logger.warning(f"Could not check {source} for a newer scrip master, using the build of {meta.get('built_on')}: {e}")
+    return InstrumentMaster(os.path.join(cache_dir, meta["build"]), meta)
+
+
+_masters = {}
+_masters_lock = threading.Lock()
+
+
+def get_instrument_master(cache_dir=DEFAULT_CACHE_DIR, source=SCRIPMASTER_URL, **filters):
+    """
+        Process-wide shared InstrumentMaster of cache_dir, reloaded when the day changes
+    """
+    key = (os.path.abspath(cache_dir), str(source), json.dumps(ScripMasterFilter(**filters).to_dict(), sort_keys=True))
+    with _masters_lock:
+        master = _masters.get(key)
+        if master is None or master.built_on != date.today().isoformat():
+            master = _masters[key] = load_instrument_master(cache_dir, source, **filters)
+        return master
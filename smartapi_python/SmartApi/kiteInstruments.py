@@ -0,0 +1,264 @@
+import os
+import io
+import json
+import time
+import uuid
+import hashlib
+import threading
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import requests
+from logzero import logger
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, without it the parsed copy is only kept in memory
+    pq = None
+
+
+KITE_INSTRUMENTS_URL = "https://api.kite.trade/instruments"
+DEFAULT_CACHE_DIR = "kite_instruments"
+
+META_FILE = "meta.json"
+INSTRUMENTS_FILE = "instruments.parquet"
+
+KEY = "instrument_token"
+# Columns of the dump and how they are parsed; exchange, segment and instrument_type
+# repeat a handful of values and are kept as categoricals
+INSTRUMENT_DTYPES = {
+    "instrument_token": "int64",
+    "exchange_token": "int64",
+    "tradingsymbol": "string",
+    "name": "string",
+    "last_price": "float64",
+    "expiry": "string",
+    "strike": "float64",
+    "tick_size": "float64",
+    "lot_size": "int64",
+    "instrument_type": "category",
+    "segment": "category",
+    "exchange": "category",
+}
+# last_price moves every day without the instrument changing
+VOLATILE_COLUMNS = ("last_price",)
+COMPARE_COLUMNS = [name for name in INSTRUMENT_DTYPES if name != KEY and name not in VOLATILE_COLUMNS]
+
+INDEX_PATTERN = "NIFTY|BANKNIFTY|FINNIFTY"
+
+
+def parse_instruments(content):
+    """
+        DataFrame of the instruments CSV content (bytes), expiry as datetime64 (NaT for none)
+    """
+    frame = pd.read_csv(io.BytesIO(content), dtype=INSTRUMENT_DTYPES)
+    frame["expiry"] = pd.to_datetime(frame["expiry"], format="%Y-%m-%d", errors="coerce")
+    return frame.drop_duplicates(KEY, keep="last").reset_index(drop=True)
+
+
+def _row_hashes(frame):
+    return pd.util.hash_pandas_object(frame[COMPARE_COLUMNS], index=False).to_numpy()
+
+
+def diff_instruments(old, new):
+    """
+        Instruments added, removed and changed between two parsed dumps, keyed by instrument_token
+        Returns a dict of DataFrames: added and removed rows, and the changed instruments
+        as they were (changed_from) and as they are now (changed). A change in last_price
+        alone is not a change.
+    """
+    old_keys = old[KEY].to_numpy()
+    new_keys = new[KEY].to_numpy()
+    in_old = np.isin(new_keys, old_keys)
+    in_new = np.isin(old_keys, new_keys)
+    # Every compared column of a row goes into one 64-bit hash, so changed rows are found
+    # with one vectorized comparison instead of a column by column one
+    old_hashes = pd.Series(_row_hashes(old)[in_new], index=old_keys[in_new])
+    new_hashes = pd.Series(_row_hashes(new)[in_old], index=new_keys[in_old])
+    changed_keys = new_hashes.index[new_hashes.to_numpy() != old_hashes.reindex(new_hashes.index).to_numpy()]
+    return {
+        "added": new[~in_old],
+        "removed": old[~in_new],
+        "changed": new[np.isin(new_keys, changed_keys)],
+        "changed_from": old[np.isin(old_keys, changed_keys)],
+    }
+
+
+def _futures_mask(frame, now, index_pattern):
+    names = frame["name"]
+    codes, uniques = pd.factorize(names)
+    # The index filter runs once per distinct name rather than once per row
+    is_index = pd.Series(uniques, dtype="string").str.contains(index_pattern, case=False, regex=True, na=False).to_numpy()
+    not_index = np.zeros(len(frame), dtype=bool)
+    has_name = codes >= 0
+    not_index[has_name] = ~is_index[codes[has_name]]
+    return ((frame["exchange"] == "NFO").to_numpy() & not_index &
+            (frame["expiry"] >= now).fillna(False).to_numpy() & (frame["instrument_type"] == "FUT").to_numpy())
+
+
+def latest_futures(frame, now=None, index_pattern=INDEX_PATTERN):
+    """
+        The furthest NFO stock future still trading at now for each underlying name
+        Returns a DataFrame of name, instrument_token and expiry sorted by name; index
+        futures (names matching index_pattern) are left out.
+    """
+    now = now or datetime.now()
+    futures = frame[_futures_mask(frame, now, index_pattern)]
+    codes, uniques = pd.factorize(futures["name"], sort=True)
+    if not len(futures):
+        return pd.DataFrame({"name": pd.Series([], dtype="string"), KEY: pd.Series([], dtype="int64"),
+                             "expiry": pd.Series([], dtype="datetime64[ns]")})
+    # Sort by name then expiry and keep the last row of each name
+    order = np.lexsort((futures["expiry"].to_numpy(), codes))
+    last = order[np.r_[np.flatnonzero(np.diff(codes[order])), len(order) - 1]]
+    return futures.iloc[last][["name", KEY, "expiry"]].reset_index(drop=True)
+
+
+class KiteInstrumentCache(object):
+    """
+    Day-to-day cache of the Kite instruments dump and of the F&O future tokens derived from it.
+
+    refresh() downloads the dump (conditionally, when the server sends validators) and does
+    nothing more when its bytes are the ones already cached. Otherwise the new dump is
+    diffed against the cached copy by instrument_token and only the underlyings touched by
+    the diff, or whose selected future has expired since, get their latest future chosen
+    again. The parsed dump is kept as a parquet file (when pyarrow is installed) and the
+    derived futures in meta.json, so a restarted process picks up where it left off.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, url=KITE_INSTRUMENTS_URL, timeout=10, index_pattern=INDEX_PATTERN):
+        self.cache_dir = cache_dir
+        self.url = url
+        self.timeout = timeout
+        self.index_pattern = index_pattern
+        self.meta = self._read_meta()
+        self._frame = None
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.cache_dir, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._path(META_FILE), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self):
+        temp_path = f"{self._path(META_FILE)}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(temp_path, self._path(META_FILE))
+
+    def instruments(self):
+        """
+            The cached parsed dump, or None before the first refresh
+        """
+        if self._frame is None and pq is not None and os.path.exists(self._path(INSTRUMENTS_FILE)):
+            self._frame = pd.read_parquet(self._path(INSTRUMENTS_FILE))
+        return self._frame
+
+    def _has_instruments(self):
+        return self._frame is not None or (pq is not None and os.path.exists(self._path(INSTRUMENTS_FILE)))
+
+    def _save_instruments(self, frame):
+        self._frame = frame
+        if pq is None:
+            return
+        temp_path = f"{self._path(INSTRUMENTS_FILE)}.{uuid.uuid4().hex}.tmp"
+        frame.to_parquet(temp_path, index=False)
+        os.replace(temp_path, self._path(INSTRUMENTS_FILE))
+
+    def _download(self):
+        """
+            Content of the dump, or None when it is the cached one
+        """
+        headers = {}
+        if self.meta.get("etag"):
+            headers["If-None-Match"] = self.meta["etag"]
+        if self.meta.get("last_modified"):
+            headers["If-Modified-Since"] = self.meta["last_modified"]
+        response = requests.get(self.url, headers=headers, timeout=self.timeout)
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        self.meta["etag"] = response.headers.get("ETag")
+        self.meta["last_modified"] = response.headers.get("Last-Modified")
+        return response.content
+
+    def refresh(self, now=None, content=None):
+        """
+            Bring the cache up to date with the dump; content (the CSV bytes) skips the download.
+            Returns the refresh statistics: whether the dump changed, the added / removed /
+            changed instrument counts, the underlyings whose future was selected again and the
+            time taken.
+        """
+        now = now or datetime.now()
+        started = time.perf_counter()
+        stats = {"changed": False, "added": 0, "removed": 0, "changed_instruments": 0, "reselected": 0}
+        with self._lock:
+            if content is None:
+                content = self._download()
+            full = "futures" not in self.meta or self.meta.get("index_pattern") != self.index_pattern
+            touched = set()
+            # Unchanged bytes are not parsed again, unless the parsed copy could not be kept
+            if content is not None and (hashlib.sha1(content).hexdigest() != self.meta.get("sha1")
+                                        or not self._has_instruments()):
+                new = parse_instruments(content)
+                old = self.instruments()
+                if old is None:
+                    full = True
+                    stats["added"] = len(new)
+                else:
+                    diff = diff_instruments(old, new)
+                    stats.update(added=len(diff["added"]), removed=len(diff["removed"]),
+                                 changed_instruments=len(diff["changed"]))
+                    for part in diff.values():
+                        touched.update(part.loc[(part["exchange"] == "NFO").to_numpy(), "name"].dropna().tolist())
+                self._save_instruments(new)
+                self.meta["sha1"] = hashlib.sha1(content).hexdigest()
+                stats["changed"] = True
+            stats["reselected"] = self._update_futures(now, touched, full)
+            self.meta["refreshed_at"] = now.isoformat()
+            self._write_meta()
+        stats["seconds"] = time.perf_counter() - started
+        logger.info(f"Kite instruments refreshed in {stats['seconds'] * 1000:.0f} ms: {stats['added']} added, "
+                    f"{stats['removed']} removed, {stats['changed_instruments']} changed, "
+                    f"{stats['reselected']} underlyings reselected")
+        return stats
+
+    def _update_futures(self, now, touched, full):
+        """
+            Select the latest future again for the touched underlyings and those whose selected
+            future has expired (or for every underlying when full); returns how many were selected
+        """
+        futures = {} if full else dict(self.meta["futures"])
+        expired = {name for name, (_, expiry) in futures.items() if datetime.fromisoformat(expiry) < now}
+        affected = touched | expired
+        if not full and not affected:
+            return 0
+        frame = self.instruments()
+        if frame is None:
+            # Nothing to select from (no dump yet, or 304 in a process without the parsed copy)
+            for name in expired:
+                futures.pop(name)
+            self.meta["futures"] = futures
+            return 0
+        if not full:
+            frame = frame[frame["name"].isin(affected).fillna(False).to_numpy()]
+            for name in affected:
+                futures.pop(name, None)
+        selected = latest_futures(frame, now, self.index_pattern)
+        futures.update({name: [int(token), expiry.isoformat()] for name, token, expiry in
+                        zip(selected["name"], selected[KEY], selected["expiry"])})
+        self.meta["futures"] = dict(sorted(futures.items()))
+        self.meta["index_pattern"] = self.index_pattern
+        return len(selected) if full else len(affected)
+
+    def fno_tokens(self):
+        """
+            Tokens (as strings, by underlying name) of the latest future of every F&O stock
+        """
+        return [str(token) for token, _ in self.meta.get("futures", {}).values()]
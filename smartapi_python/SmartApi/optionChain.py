@@ -0,0 +1,200 @@
+import threading
+from datetime import date
+import numpy as np
+from logzero import logger
+from SmartApi.instrumentMaster import expiry_key
+
+
+# exch_seg of the scrip master -> exchangeType of SmartWebSocketV2 subscriptions
+EXCHANGE_TYPES = {"NSE": 1, "NFO": 2, "BSE": 3, "BFO": 4, "MCX": 5, "NCDEX": 7, "CDS": 13}
+
+CE = 1
+PE = 2
+MISSING_TOKEN = -1
+
+MONTHS = ("JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC")
+
+# Multipliers mixing the fields of an option row into its 64-bit fingerprint
+_TOKEN_MIX = np.uint64(0x9E3779B97F4A7C15)
+_STRIKE_MIX = np.uint64(0xC2B2AE3D27D4EB4F)
+_TYPE_MIX = np.uint64(0x165667B19E3779F9)
+
+
+class OptionChain(object):
+    """
+    The options of one underlying and expiry, by strike.
+
+    strikes is sorted ascending and ce_tokens / pe_tokens hold the token of the call and the
+    put at each strike (MISSING_TOKEN where the exchange lists only one side). Strike lookups
+    are binary searches on strikes, and strike ranges are plain slices of the three arrays.
+    """
+
+    def __init__(self, exch_seg, name, expiry, strikes, ce_tokens, pe_tokens, fingerprint=None):
+        self.exch_seg = exch_seg
+        self.name = name
+        self.expiry = expiry
+        self.strikes = strikes
+        self.ce_tokens = ce_tokens
+        self.pe_tokens = pe_tokens
+        self.fingerprint = fingerprint
+
+    def __len__(self):
+        return len(self.strikes)
+
+    def __repr__(self):
+        return f"OptionChain({self.exch_seg} {self.name} {self.expiry}: {len(self)} strikes)"
+
+    def nearest(self, price):
+        """
+            Position of the strike closest to price (the lower one on a tie)
+        """
+        position = int(np.searchsorted(self.strikes, price))
+        if position == len(self.strikes):
+            return position - 1
+        if position > 0 and price - self.strikes[position - 1] <= self.strikes[position] - price:
+            return position - 1
+        return position
+
+    def atm_strike(self, price):
+        return float(self.strikes[self.nearest(price)])
+
+    def around(self, price, count):
+        """
+            slice of the strike nearest to price and up to count strikes on each side of it
+        """
+        position = self.nearest(price)
+        return slice(max(0, position - count), min(len(self.strikes), position + count + 1))
+
+    def between(self, low, high):
+        """
+            slice of the strikes from low to high, both included
+        """
+        return slice(int(np.searchsorted(self.strikes, low, "left")), int(np.searchsorted(self.strikes, high, "right")))
+
+    def tokens(self, strikes=slice(None), option_type=None):
+        """
+            Tokens (as strings) of the calls then the puts of a strike slice; option_type "CE" or "PE" picks one side
+        """
+        sides = {"CE": (self.ce_tokens,), "PE": (self.pe_tokens,), None: (self.ce_tokens, self.pe_tokens)}[option_type]
+        return [str(token) for side in sides for token in side[strikes].tolist() if token != MISSING_TOKEN]
+
+    def subscription(self, strikes=slice(None), option_type=None):
+        """
+            token_list of a SmartWebSocketV2.subscribe call for the options of a strike slice
+        """
+        return [{"exchangeType": EXCHANGE_TYPES[self.exch_seg], "tokens": self.tokens(strikes, option_type)}]
+
+    def greek_params(self):
+        """
+            params of a SmartConnect.optionGreek call for this underlying and expiry
+        """
+        year, month, day = self.expiry // 10000, self.expiry // 100 % 100, self.expiry % 100
+        return {"name": self.name, "expirydate": f"{day:02d}{MONTHS[month - 1]}{year}"}
+
+
+class OptionChainIndex(object):
+    """
+    Every option chain of an instrument master, by (exch_seg, name, expiry).
+
+    update() builds the chains from the master's columns in one vectorized pass: the option
+    rows are sorted by exchange, name, expiry, strike and type, and each run of equal
+    (exch_seg, name, expiry) becomes one OptionChain. Each chain carries a fingerprint of
+    its rows, so updating from a newer master only builds the chains whose options changed
+    and keeps the other OptionChain objects as they are; strategies holding a chain are
+    not affected by a master refresh that did not touch it.
+    """
+
+    def __init__(self, master=None):
+        self.chains = {}
+        self.build = None
+        self._expiries = {}
+        self._lock = threading.Lock()
+        if master is not None:
+            self.update(master)
+
+    def __len__(self):
+        return len(self.chains)
+
+    def update(self, master):
+        """
+            Bring the index in line with master (an InstrumentMaster); returns the counts of
+            chains kept, rebuilt and removed
+        """
+        with self._lock:
+            build = master.meta.get("build")
+            if build is not None and build == self.build:
+                return {"chains": len(self.chains), "kept": len(self.chains), "rebuilt": 0, "removed": 0}
+            columns = master.columns
+            rows = np.flatnonzero(np.asarray(columns["option_type"]) > 0)
+            exch_seg = np.asarray(columns["exch_seg"])[rows]
+            name = np.asarray(columns["name"])[rows]
+            expiry = np.asarray(columns["expiry"])[rows]
+            strike = np.asarray(columns["strike"])[rows]
+            option_type = np.asarray(columns["option_type"])[rows]
+            token = np.asarray(columns["token"])[rows]
+            order = np.lexsort((option_type, strike, expiry, name, exch_seg))
+            exch_seg, name, expiry = exch_seg[order], name[order], expiry[order]
+            strike, option_type, token = strike[order], option_type[order], token[order]
+
+            boundary = (np.diff(exch_seg) != 0) | (np.diff(name) != 0) | (np.diff(expiry) != 0)
+            starts = np.r_[0, np.flatnonzero(boundary) + 1] if len(order) else np.empty(0, dtype="int64")
+            ends = np.r_[starts[1:], len(order)]
+            with np.errstate(over="ignore"):
+                mixed = (token.astype("uint64") * _TOKEN_MIX ^
+                         np.round(strike * 100).astype("int64").astype("uint64") * _STRIKE_MIX ^
+                         option_type.astype("uint64") * _TYPE_MIX)
+            fingerprints = np.add.reduceat(mixed, starts) if len(starts) else np.empty(0, dtype="uint64")
+
+            exch_names = master.categories["exch_seg"]
+            names = master.categories["name"]
+            chains = {}
+            expiries = {}
+            rebuilt = 0
+            for start, end, fingerprint in zip(starts.tolist(), ends.tolist(), fingerprints.tolist()):
+                key = (exch_names[exch_seg[start]], names[name[start]], int(expiry[start]))
+                fingerprint = (end - start, fingerprint)
+                chain = self.chains.get(key)
+                if chain is None or chain.fingerprint != fingerprint:
+                    chain = self._build_chain(key, strike[start:end], option_type[start:end], token[start:end], fingerprint)
+                    rebuilt += 1
+                chains[key] = chain
+                expiries.setdefault(key[:2], []).append(key[2])
+            removed = len(self.chains.keys() - chains.keys())
+            self.chains = chains
+            self._expiries = expiries
+            self.build = build
+        stats = {"chains": len(chains), "kept": len(chains) - rebuilt, "rebuilt": rebuilt, "removed": removed}
+        logger.info(f"Option chains of build {build}: {stats['kept']} kept, {rebuilt} rebuilt, {removed} removed")
+        return stats
+
+    @staticmethod
+    def _build_chain(key, strike, option_type, token, fingerprint):
+        # Rows are sorted by strike, so the distinct strikes are the first row of each run
+        first = np.r_[True, np.diff(strike) != 0]
+        strikes = strike[first]
+        positions = np.cumsum(first) - 1
+        sides = []
+        for side in (CE, PE):
+            tokens = np.full(len(strikes), MISSING_TOKEN, dtype="int32")
+            is_side = option_type == side
+            tokens[positions[is_side]] = token[is_side]
+            sides.append(tokens)
+        return OptionChain(key[0], key[1], key[2], strikes, sides[0], sides[1], fingerprint)
+
+    def expiries(self, name, exch_seg="NFO"):
+        """
+            Sorted YYYYMMDD expiries with options listed for name
+        """
+        return list(self._expiries.get((exch_seg, name), ()))
+
+    def chain(self, name, expiry=None, exch_seg="NFO", on=None):
+        """
+            OptionChain of name and expiry, or None; without expiry, the chain of the nearest
+            expiry on or after on (today by default)
+        """
+        if expiry is None:
+            day = expiry_key(on or date.today())
+            expiry = next((value for value in self.expiries(name, exch_seg) if value >= day), None)
+            if expiry is None:
+                return None
+        return self.chains.get((exch_seg, name, expiry_key(expiry)))
@@ -0,0 +1,226 @@
+import json
+import asyncio
+import threading
+from collections import namedtuple
+from concurrent.futures import Future
+from datetime import datetime
+
+
+ORDER_STATUS_COMPLETE = "complete"
+ORDER_STATUS_REJECTED = "rejected"
+ORDER_STATUS_CANCELLED = "cancelled"
+ORDER_STATUS_OPEN = "open"
+# Statuses after which an order never changes again
+TERMINAL_STATUSES = frozenset([ORDER_STATUS_COMPLETE, ORDER_STATUS_REJECTED, ORDER_STATUS_CANCELLED])
+# updatetime of the order book and of order-update pushes, e.g. "25-Feb-2025 09:54:02"
+UPDATE_TIME_FORMAT = "%d-%b-%Y %H:%M:%S"
+
+OrderUpdate = namedtuple("OrderUpdate", [
+    "order_id", "unique_order_id", "status", "symbol", "symbol_token", "exchange", "transaction_type",
+    "order_type", "product_type", "variety", "quantity", "filled_quantity", "unfilled_quantity", "price",
+    "trigger_price", "average_price", "text", "update_time", "exchange_time", "order_tag", "raw"
+])
+
+
+def _to_int(value):
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def update_time_key(update):
+    """
+        datetime of an OrderUpdate's update_time, or None when it is missing or not parseable
+    """
+    try:
+        return datetime.strptime(str(update.update_time).strip(), UPDATE_TIME_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+def order_update_from_dict(order):
+    """
+        Build an OrderUpdate from an order dict as sent by the order-update socket or returned by orderBook()
+    """
+    order_id = order.get("orderid")
+    if not order_id:
+        return None
+    status = (order.get("orderstatus") or order.get("status") or "").strip().lower()
+    return OrderUpdate(
+        order_id=str(order_id),
+        unique_order_id=order.get("uniqueorderid"),
+        status=status,
+        symbol=order.get("tradingsymbol"),
+        symbol_token=order.get("symboltoken"),
+        exchange=order.get("exchange"),
+        transaction_type=order.get("transactiontype"),
+        order_type=order.get("ordertype"),
+        product_type=order.get("producttype"),
+        variety=order.get("variety"),
+        quantity=_to_int(order.get("quantity")),
+        filled_quantity=_to_int(order.get("filledshares")),
+        unfilled_quantity=_to_int(order.get("unfilledshares")),
+        price=_to_float(order.get("price")),
+        trigger_price=_to_float(order.get("triggerprice")),
+        average_price=_to_float(order.get("averageprice")),
+        text=order.get("text"),
+        update_time=order.get("updatetime"),
+        exchange_time=order.get("exchtime") or order.get("exchorderupdatetime"),
+        order_tag=order.get("ordertag"),
+        raw=order
+    )
+
+
+def parse_order_update(message):
+    """
+        Parse a raw order-update socket message into an OrderUpdate, or None for
+        heartbeats, connection acknowledgements and anything that is not an order
+    """
+    if isinstance(message, bytes):
+        message = message.decode("utf-8", "ignore")
+    if not message or message[0] != "{":
+        return None
+    try:
+        payload = json.loads(message)
+    except ValueError:
+        return None
+    order = payload.get("orderData")
+    if not isinstance(order, dict):
+        return None
+    return order_update_from_dict(order)
+
+
+class OrderStateCache(object):
+    """
+    In-memory order book kept current from order-update pushes.
+
+    Orders are indexed by order id and by trading symbol. wait_for_status() returns a
+    concurrent.futures.Future resolved with the OrderUpdate once the order reaches one of
+    the requested statuses (TERMINAL_STATUSES by default); wait() blocks on it and
+    wait_async() awaits it from asyncio code. A terminal status is never replaced by a
+    late non-terminal update, and an update stamped earlier than the stored one (a push
+    delivered out of order, or an orderBook() seed older than the pushes) is ignored.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._orders = {}
+        self._by_symbol = {}
+        self._waiters = {}
+
+    def apply(self, update):
+        """
+            Store an OrderUpdate and resolve any waiters it satisfies. Returns True if the cache changed.
+        """
+        if update is None:
+            return False
+        resolved = []
+        with self._lock:
+            current = self._orders.get(update.order_id)
+            if current is not None and current.status in TERMINAL_STATUSES and update.status not in TERMINAL_STATUSES:
+                return False
+            # A terminal status still ends an open order whatever its time says
+            if current is not None and self._is_older(update, current) and \
+                    (update.status not in TERMINAL_STATUSES or current.status in TERMINAL_STATUSES):
+                return False
+            self._orders[update.order_id] = update
+            if update.symbol:
+                self._by_symbol.setdefault(update.symbol, set()).add(update.order_id)
+            waiters = self._waiters.get(update.order_id)
+            if waiters:
+                remaining = []
+                for statuses, future in waiters:
+                    if update.status in statuses:
+                        resolved.append(future)
+                    else:
+                        remaining.append((statuses, future))
+                if remaining:
+                    self._waiters[update.order_id] = remaining
+                else:
+                    del self._waiters[update.order_id]
+        for future in resolved:
+            if not future.done():
+                future.set_result(update)
+        return True
+
+    @staticmethod
+    def _is_older(update, current):
+        update_time = update_time_key(update)
+        current_time = update_time_key(current)
+        return update_time is not None and current_time is not None and update_time < current_time
+
+    def seed(self, order_book_response):
+        """
+            Load the response of SmartConnect.orderBook() once at start-up
+        """
+        orders = (order_book_response or {}).get("data") or []
+        for order in orders:
+            self.apply(order_update_from_dict(order))
+        return len(orders)
+
+    def get(self, order_id):
+        with self._lock:
+            return self._orders.get(str(order_id))
+
+    def orders_for(self, symbol):
+        with self._lock:
+            return [self._orders[order_id] for order_id in self._by_symbol.get(symbol, ())]
+
+    def open_orders(self):
+        with self._lock:
+            return [order for order in self._orders.values() if order.status not in TERMINAL_STATUSES]
+
+    def all_orders(self):
+        with self._lock:
+            return list(self._orders.values())
+
+    def wait_for_status(self, order_id, statuses=TERMINAL_STATUSES):
+        """
+            Future resolved with the OrderUpdate once order_id reaches one of statuses
+        """
+        order_id = str(order_id)
+        statuses = frozenset(status.lower() for status in statuses)
+        future = Future()
+        with self._lock:
+            current = self._orders.get(order_id)
+            if current is not None and current.status in statuses:
+                future.set_result(current)
+                return future
+            self._waiters.setdefault(order_id, []).append((statuses, future))
+        future.add_done_callback(lambda f: self._discard_waiter(order_id, f))
+        return future
+
+    def _discard_waiter(self, order_id, future):
+        if not future.cancelled():
+            return
+        with self._lock:
+            waiters = self._waiters.get(order_id)
+            if waiters:
+                waiters[:] = [waiter for waiter in waiters if waiter[1] is not future]
+                if not waiters:
+                    del self._waiters[order_id]
+
+    def wait(self, order_id, statuses=TERMINAL_STATUSES, timeout=None):
+        """
+            Block until order_id reaches one of statuses; raises concurrent.futures.TimeoutError
+        """
+        future = self.wait_for_status(order_id, statuses)
+        try:
+            return future.result(timeout)
+        except Exception:
+            future.cancel()
+            raise
+
+    def wait_async(self, order_id, statuses=TERMINAL_STATUSES):
+        """
+            Awaitable variant of wait_for_status for use inside a running asyncio loop
+        """
+        return asyncio.wrap_future(self.wait_for_status(order_id, statuses))
@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+
+
+DEPTH_LEVELS = 5
+
+# Seconds to subtract from an exchange (IST) wall-clock time to get a UTC epoch
+IST_OFFSET_SECONDS = 19800
+
+# One FULL-mode quote as a fixed-width little-endian record (356 bytes). Missing prices are
+# NaN, missing quantities 0, and times are UTC epoch seconds (0 when absent). Depth levels
+# the exchange did not send are left at price NaN / quantity 0 / orders 0.
+QUOTE_DTYPE = np.dtype([
+    ("token", "<i4"),
+    ("exch_feed_time", "<i8"),
+    ("exch_trade_time", "<i8"),
+    ("ltp", "<f8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("net_change", "<f8"),
+    ("percent_change", "<f8"),
+    ("avg_price", "<f8"),
+    ("last_trade_qty", "<i8"),
+    ("trade_volume", "<i8"),
+    ("open_interest", "<i8"),
+    ("tot_buy_qty", "<i8"),
+    ("tot_sell_qty", "<i8"),
+    ("lower_circuit", "<f8"),
+    ("upper_circuit", "<f8"),
+    ("week52_low", "<f8"),
+    ("week52_high", "<f8"),
+    ("bid_price", "<f8", (DEPTH_LEVELS,)),
+    ("bid_qty", "<i8", (DEPTH_LEVELS,)),
+    ("bid_orders", "<i4", (DEPTH_LEVELS,)),
+    ("ask_price", "<f8", (DEPTH_LEVELS,)),
+    ("ask_qty", "<i8", (DEPTH_LEVELS,)),
+    ("ask_orders", "<i4", (DEPTH_LEVELS,)),
+])
+
+# record field -> key of the quote API's "fetched" objects
+QUOTE_FIELDS = {
+    "token": "symbolToken",
+    "ltp": "ltp",
+    "open": "open",
+    "high": "high",
+    "low": "low",
+    "close": "close",
+    "net_change": "netChange",
+    "percent_change": "percentChange",
+    "avg_price": "avgPrice",
+    "last_trade_qty": "lastTradeQty",
+    "trade_volume": "tradeVolume",
+    "open_interest": "opnInterest",
+    "tot_buy_qty": "totBuyQuan",
+    "tot_sell_qty": "totSellQuan",
+    "lower_circuit": "lowerCircuit",
+    "upper_circuit": "upperCircuit",
+    "week52_low": "52WeekLow",
+    "week52_high": "52WeekHigh",
+}
+
+TIME_FIELDS = {"exch_feed_time": "exchFeedTime", "exch_trade_time": "exchTradeTime"}
+EXCHANGE_TIME_FORMAT = "%d-%b-%Y %H:%M:%S"
+
+# depth side of the API -> (price, quantity, orders) record fields
+DEPTH_FIELDS = {
+    "buy": ("bid_price", "bid_qty", "bid_orders"),
+    "sell": ("ask_price", "ask_qty", "ask_orders"),
+}
+
+SCALAR_FIELDS = [name for name in QUOTE_DTYPE.names if QUOTE_DTYPE[name].shape == ()]
+
+
+def clean_symbol(symbol):
+    return symbol[:-3] if symbol.endswith("-EQ") else symbol
+
+
+def _column(fetched, key):
+    return pd.to_numeric(pd.Series([quote.get(key) for quote in fetched], dtype=object), errors="coerce").to_numpy("float64")
+
+
+def _exchange_times(fetched, key):
+    times = pd.to_datetime(pd.Series([quote.get(key) for quote in fetched], dtype=object),
+                           format=EXCHANGE_TIME_FORMAT, errors="coerce")
+    seconds = (times - pd.Timestamp(1970, 1, 1)).dt.total_seconds().to_numpy("float64") - IST_OFFSET_SECONDS
+    return np.where(np.isnan(seconds), 0, seconds).astype("int64")
+
+
+def _depth(levels, key):
+    # Pad every instrument to DEPTH_LEVELS so the column converts to one 2-D array
+    padding = [None] * DEPTH_LEVELS
+    values = [([level.get(key) for level in side[:DEPTH_LEVELS]] + padding)[:DEPTH_LEVELS] for side in levels]
+    return pd.DataFrame(values).apply(pd.to_numeric, errors="coerce").to_numpy("float64").reshape(len(levels), DEPTH_LEVELS)
+
+
+def decode_quotes(fetched):
+    """
+        Decode the "fetched" list of a FULL-mode quote response into fixed-width records
+        Parameters
+        ------
+        fetched: list of dict
+            data["fetched"] of the market/v1/quote response
+        Returns (symbols, records): symbols is an object array of trading symbols without the
+        -EQ suffix and records a QUOTE_DTYPE array in the same order. Each field is converted
+        for the whole batch at once, not quote by quote.
+    """
+    count = len(fetched)
+    records = np.zeros(count, dtype=QUOTE_DTYPE)
+    if not count:
+        return np.empty(0, dtype=object), records
+    for name, key in QUOTE_FIELDS.items():
+        values = _column(fetched, key)
+        if records.dtype[name].kind == "f":
+            records[name] = values
+        else:
+            records[name] = np.where(np.isnan(values), 0, values)
+    for name, key in TIME_FIELDS.items():
+        records[name] = _exchange_times(fetched, key)
+    for side, (price, quantity, orders) in DEPTH_FIELDS.items():
+        levels = [(quote.get("depth") or {}).get(side) or [] for quote in fetched]
+        records[price] = _depth(levels, "price")
+        records[quantity] = np.nan_to_num(_depth(levels, "quantity"))
+        records[orders] = np.nan_to_num(_depth(levels, "orders"))
+    symbols = np.array([clean_symbol(quote.get("tradingSymbol") or f"Token_{quote.get('symbolToken')}")
+                        for quote in fetched], dtype=object)
+    return symbols, records
+
+
+def pack_record(record):
+    """
+        bytes of one QUOTE_DTYPE record, as stored in market_quotes.record
+    """
+    return record.tobytes()
+
+
+def unpack_records(blobs):
+    """
+        QUOTE_DTYPE array of a sequence of packed records
+    """
+    return np.frombuffer(b"".join(blobs), dtype=QUOTE_DTYPE)
+
+
+def record_trade_volume(blob):
+    """
+        Cumulative day volume (trade_volume) of one packed record
+    """
+    return int(np.frombuffer(blob, dtype=QUOTE_DTYPE, count=1)["trade_volume"][0])
+
+
+def depth_imbalance(records, levels=DEPTH_LEVELS):
+    """
+        (bid - ask) / (bid + ask) quantity over the top levels of each record; NaN for an empty book
+    """
+    bid = records["bid_qty"][:, :levels].sum(axis=1).astype("float64")
+    ask = records["ask_qty"][:, :levels].sum(axis=1).astype("float64")
+    total = bid + ask
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(total > 0, (bid - ask) / total, np.nan)
+
+
+def quote_frame(symbols, records):
+    """
+        DataFrame of the scalar fields of records plus spread, bid_depth, ask_depth and depth_imbalance;
+        exch_feed_time and exch_trade_time are converted back to IST datetimes
+    """
+    frame = pd.DataFrame({name: records[name] for name in SCALAR_FIELDS})
+    frame.insert(0, "symbol", np.asarray(symbols, dtype=object))
+    for name in TIME_FIELDS:
+        seconds = records[name].astype("float64")
+        seconds[seconds == 0] = np.nan
+        frame[name] = pd.to_datetime(seconds + IST_OFFSET_SECONDS, unit="s")
+    frame["spread"] = records["ask_price"][:, 0] - records["bid_price"][:, 0]
+    frame["bid_depth"] = records["bid_qty"].sum(axis=1)
+    frame["ask_depth"] = records["ask_qty"].sum(axis=1)
+    frame["depth_imbalance"] = depth_imbalance(records)
+    return frame
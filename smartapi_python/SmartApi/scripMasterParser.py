@@ -0,0 +1,138 @@
+import json
+import codecs
+import requests
+
+
+CHUNK_SIZE = 1 << 20
+# Fields that differ on (nearly) every row, not worth interning
+UNIQUE_FIELDS = ("token", "symbol")
+
+
+def _as_values(value):
+    if value is None:
+        return None
+    return frozenset([value] if isinstance(value, str) else value)
+
+
+class ScripMasterFilter(object):
+    """
+    Row filter applied while the scrip master is parsed.
+
+    exch_seg and instrumenttype each take one value or a collection of accepted values and
+    symbol_suffix a suffix or a tuple of suffixes (such as "-EQ"); a filter left as None
+    accepts everything. A row is kept when it passes every filter.
+    """
+
+    def __init__(self, exch_seg=None, instrumenttype=None, symbol_suffix=None):
+        self.values = {"exch_seg": _as_values(exch_seg), "instrumenttype": _as_values(instrumenttype)}
+        self.symbol_suffix = (symbol_suffix,) if isinstance(symbol_suffix, str) else \
+            (tuple(symbol_suffix) if symbol_suffix is not None else None)
+
+    def __call__(self, record):
+        for field, values in self.values.items():
+            if values is not None and (record.get(field) or "") not in values:
+                return False
+        if self.symbol_suffix is not None:
+            return (record.get("symbol") or "").strip().endswith(self.symbol_suffix)
+        return True
+
+    def to_dict(self):
+        """
+            JSON-serialisable form of the filter, stored with the builds made from it
+        """
+        filters = {field: sorted(values) for field, values in self.values.items() if values is not None}
+        if self.symbol_suffix is not None:
+            filters["symbol_suffix"] = sorted(self.symbol_suffix)
+        return filters
+
+
+def source_chunks(source, chunk_size=CHUNK_SIZE, timeout=30):
+    """
+        Iterator over the bytes of source: a local path, an http(s) URL or a binary file object
+    """
+    if hasattr(source, "read"):
+        return iter(lambda: source.read(chunk_size), b"")
+    if str(source).startswith(("http://", "https://")):
+        def download():
+            with requests.get(source, stream=True, timeout=timeout) as response:
+                response.raise_for_status()
+                for chunk in response.iter_content(chunk_size):
+                    yield chunk
+        return download()
+
+    def read():
+        with open(source, "rb") as f:
+            for chunk in iter(lambda: f.read(chunk_size), b""):
+                yield chunk
+    return read()
+
+
+def iter_scrip_master(chunks, exch_seg=None, instrumenttype=None, symbol_suffix=None, row_filter=None):
+    """
+        Parse the scrip master JSON array incrementally and yield the instrument dicts that pass the filters
+        Parameters
+        ------
+        chunks: iterable of bytes
+            the file as it is read or downloaded (see source_chunks)
+        exch_seg, instrumenttype, symbol_suffix:
+            see ScripMasterFilter; or pass a ready row_filter
+        Only the unparsed tail of the current chunk and the rows that are kept are held in
+        memory, so the whole file is never materialised as one string or one list of dicts.
+    """
+    row_filter = row_filter or ScripMasterFilter(exch_seg, instrumenttype, symbol_suffix)
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    started = False
+    chunks = iter(chunks)
+    exhausted = False
+    while True:
+        # Skip the separators between objects
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer) and not started:
+            if buffer[position] != "[":
+                raise ValueError("The scrip master is not a JSON array")
+            started = True
+            position += 1
+            continue
+        if position < len(buffer) and buffer[position] == "]":
+            return
+        if position < len(buffer):
+            try:
+                record, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                # The object runs past the end of the buffer (or is malformed, which shows once the input is exhausted)
+                if exhausted:
+                    raise
+            else:
+                position = end
+                if row_filter(record):
+                    yield record
+                continue
+        if exhausted:
+            raise ValueError("The scrip master ended before its closing bracket")
+        chunk = next(chunks, None)
+        if chunk is None:
+            exhausted = True
+            buffer = buffer[position:] + utf8.decode(b"", final=True)
+        else:
+            buffer = buffer[position:] + utf8.decode(chunk)
+        position = 0
+
+
+def scrip_master_columns(chunks, fields, **filters):
+    """
+        {field: list of values} of the rows of the scrip master that pass the filters (see iter_scrip_master)
+    """
+    columns = {field: [] for field in fields}
+    # Most fields repeat a handful of values (exchange, expiry, lot size...); keeping one
+    # string object per distinct value instead of one per row roughly halves the columns
+    memos = {field: {} for field in fields if field not in UNIQUE_FIELDS}
+    appends = [(field, columns[field].append, memos[field].setdefault if field in memos else None) for field in fields]
+    for record in iter_scrip_master(chunks, **filters):
+        for field, append, memo in appends:
+            value = record.get(field)
+            append(memo(value, value) if memo is not None else value)
+    return columns
@@ -0,0 +1,243 @@
+import math
+import time
+import threading
+from collections import deque
+from datetime import date, datetime, time as dtime, timedelta
+import requests
+from logzero import logger
+from SmartApi.snapshotPipeline import SnapshotPipeline
+
+
+MARKET_OPEN = dtime(9, 15)
+MARKET_CLOSE = dtime(15, 30)
+QUOTE_URL = "https://apiconnect.angelone.in/rest/secure/angelbroking/market/v1/quote/"
+
+# errorcodes of the quote API that mean the jwt token has expired or is invalid
+AUTH_ERROR_CODES = ("AG8001", "AG8002", "AG8003", "AB1010")
+
+
+def _as_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value).strip()[:10], "%Y-%m-%d").date()
+
+
+class TradingCalendar(object):
+    """
+    Trading days and session hours of the exchange.
+
+    Saturdays, Sundays and the given holidays are closed; every other day trades from
+    open_time to close_time on the local clock (IST).
+    """
+
+    def __init__(self, holidays=(), open_time=MARKET_OPEN, close_time=MARKET_CLOSE):
+        self.holidays = set(_as_date(day) for day in holidays)
+        self.open_time = open_time
+        self.close_time = close_time
+
+    @classmethod
+    def from_file(cls, path, **kwargs):
+        """
+            Calendar with the holidays listed in path, one YYYY-MM-DD date per line ('#' starts a comment)
+        """
+        with open(path, "r") as f:
+            lines = [line.split("#", 1)[0].strip() for line in f]
+        return cls([line for line in lines if line], **kwargs)
+
+    def is_trading_day(self, day):
+        day = _as_date(day)
+        return day.weekday() < 5 and day not in self.holidays
+
+    def session(self, day):
+        day = _as_date(day)
+        return datetime.combine(day, self.open_time), datetime.combine(day, self.close_time)
+
+    def next_session(self, now=None):
+        """
+            (open, close) of the session in progress at now, or of the next one
+        """
+        now = now or datetime.now()
+        day = now.date()
+        for _ in range(366):
+            if self.is_trading_day(day):
+                session_open, session_close = self.session(day)
+                if now < session_close:
+                    return session_open, session_close
+            day += timedelta(days=1)
+        raise ValueError("No trading day within a year of " + str(now.date()))
+
+
+class QuoteClient(object):
+    """
+    FULL-mode quote fetcher that reuses one login and one pool of keep-alive connections.
+
+    login is called once, on the first request, and must return a jwt token; it is called
+    again only when the API rejects the token, by whichever thread sees the rejection first.
+    fetch() is safe to call from several threads at once.
+    """
+
+    def __init__(self, login, headers, exchange="NSE", pool_size=4, timeout=10, url=QUOTE_URL):
+        self.login = login
+        self.headers = dict(headers)
+        self.exchange = exchange
+        self.timeout = timeout
+        self.url = url
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self._jwt_token = None
+        self._login_lock = threading.Lock()
+        self.logins = 0
+
+    def _token(self, rejected=None):
+        with self._login_lock:
+            # Another thread may have logged in again while this one waited for the lock
+            if self._jwt_token is None or self._jwt_token == rejected:
+                jwt_token = self.login()
+                if not jwt_token:
+                    raise Exception("Login failed")
+                self._jwt_token = jwt_token
+                self.logins += 1
+            return self._jwt_token
+
+    def fetch(self, tokens):
+        """
+            Quotes of tokens; returns the list of "fetched" instruments
+        """
+        payload = {"mode": "FULL", "exchangeTokens": {self.exchange: list(tokens)}}
+        jwt_token = self._token()
+        for attempt in range(2):
+            headers = dict(self.headers, Authorization=jwt_token)
+            response = self.session.post(self.url, headers=headers, json=payload, timeout=self.timeout)
+            data = response.json() if response.content else {}
+            if response.status_code in (401, 403) or data.get("errorcode") in AUTH_ERROR_CODES:
+                if attempt == 0:
+                    jwt_token = self._token(rejected=jwt_token)
+                    continue
+            response.raise_for_status()
+            if not data.get("status"):
+                raise Exception(f"Quote request failed: {data.get('message')} ({data.get('errorcode')})")
+            return (data.get("data") or {}).get("fetched") or []
+        raise Exception("Quote request rejected after logging in again")
+
+    def close(self):
+        self.session.close()
+
+
+class SnapshotDaemon(object):
+    """
+    Snapshots the buy/sell quantities of a token universe every interval seconds during market hours.
+
+    Cycles are scheduled at fixed offsets from the session open (09:15:00, 09:16:00, ... for
+    a 60 second interval), measured on the monotonic clock, so the schedule does not drift
+    however long each cycle takes. A cycle that is still running when the next one is due
+    makes that one (and any other missed) be skipped rather than started late. Every row
+    of a cycle is stamped with the cycle's scheduled time, which gives each symbol a
+    regular intraday series of totBuyQuan/totSellQuan in market_snapshots, with the full
+    quote of each row in market_quotes.
+
+    Each cycle is one SnapshotPipeline run: fetching, decoding and writing overlap, the
+    cycle is committed as one transaction and its per-stage timing is kept in cycles. A
+    failed database write is raised and ends the session. client is a QuoteClient (or
+    anything with a fetch(tokens) method returning the fetched instruments).
+    """
+
+    INTERVAL = 60
+    WORKERS = SnapshotPipeline.FETCH_WORKERS
+    CYCLE_HISTORY = 1000
+    START_GRACE = 1.0
+
+    def __init__(self, client, token_batches, db_file, interval=INTERVAL, calendar=None, workers=WORKERS,
+                 history_store=None, decode_workers=SnapshotPipeline.DECODE_WORKERS):
+        self.client = client
+        self.token_batches = [list(batch) for batch in token_batches]
+        self.db_file = db_file
+        self.interval = interval
+        self.calendar = calendar or TradingCalendar()
+        self.pipeline = SnapshotPipeline(client.fetch, db_file, fetch_workers=workers, decode_workers=decode_workers,
+                                         history_store=history_store)
+        self.cycles = deque(maxlen=self.CYCLE_HISTORY)
+        self.cycles_run = 0
+        self.cycles_skipped = 0
+        self.rows_written = 0
+        self._stop = threading.Event()
+
+    def run(self, until=None):
+        """
+            Run sessions until stop() is called (or until the datetime until), sleeping between them
+        """
+        while not self._stop.is_set():
+            session_open, session_close = self.calendar.next_session()
+            if until is not None:
+                if session_open >= until:
+                    break
+                session_close = min(session_close, until)
+            wait = (session_open - datetime.now()).total_seconds()
+            if wait > 0:
+                logger.info(f"Next session opens at {session_open}, sleeping {wait / 60:.0f} min")
+                if self._stop.wait(wait):
+                    break
+            self.run_session(session_open, session_close)
+            # The last cycle can end before the close; wait it out so the same session is not picked again
+            if self._stop.wait(max(0.0, (session_close - datetime.now()).total_seconds()) + 1):
+                break
+            if until is not None and datetime.now() >= until:
+                break
+        return self.stats()
+
+    def run_session(self, session_open, session_close):
+        """
+            Run the cycles of one session; returns when it closes or stop() is called
+        """
+        # Monotonic time of the session open, so cycles stay on schedule if the wall clock is adjusted
+        anchor = time.monotonic() - (datetime.now() - session_open).total_seconds()
+        last_cycle = math.floor((session_close - session_open).total_seconds() / self.interval)
+        # A cycle that fell due less than START_GRACE seconds ago (the open itself, usually) still runs
+        cycle = max(0, math.ceil((time.monotonic() - anchor - self.START_GRACE) / self.interval))
+        logger.info(f"Session {session_open} - {session_close}: {len(self.token_batches)} batches every {self.interval}s")
+        while cycle <= last_cycle and not self._stop.is_set():
+            due = anchor + cycle * self.interval
+            if self._stop.wait(max(0.0, due - time.monotonic())):
+                break
+            self._run_cycle(session_open + timedelta(seconds=cycle * self.interval), due)
+            next_cycle = max(cycle + 1, math.ceil((time.monotonic() - anchor) / self.interval))
+            skipped = min(next_cycle, last_cycle + 1) - cycle - 1
+            if skipped:
+                self.cycles_skipped += skipped
+                logger.warning(f"Cycle at {session_open + timedelta(seconds=cycle * self.interval):%H:%M:%S} "
+                               f"overran its {self.interval}s interval, skipping {skipped} cycle(s)")
+            cycle = next_cycle
+
+    def _run_cycle(self, timestamp, due):
+        lag_seconds = time.monotonic() - due
+        stats = self.pipeline.run(self.token_batches, timestamp)
+        stats.update(timestamp=timestamp, lag_seconds=lag_seconds)
+        self.cycles.append(stats)
+        self.cycles_run += 1
+        self.rows_written += stats["rows_written"]
+
+    def stop(self):
+        self._stop.set()
+
+    def stats(self):
+        """
+            Cycle counts, cycle wall times and the mean busy time of each pipeline stage over the
+            recent cycles
+        """
+        cycles = list(self.cycles)
+        seconds = [cycle["seconds"] for cycle in cycles]
+        stages = {}
+        for cycle in cycles:
+            for name, stage in cycle["stages"].items():
+                stages[name] = stages.get(name, 0.0) + stage["stage_seconds"] / len(cycles)
+        return {
+            "cycles_run": self.cycles_run,
+            "cycles_skipped": self.cycles_skipped,
+            "rows_written": self.rows_written,
+            "mean_cycle_seconds": sum(seconds) / len(seconds) if seconds else None,
+            "max_cycle_seconds": max(seconds) if seconds else None,
+            "mean_stage_seconds": stages,
+            "bottleneck": max(stages, key=stages.get) if stages else None
+        }
@@ -0,0 +1,396 @@
+import os
+import sys
+import time
+import queue
+import sqlite3
+import argparse
+import threading
+from logzero import logger
+from SmartApi.snapshotSchema import (DAILY_ROLLUP_TABLE, INSERT_QUOTE, INSERT_SNAPSHOT, LEGACY_TABLE, QUOTE_TABLE,
+                                     SNAPSHOT_TABLE, compacted_hours, ensure_schema, parse_legacy_row, percentages,
+                                     refresh_rollups)
+from SmartApi.snapshotWriter import WRITER_PRAGMAS
+from SmartApi.quoteRecord import record_trade_volume
+
+
+MERGE_CHUNK_SIZE = 20000
+MERGE_WORKERS = 4
+QUEUED_CHUNKS = 2  # chunks a shard reader reads ahead of the merge
+
+SELECT_STORED_SNAPSHOT = f"""
+    SELECT buy_qty, sell_qty, buy_pct, sell_pct FROM {SNAPSHOT_TABLE}
+    WHERE symbol = ? AND trade_date = ? AND snapshot_time = ?
+"""
+
+# The time of the snapshot retention kept of a (symbol, trade_date) it compacted: a day whose
+# rollup counts more snapshots than are stored
+SELECT_COMPACTED_DAY = f"""
+    SELECT max(s.snapshot_time) FROM {DAILY_ROLLUP_TABLE} AS d
+    JOIN {SNAPSHOT_TABLE} AS s ON s.symbol = d.symbol AND s.trade_date = d.trade_date
+    WHERE d.symbol = ?1 AND d.trade_date = ?2
+    GROUP BY d.symbol, d.trade_date
+    HAVING d.samples > count(*)
+"""
+
+SELECT_STORED_QUOTE = f"""
+    SELECT record FROM {QUOTE_TABLE} WHERE symbol = ? AND trade_date = ? AND snapshot_time = ?
+"""
+
+DELETE_QUOTE = f"DELETE FROM {QUOTE_TABLE} WHERE symbol = ? AND trade_date = ? AND snapshot_time = ?"
+
+# Every key the merge read, with the values it had before the merge (existed = 0 for new
+# keys) and the position of the last shard that wrote it (-1 while no shard changed it)
+CREATE_MERGE_KEYS = """
+    CREATE TEMP TABLE merge_keys (
+        symbol TEXT NOT NULL,
+        trade_date INTEGER NOT NULL,
+        snapshot_time INTEGER NOT NULL,
+        shard INTEGER NOT NULL,
+        existed INTEGER NOT NULL,
+        buy_qty INTEGER,
+        sell_qty INTEGER,
+        buy_pct REAL,
+        sell_pct REAL,
+        PRIMARY KEY (symbol, trade_date, snapshot_time)
+    ) WITHOUT ROWID
+"""
+
+INSERT_MERGE_KEY = """
+    INSERT OR IGNORE INTO temp.merge_keys
+    (symbol, trade_date, snapshot_time, shard, existed, buy_qty, sell_qty, buy_pct, sell_pct)
+    VALUES (?, ?, ?, -1, ?, ?, ?, ?, ?)
+"""
+
+MARK_MERGE_KEY = "UPDATE temp.merge_keys SET shard = ?4 WHERE symbol = ?1 AND trade_date = ?2 AND snapshot_time = ?3"
+
+# The same for the quote records the merge wrote or deleted
+CREATE_MERGE_QUOTES = """
+    CREATE TEMP TABLE merge_quotes (
+        symbol TEXT NOT NULL,
+        trade_date INTEGER NOT NULL,
+        snapshot_time INTEGER NOT NULL,
+        shard INTEGER NOT NULL,
+        record BLOB,
+        PRIMARY KEY (symbol, trade_date, snapshot_time)
+    ) WITHOUT ROWID
+"""
+
+INSERT_MERGE_QUOTE = """
+    INSERT OR IGNORE INTO temp.merge_quotes (symbol, trade_date, snapshot_time, shard, record) VALUES (?, ?, ?, -1, ?)
+"""
+
+MARK_MERGE_QUOTE = "UPDATE temp.merge_quotes SET shard = ?4 WHERE symbol = ?1 AND trade_date = ?2 AND snapshot_time = ?3"
+
+_CHANGED = f"""
+    FROM temp.merge_keys AS k
+    JOIN {SNAPSHOT_TABLE} AS s
+      ON s.symbol = k.symbol AND s.trade_date = k.trade_date AND s.snapshot_time = k.snapshot_time
+    WHERE k.shard >= 0 AND (k.existed = 0 OR s.buy_qty IS NOT k.buy_qty OR s.sell_qty IS NOT k.sell_qty
+                            OR s.buy_pct IS NOT k.buy_pct OR s.sell_pct IS NOT k.sell_pct)
+"""
+
+# Keys whose stored row differs from the one before the merge, per shard that wrote it last
+COUNT_CHANGED_BY_SHARD = f"SELECT k.shard, sum(k.existed = 0), sum(k.existed) {_CHANGED} GROUP BY k.shard"
+
+SELECT_CHANGED_ROWS = f"SELECT s.symbol, s.trade_date, s.snapshot_time {_CHANGED}"
+
+COUNT_QUOTES_CHANGED_BY_SHARD = f"""
+    SELECT k.shard, count(*) FROM temp.merge_quotes AS k
+    LEFT JOIN {QUOTE_TABLE} AS q
+      ON q.symbol = k.symbol AND q.trade_date = k.trade_date AND q.snapshot_time = k.snapshot_time
+    WHERE q.record IS NOT k.record
+    GROUP BY k.shard
+"""
+
+COUNT_MISSING_KEYS = f"""
+    SELECT count(*) FROM temp.merge_keys AS k
+    WHERE NOT EXISTS (
+        SELECT 1 FROM {SNAPSHOT_TABLE} AS s
+        WHERE s.symbol = k.symbol AND s.trade_date = k.trade_date AND s.snapshot_time = k.snapshot_time
+    )
+"""
+
+_DONE = object()
+
+
+def merged_row(stored, row):
+    """
+        The row to store for a shard row given the stored (buy_qty, sell_qty, buy_pct, sell_pct)
+        of its key (None for a new key), or None when the shard row changes nothing. The
+        shard's values win, except that a row without quantities (from an old untyped shard)
+        keeps the stored quantities, and its percentages are then computed from them.
+    """
+    if stored is None:
+        return row
+    if row[3] is None and row[4] is None and stored[0] is not None and stored[1] is not None:
+        row = tuple(row[:3]) + (stored[0], stored[1]) + percentages(stored[0], stored[1])
+    if tuple(row[3:]) == tuple(stored):
+        return None
+    return row
+
+
+def _shard_rows(shard_file, chunk_size):
+    """
+        Yield (row tuples, shard rows read, unparseable rows) chunks from a shard, whichever
+        schema it is on. A row tuple is a snapshot row followed by its market_quotes record
+        (None when the shard has none).
+    """
+    conn = sqlite3.connect(f"file:{os.path.abspath(shard_file)}?mode=ro", uri=True)
+    try:
+        tables = set(row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'"))
+        if SNAPSHOT_TABLE in tables:
+            columns = "s.symbol, s.trade_date, s.snapshot_time, s.buy_qty, s.sell_qty, s.buy_pct, s.sell_pct"
+            if QUOTE_TABLE in tables:
+                cursor = conn.execute(
+                    f"SELECT {columns}, q.record FROM {SNAPSHOT_TABLE} AS s LEFT JOIN {QUOTE_TABLE} AS q "
+                    f"ON q.symbol = s.symbol AND q.trade_date = s.trade_date AND q.snapshot_time = s.snapshot_time")
+            else:
+                cursor = conn.execute(f"SELECT {columns}, NULL FROM {SNAPSHOT_TABLE} AS s")
+            legacy = False
+        elif LEGACY_TABLE in tables:
+            cursor = conn.execute(f"SELECT symbol, date, buy_sell_volume_percent FROM {LEGACY_TABLE}")
+            legacy = True
+        else:
+            raise ValueError(f"{shard_file} has no {SNAPSHOT_TABLE} or {LEGACY_TABLE} table")
+        while True:
+            chunk = cursor.fetchmany(chunk_size)
+            if not chunk:
+                return
+            if legacy:
+                # An old shard can hold a (symbol, date) twice; the later row wins, as in the migration
+                rows = {}
+                skipped = 0
+                for row in (parse_legacy_row(*legacy_row) for legacy_row in chunk):
+                    if row is None:
+                        skipped += 1
+                    else:
+                        rows[row[:3]] = row + (None,)
+                yield list(rows.values()), len(chunk), skipped
+            else:
+                yield chunk, len(chunk), 0
+    finally:
+        conn.close()
+
+
+def _read_shard(shard_file, chunk_size, chunks, stop):
+    def put(item):
+        while not stop.is_set():
+            try:
+                chunks.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for chunk in _shard_rows(shard_file, chunk_size):
+            if not put(chunk):
+                return
+    except Exception as e:
+        put((e, 0, 0))
+    finally:
+        put((_DONE, 0, 0))
+
+
+def _apply_chunk(conn, shard_position, rows, compacted_days, compacted):
+    """
+        Write the rows of a shard chunk that change the stored rows; returns (rows written,
+        rows left out of compacted days).
+        A quote record follows the quantities: where a shard row brings its own quantities, its
+        record replaces the stored one, and a stored record is dropped when a row without one
+        changes the quantities.
+        compacted_days caches the kept snapshot time of each (symbol, trade_date) seen (None
+        when the day is not compacted); a row from before it is left out, as retention would
+        remove it again and the day's rollups already count it. compacted collects the
+        compacted_hours of the written rows before their first write.
+    """
+    keys = []
+    changed = []
+    quote_keys = []
+    quotes = []
+    dropped_quotes = []
+    left_out = 0
+    for row in rows:
+        snapshot, record = tuple(row[:7]), row[7]
+        key = snapshot[:3]
+        if key[:2] not in compacted_days:
+            kept = conn.execute(SELECT_COMPACTED_DAY, key[:2]).fetchone()
+            compacted_days[key[:2]] = kept[0] if kept else None
+        kept_time = compacted_days[key[:2]]
+        if kept_time is not None and key[2] < kept_time:
+            left_out += 1
+            continue
+        stored = conn.execute(SELECT_STORED_SNAPSHOT, key).fetchone()
+        keys.append(key + ((0, None, None, None, None) if stored is None else (1,) + stored))
+        merged = merged_row(stored, snapshot)
+        if merged is not None:
+            changed.append(merged)
+        if snapshot[3] is None and snapshot[4] is None:
+            continue
+        stored_record = conn.execute(SELECT_STORED_QUOTE, key).fetchone()
+        stored_record = stored_record[0] if stored_record else None
+        if record is not None and record != stored_record:
+            quotes.append(key + (record_trade_volume(record), record))
+        elif record is None and stored_record is not None and merged is not None:
+            dropped_quotes.append(key)
+        else:
+            continue
+        quote_keys.append(key + (stored_record,))
+    new_hours = [row for row in changed if (row[0], row[1], row[2] // 10000) not in compacted]
+    for hour, part in compacted_hours(conn, new_hours).items():
+        compacted[hour] = part
+    for row in new_hours:
+        compacted.setdefault((row[0], row[1], row[2] // 10000), None)
+    conn.executemany(INSERT_MERGE_KEY, keys)
+    conn.executemany(INSERT_SNAPSHOT, changed)
+    conn.executemany(MARK_MERGE_KEY, [tuple(row[:3]) + (shard_position,) for row in changed])
+    conn.executemany(INSERT_MERGE_QUOTE, quote_keys)
+    conn.executemany(INSERT_QUOTE, quotes)
+    conn.executemany(DELETE_QUOTE, dropped_quotes)
+    conn.executemany(MARK_MERGE_QUOTE, [tuple(key[:3]) + (shard_position,) for key in quote_keys])
+    return changed, left_out
+
+
+def merge_shards(target_file, shard_files, workers=MERGE_WORKERS, chunk_size=MERGE_CHUNK_SIZE):
+    """
+        Upsert every snapshot row and quote record of shard_files into target_file in one transaction
+        Parameters
+        ------
+        target_file: string
+            database to merge into; created or migrated to the current schema if needed
+        shard_files: list of string
+            shard databases, on the current schema or the old untyped market_data table
+        workers: integer
+            shards read in parallel
+        chunk_size: integer
+            rows per read and per executemany
+        Rows are keyed by (symbol, trade_date, snapshot_time). Shards are applied in the
+        order given whatever order their readers finish in, so when shards hold the same key
+        the last of them wins; a row without quantities (from an old untyped shard) keeps
+        the stored quantities and the percentages computed from them. A quote record comes
+        with the quantities of its row (see _apply_chunk). Merging the same
+        shards again therefore leaves every row as it is and reports nothing inserted or
+        updated. Before committing, every key read from the shards must be in the target
+        and the target's row count must equal the count before plus the new keys, otherwise
+        the transaction is rolled back and an Exception is raised. On days retention compacted
+        in the target, rows from before the snapshot it kept are left out (rows_compacted),
+        and the rollups of the hours that change combine what was compacted away with the
+        new rows instead of being rebuilt from the rows left. Returns per-run and
+        per-shard statistics; a row inserted or updated is credited to the shard that wrote
+        its final value, and quotes_written counts the records whose final value it wrote.
+    """
+    shard_files = list(dict.fromkeys(os.path.abspath(shard) for shard in shard_files))
+    target = os.path.abspath(target_file)
+    if target in shard_files:
+        raise ValueError("The target database cannot also be a shard")
+    for shard in shard_files:
+        if not os.path.exists(shard):
+            raise ValueError(f"Shard {shard} does not exist")
+
+    conn = sqlite3.connect(target, isolation_level=None)
+    for pragma in WRITER_PRAGMAS:
+        conn.execute(pragma)
+    ensure_schema(conn)
+    started = time.perf_counter()
+    shards = {shard: {"rows_read": 0, "rows_skipped": 0, "rows_compacted": 0, "rows_inserted": 0, "rows_updated": 0,
+                      "quotes_written": 0} for shard in shard_files}
+    readers = {}
+    compacted_days = {}
+    compacted = {}
+    stop = threading.Event()
+    workers = max(1, workers)
+
+    def start_reader(position):
+        if position < len(shard_files):
+            chunks = queue.Queue(maxsize=QUEUED_CHUNKS)
+            readers[position] = chunks
+            threading.Thread(target=_read_shard, args=(shard_files[position], chunk_size, chunks, stop),
+                             name="shard-reader", daemon=True).start()
+
+    try:
+        conn.execute(CREATE_MERGE_KEYS)
+        conn.execute(CREATE_MERGE_QUOTES)
+        conn.execute("BEGIN IMMEDIATE")
+        rows_before = conn.execute(f"SELECT count(*) FROM {SNAPSHOT_TABLE}").fetchone()[0]
+        for position in range(workers):
+            start_reader(position)
+        # Readers run ahead in parallel, but each shard is applied only after the ones before it
+        for position, shard in enumerate(shard_files):
+            chunks = readers.pop(position)
+            while True:
+                rows, read, skipped = chunks.get()
+                if rows is _DONE:
+                    break
+                if isinstance(rows, Exception):
+                    raise Exception(f"Could not read shard {shard}: {rows}")
+                _, left_out = _apply_chunk(conn, position, rows, compacted_days, compacted)
+                shards[shard]["rows_read"] += read
+                shards[shard]["rows_skipped"] += skipped
+                shards[shard]["rows_compacted"] += left_out
+            start_reader(position + workers)
+
+        for position, inserted, updated in conn.execute(COUNT_CHANGED_BY_SHARD).fetchall():
+            shards[shard_files[position]]["rows_inserted"] = inserted
+            shards[shard_files[position]]["rows_updated"] = updated
+        for position, written in conn.execute(COUNT_QUOTES_CHANGED_BY_SHARD).fetchall():
+            shards[shard_files[position]]["quotes_written"] = written
+        rows_inserted = sum(stats["rows_inserted"] for stats in shards.values())
+        rows_after = conn.execute(f"SELECT count(*) FROM {SNAPSHOT_TABLE}").fetchone()[0]
+        missing = conn.execute(COUNT_MISSING_KEYS).fetchone()[0]
+        if missing:
+            raise Exception(f"Merge check failed: {missing} shard rows are not in the target")
+        if rows_after != rows_before + rows_inserted:
+            raise Exception(f"Row count check failed: {rows_before} rows before + {rows_inserted} new keys "
+                            f"!= {rows_after} rows after")
+        # Only the hours the merge actually changed, never a whole day rebuilt from its rows
+        changed = conn.execute(SELECT_CHANGED_ROWS).fetchall()
+        refresh_rollups(conn, changed, {hour: part for hour, part in compacted.items() if part is not None})
+        conn.execute("COMMIT")
+    except Exception:
+        if conn.in_transaction:
+            conn.execute("ROLLBACK")
+        raise
+    finally:
+        stop.set()
+        conn.close()
+
+    seconds = time.perf_counter() - started
+    rows_read = sum(stats["rows_read"] for stats in shards.values())
+    result = {
+        "shards": shards,
+        "rows_before": rows_before,
+        "rows_after": rows_after,
+        "rows_read": rows_read,
+        "rows_inserted": rows_inserted,
+        "rows_updated": sum(stats["rows_updated"] for stats in shards.values()),
+        "rows_compacted": sum(stats["rows_compacted"] for stats in shards.values()),
+        "quotes_written": sum(stats["quotes_written"] for stats in shards.values()),
+        "seconds": seconds,
+        "rows_per_second": rows_read / seconds if seconds else None
+    }
+    logger.info(f"Merged {len(shard_files)} shards into {target}: {rows_read} rows read, "
+                f"{rows_inserted} inserted in {seconds:.2f}s")
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge snapshot shard databases into one database")
+    parser.add_argument("target", help="database to merge into")
+    parser.add_argument("shards", nargs="+", help="shard databases to merge")
+    parser.add_argument("--workers", type=int, default=MERGE_WORKERS, help="shards read in parallel")
+    parser.add_argument("--chunk-size", type=int, default=MERGE_CHUNK_SIZE, help="rows per batch")
+    args = parser.parse_args(argv)
+    stats = merge_shards(args.target, args.shards, args.workers, args.chunk_size)
+    for shard, shard_stats in stats["shards"].items():
+        print(f"{shard}: {shard_stats['rows_read']} rows read, {shard_stats['rows_inserted']} new, "
+              f"{shard_stats['rows_updated']} changed, {shard_stats['rows_skipped']} skipped, "
+              f"{shard_stats['rows_compacted']} left out of compacted days, "
+              f"{shard_stats['quotes_written']} quotes written")
+    rate = f"{stats['rows_per_second']:,.0f} rows/sec" if stats["rows_per_second"] else "n/a"
+    print(f"{args.target}: {stats['rows_before']} -> {stats['rows_after']} rows, "
+          f"{stats['rows_updated']} changed, in {stats['seconds']:.2f}s ({rate})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+import time
+import queue
+import threading
+from logzero import logger
+from SmartApi.quoteRecord import decode_quotes
+from SmartApi.snapshotWriter import SnapshotWriter
+
+
+_DONE = object()
+
+
+class _Stage(object):
+    """
+    Timing of one pipeline stage, shared by its workers.
+    """
+
+    def __init__(self, name, workers):
+        self.name = name
+        self.workers = workers
+        self.items = 0
+        self.failed = 0
+        self.busy_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.running = workers
+        self.lock = threading.Lock()
+
+    def record(self, busy, wait, failed=False):
+        with self.lock:
+            self.items += 1
+            self.failed += failed
+            self.busy_seconds += busy
+            self.wait_seconds += wait
+
+    def finish(self):
+        """
+            True for the last worker of the stage to finish
+        """
+        with self.lock:
+            self.running -= 1
+            return self.running == 0
+
+    def stats(self):
+        return {
+            "workers": self.workers,
+            "items": self.items,
+            "failed": self.failed,
+            "busy_seconds": self.busy_seconds,
+            "wait_seconds": self.wait_seconds,
+            # Wall time the stage would need on its own with its workers fully busy
+            "stage_seconds": self.busy_seconds / self.workers
+        }
+
+
+class SnapshotPipeline(object):
+    """
+    Takes one snapshot of a token universe through three overlapped stages.
+
+    fetch workers request the quotes of a token batch, decode workers turn each response into
+    quoteRecord records and a single writer thread (the owner of the sqlite connection)
+    buffers every decoded batch as it arrives and commits the whole snapshot as one
+    transaction once the last one is in, so a failed run never leaves a partial snapshot. The stages are joined by bounded queues, so
+    the network, the CPU and the disk all work at the same time and a slow stage holds the
+    ones before it back instead of letting responses pile up in memory. The run then takes
+    about as long as its slowest stage instead of the sum of all three; run() reports the
+    busy and waiting time of each stage to show which one that is.
+
+    fetch is called with a list of tokens and returns the "fetched" list of a FULL-mode quote
+    response (QuoteClient.fetch); it is called from several threads at once.
+    """
+
+    FETCH_WORKERS = 4
+    DECODE_WORKERS = 1
+    QUEUE_SIZE = 8
+
+    def __init__(self, fetch, db_file, fetch_workers=FETCH_WORKERS, decode_workers=DECODE_WORKERS,
+                 queue_size=QUEUE_SIZE, history_store=None):
+        self.fetch = fetch
+        self.db_file = db_file
+        self.fetch_workers = fetch_workers
+        self.decode_workers = decode_workers
+        self.queue_size = queue_size
+        self.history_store = history_store
+
+    def run(self, token_batches, timestamp):
+        """
+            Fetch, decode and store one snapshot of token_batches stamped with timestamp.
+            Returns the run's wall time, rows written and the per-stage statistics; failed
+            batches are logged and skipped, a failed database write is raised and leaves
+            nothing of the snapshot in the database.
+        """
+        started = time.perf_counter()
+        batches = queue.Queue()
+        responses = queue.Queue(maxsize=self.queue_size)
+        decoded = queue.Queue(maxsize=self.queue_size)
+        fetch_stage = _Stage("fetch", self.fetch_workers)
+        decode_stage = _Stage("decode", self.decode_workers)
+        write_stage = _Stage("write", 1)
+        result = {"rows_written": 0, "error": None}
+
+        for batch in token_batches:
+            batches.put(list(batch))
+        for _ in range(self.fetch_workers):
+            batches.put(_DONE)
+
+        threads = [threading.Thread(target=self._fetch_worker, args=(batches, responses, fetch_stage),
+                                    name="snapshot-fetch", daemon=True) for _ in range(self.fetch_workers)]
+        threads += [threading.Thread(target=self._decode_worker, args=(responses, decoded, decode_stage),
+                                     name="snapshot-decode", daemon=True) for _ in range(self.decode_workers)]
+        threads.append(threading.Thread(target=self._write_worker, args=(decoded, timestamp, write_stage, result),
+                                        name="snapshot-write", daemon=True))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if result["error"] is not None:
+            raise result["error"]
+
+        stages = {stage.name: stage.stats() for stage in (fetch_stage, decode_stage, write_stage)}
+        stats = {
+            "seconds": time.perf_counter() - started,
+            "batches": fetch_stage.items,
+            "failed_batches": fetch_stage.failed + decode_stage.failed,
+            "rows_written": result["rows_written"],
+            "stages": stages,
+            "bottleneck": max(stages, key=lambda name: stages[name]["stage_seconds"])
+        }
+        logger.info(f"Snapshot {timestamp}: {stats['rows_written']} rows in {stats['seconds']:.2f}s, " +
+                    ", ".join(f"{name} {stage['stage_seconds']:.2f}s x{stage['workers']}" for name, stage in stages.items()))
+        return stats
+
+    def _fetch_worker(self, batches, responses, stage):
+        while True:
+            batch = batches.get()
+            if batch is _DONE:
+                break
+            started = time.perf_counter()
+            try:
+                fetched = self.fetch(batch)
+            except Exception as e:
+                logger.error(f"Fetching {len(batch)} tokens failed: {e}")
+                stage.record(time.perf_counter() - started, 0.0, failed=True)
+                continue
+            fetched_at = time.perf_counter()
+            responses.put(fetched)
+            stage.record(fetched_at - started, time.perf_counter() - fetched_at)
+        if stage.finish():
+            for _ in range(self.decode_workers):
+                responses.put(_DONE)
+
+    def _decode_worker(self, responses, decoded, stage):
+        while True:
+            waited = time.perf_counter()
+            fetched = responses.get()
+            if fetched is _DONE:
+                break
+            started = time.perf_counter()
+            try:
+                symbols, records = decode_quotes(fetched)
+            except Exception as e:
+                logger.error(f"Decoding {len(fetched)} quotes failed: {e}")
+                stage.record(time.perf_counter() - started, started - waited, failed=True)
+                continue
+            decoded_at = time.perf_counter()
+            decoded.put((symbols, records))
+            stage.record(decoded_at - started, started - waited + time.perf_counter() - decoded_at)
+        if stage.finish():
+            decoded.put(_DONE)
+
+    def _write_worker(self, decoded, timestamp, stage, result):
+        item = None
+        try:
+            with SnapshotWriter(self.db_file, batch_size=1 << 30, history_store=self.history_store) as writer:
+                while True:
+                    waited = time.perf_counter()
+                    item = decoded.get()
+                    started = time.perf_counter()
+                    if item is _DONE:
+                        # One transaction for the whole snapshot
+                        result["rows_written"] += writer.flush()
+                        with stage.lock:
+                            stage.busy_seconds += time.perf_counter() - started
+                        return
+                    writer.add_records(item[0], item[1], timestamp)
+                    stage.record(time.perf_counter() - started, started - waited)
+        except Exception as e:
+            result["error"] = e
+            # Keep draining so the upstream stages do not block on a full queue
+            while item is not _DONE:
+                item = decoded.get()
@@ -0,0 +1,321 @@
+import os
+import queue
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime
+import pandas as pd
+from logzero import logger
+from SmartApi.snapshotSchema import (DAILY_ROLLUP_TABLE, HOURLY_ROLLUP_TABLE, QUOTE_TABLE, SCHEMA_VERSION, SNAPSHOT_TABLE,
+                                     ensure_schema, rollup_select, schema_version, snapshot_key)
+from SmartApi.quoteRecord import quote_frame, unpack_records
+
+
+# Stay below SQLITE_MAX_VARIABLE_NUMBER of older SQLite builds
+MAX_SYMBOLS_PER_QUERY = 900
+
+HISTORY_COLUMNS = ["symbol", "date", "snapshot_time", "buy_qty", "sell_qty", "buy_pct", "sell_pct"]
+
+ROLLUP_BUCKETS = ("hour", "day")
+
+
+class ReadConnectionPool(object):
+    """
+    Fixed-size pool of read-only connections to a snapshot database.
+
+    Connections are opened lazily, shared between threads (a Streamlit app reruns its
+    script on a new thread per session) and kept for the life of the process, so a
+    dashboard refresh does not pay for opening the file and reparsing the schema.
+    A missing database raises FileNotFoundError rather than being created empty, and one
+    still on an older schema (such as the untyped market_data table) is migrated once over
+    a read-write connection before the first read-only connection is opened.
+    """
+
+    POOL_SIZE = 4
+
+    def __init__(self, db_file, size=POOL_SIZE):
+        self.db_file = os.path.abspath(db_file)
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        self._lock = threading.Lock()
+        self._upgrade()
+
+    def _upgrade(self):
+        if not os.path.exists(self.db_file):
+            raise FileNotFoundError(f"No snapshot database at {self.db_file}")
+        conn = self._open()
+        try:
+            version = schema_version(conn)
+        finally:
+            conn.close()
+        if version >= SCHEMA_VERSION:
+            return
+        logger.info(f"Upgrading {self.db_file} from snapshot schema {version} to {SCHEMA_VERSION}")
+        # mode=rw: the file must exist, so a path that vanished since the check is not recreated
+        conn = sqlite3.connect(f"file:{self.db_file}?mode=rw", uri=True)
+        try:
+            conn.execute("PRAGMA busy_timeout=5000")
+            ensure_schema(conn)
+        finally:
+            conn.close()
+
+    def _open(self):
+        conn = sqlite3.connect(f"file:{self.db_file}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute("PRAGMA query_only=ON")
+        conn.execute("PRAGMA busy_timeout=5000")
+        return conn
+
+    @contextmanager
+    def connection(self):
+        conn = None
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                if self._opened < self.size:
+                    self._opened += 1
+                    conn = self._open()
+            if conn is None:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._opened = 0
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(db_file):
+    """
+        The shared ReadConnectionPool of db_file
+    """
+    path = os.path.abspath(db_file)
+    with _pools_lock:
+        pool = _pools.get(path)
+        if pool is None:
+            pool = _pools[path] = ReadConnectionPool(path)
+        return pool
+
+
+def _trade_date(value):
+    if isinstance(value, (datetime, date)):
+        return value.year * 10000 + value.month * 100 + value.day
+    return int(str(value)[:10].replace("-", ""))
+
+
+def _history_sql(symbol_count, latest_per_day):
+    placeholders = ",".join("?" * symbol_count)
+    where = f"WHERE symbol IN ({placeholders}) AND trade_date BETWEEN ? AND ?"
+    if latest_per_day:
+        # The daily rollup keeps the last snapshot of each day: one row per symbol and day
+        # however many intraday snapshots were taken
+        return (f"SELECT symbol, trade_date, last_time, last_buy_qty, last_sell_qty, last_buy_pct, last_sell_pct "
+                f"FROM {DAILY_ROLLUP_TABLE} {where}")
+    return (f"SELECT symbol, trade_date, snapshot_time, buy_qty, sell_qty, buy_pct, sell_pct "
+            f"FROM {SNAPSHOT_TABLE} {where} ORDER BY symbol, trade_date, snapshot_time")
+
+
+def fetch_buy_sell_history(db_file, symbols, start_date, end_date, latest_per_day=True):
+    """
+        Buy/sell snapshots of every symbol in symbols between start_date and end_date (inclusive)
+        Parameters
+        ------
+        db_file: string
+            snapshot database path
+        symbols: list of string
+            symbols without the -EQ suffix
+        start_date, end_date: date, datetime or "YYYY-MM-DD" string
+        latest_per_day: bool
+            keep only the last snapshot of each symbol and day, so (symbol, date) is unique;
+            otherwise every snapshot is returned and snapshot_time tells them apart
+        Returns a DataFrame indexed by (symbol, date) with snapshot_time, buy_qty, sell_qty
+        (nullable Int64), buy_pct and sell_pct (float) columns, sorted by symbol and date.
+    """
+    symbols = list(dict.fromkeys(str(symbol).strip().upper() for symbol in symbols if str(symbol).strip()))
+    bounds = (_trade_date(start_date), _trade_date(end_date))
+    rows = []
+    if symbols:
+        with get_pool(db_file).connection() as conn:
+            for i in range(0, len(symbols), MAX_SYMBOLS_PER_QUERY):
+                chunk = symbols[i:i + MAX_SYMBOLS_PER_QUERY]
+                rows.extend(conn.execute(_history_sql(len(chunk), latest_per_day), (*chunk, *bounds)).fetchall())
+    return _history_frame(rows, latest_per_day)
+
+
+def _history_frame(rows, latest_per_day=True):
+    frame = pd.DataFrame.from_records(rows, columns=HISTORY_COLUMNS)
+    trade_date = frame["date"].astype("int64")
+    frame["date"] = pd.to_datetime(pd.DataFrame({
+        "year": trade_date // 10000, "month": trade_date // 100 % 100, "day": trade_date % 100
+    }))
+    frame = frame.astype({
+        "symbol": "object", "snapshot_time": "int64", "buy_qty": "Int64", "sell_qty": "Int64",
+        "buy_pct": "float64", "sell_pct": "float64"
+    })
+    if not latest_per_day:
+        frame = frame.sort_values(["symbol", "date", "snapshot_time"], kind="stable")
+    return frame.set_index(["symbol", "date"]).sort_index(kind="stable")
+
+
+def _range_key(value, end=False):
+    """
+        (trade_date, HHMMSS) of a range bound; a bare date covers its whole day
+    """
+    if isinstance(value, datetime) or (not isinstance(value, date) and len(str(value).strip()) > 10):
+        return snapshot_key(value if isinstance(value, datetime) else pd.Timestamp(value).to_pydatetime())
+    return _trade_date(value), 235959 if end else 0
+
+
+def plan_rollup_query(start, end, bucket="day"):
+    """
+        Cheapest source of per-bucket aggregates between start and end (both inclusive)
+        Parameters
+        ------
+        start, end: date, datetime or string
+            a bare date (or "YYYY-MM-DD") covers its whole day
+        bucket: "hour" or "day"
+        Returns (source, where, parameters): source is the coarsest level whose periods tile
+        the range - the daily rollup for whole days, the hourly rollup for whole hours and the
+        raw snapshots otherwise - and where/parameters select the range from it.
+    """
+    if bucket not in ROLLUP_BUCKETS:
+        raise ValueError(f"bucket must be one of {ROLLUP_BUCKETS}")
+    (start_date, start_time), (end_date, end_time) = _range_key(start), _range_key(end, end=True)
+    if bucket == "day" and start_time == 0 and end_time == 235959:
+        return "day", "trade_date BETWEEN ? AND ?", (start_date, end_date)
+    if start_time % 10000 == 0 and end_time % 10000 == 5959:
+        return ("hour", "trade_date BETWEEN ? AND ? AND trade_date * 100 + hour BETWEEN ? AND ?",
+                (start_date, end_date, start_date * 100 + start_time // 10000, end_date * 100 + end_time // 10000))
+    return ("snapshot", "trade_date BETWEEN ? AND ? AND trade_date * 1000000 + snapshot_time BETWEEN ? AND ?",
+            (start_date, end_date, start_date * 1000000 + start_time, end_date * 1000000 + end_time))
+
+
+def _volume_select(source, bucket, sql):
+    """
+        sql (a rollup_select) with a volume column: the period's last cumulative day volume minus
+        the last one before the period on the same day. Hour and snapshot sources take the
+        range start (in the key of plan_rollup_query's third parameter) as the first parameter,
+        so a range that starts inside a day counts the volume from its start.
+    """
+    period_start = {"hour": {"hour": "r.hour", "day": "0"}, "snapshot": {"hour": "r.hour * 10000", "day": "0"}}
+    if source == "day":
+        previous = "0"
+    elif source == "hour":
+        previous = f"""(
+            SELECT p.last_trade_volume FROM {HOURLY_ROLLUP_TABLE} AS p
+            WHERE p.symbol = r.symbol AND p.trade_date = r.trade_date AND p.last_trade_volume IS NOT NULL
+              AND p.trade_date * 100 + p.hour < max(r.trade_date * 100 + {period_start[source][bucket]}, ?)
+            ORDER BY p.hour DESC LIMIT 1)"""
+    else:
+        previous = f"""(
+            SELECT p.trade_volume FROM {QUOTE_TABLE} AS p
+            WHERE p.symbol = r.symbol AND p.trade_date = r.trade_date AND p.trade_volume IS NOT NULL
+              AND p.trade_date * 1000000 + p.snapshot_time < max(r.trade_date * 1000000 + {period_start[source][bucket]}, ?)
+            ORDER BY p.snapshot_time DESC LIMIT 1)"""
+    return f"SELECT r.*, r.last_trade_volume - coalesce({previous}, 0) AS volume FROM ({sql}) AS r"
+
+
+def fetch_rollups(db_file, symbols, start, end, bucket="day"):
+    """
+        Hourly or daily buy/sell aggregates of symbols between start and end (inclusive)
+        Returns a DataFrame indexed by (symbol, period) - the start of each hour or day - with
+        samples, mean_buy_pct, min_buy_pct, max_buy_pct, last_buy_pct, last_sell_pct,
+        mean_book_buy_qty and mean_book_sell_qty (the mean resting totBuyQuan / totSellQuan of
+        the period's snapshots) and volume columns. volume is the quantity traded in the
+        period (within the range), from the cumulative tradeVolume of the stored quotes; it
+        is missing where no quote was stored. It is read from the coarsest rollup that
+        answers the range (see plan_rollup_query), so a month of daily aggregates reads one
+        row per symbol and day; frame.attrs["source"] tells which one was used.
+    """
+    source, where, parameters = plan_rollup_query(start, end, bucket)
+    range_start = () if source == "day" else (parameters[2],)
+    symbols = list(dict.fromkeys(str(symbol).strip().upper() for symbol in symbols if str(symbol).strip()))
+    rows = []
+    if symbols:
+        with get_pool(db_file).connection() as conn:
+            for i in range(0, len(symbols), MAX_SYMBOLS_PER_QUERY):
+                chunk = symbols[i:i + MAX_SYMBOLS_PER_QUERY]
+                sql = _volume_select(source, bucket, rollup_select(
+                    source, bucket, f"symbol IN ({','.join('?' * len(chunk))}) AND {where}"))
+                rows.extend(conn.execute(sql, (*range_start, *chunk, *parameters)).fetchall())
+    hour = ["hour"] if bucket == "hour" else []
+    raw = pd.DataFrame.from_records(rows, columns=["symbol", "trade_date", *hour, "samples", "buy_pct_sum", "min_buy_pct",
+                                                   "max_buy_pct", "book_buy_qty_sum", "book_sell_qty_sum", "last_time",
+                                                   "last_buy_pct", "last_sell_pct", "last_buy_qty", "last_sell_qty",
+                                                   "last_trade_volume", "volume"])
+    trade_date = raw["trade_date"].astype("int64")
+    period = pd.to_datetime(pd.DataFrame({
+        "year": trade_date // 10000, "month": trade_date // 100 % 100, "day": trade_date % 100,
+        "hour": raw["hour"].astype("int64") if hour else 0
+    }))
+    samples = raw["samples"].astype("float64")
+    frame = pd.DataFrame({
+        "symbol": raw["symbol"].astype("object"),
+        "period": period,
+        "samples": raw["samples"].astype("int64"),
+        "mean_buy_pct": raw["buy_pct_sum"].astype("float64") / samples,
+        "min_buy_pct": raw["min_buy_pct"].astype("float64"),
+        "max_buy_pct": raw["max_buy_pct"].astype("float64"),
+        "last_buy_pct": raw["last_buy_pct"].astype("float64"),
+        "last_sell_pct": raw["last_sell_pct"].astype("float64"),
+        "mean_book_buy_qty": raw["book_buy_qty_sum"].astype("float64") / samples,
+        "mean_book_sell_qty": raw["book_sell_qty_sum"].astype("float64") / samples,
+        "volume": raw["volume"].astype("Int64"),
+    })
+    frame = frame.set_index(["symbol", "period"]).sort_index(kind="stable")
+    frame.attrs["source"] = source
+    return frame
+
+
+def _quotes_sql(symbol_count, latest_per_day):
+    placeholders = ",".join("?" * symbol_count)
+    where = f"WHERE symbol IN ({placeholders}) AND trade_date BETWEEN ? AND ?"
+    if latest_per_day:
+        return (f"SELECT symbol, trade_date, max(snapshot_time), record FROM {QUOTE_TABLE} {where} "
+                f"GROUP BY symbol, trade_date")
+    return (f"SELECT symbol, trade_date, snapshot_time, record FROM {QUOTE_TABLE} {where} "
+            f"ORDER BY symbol, trade_date, snapshot_time")
+
+
+def fetch_quotes(db_file, symbols, start_date, end_date, latest_per_day=True):
+    """
+        Full FULL-mode quotes (LTP, OHLC, volume, average price, circuits, 52-week range and
+        depth metrics) of symbols between start_date and end_date (inclusive)
+        Returns a quoteRecord.quote_frame DataFrame indexed by (symbol, date) with a
+        snapshot_time column; arguments are as for fetch_buy_sell_history.
+    """
+    symbols = list(dict.fromkeys(str(symbol).strip().upper() for symbol in symbols if str(symbol).strip()))
+    bounds = (_trade_date(start_date), _trade_date(end_date))
+    rows = []
+    if symbols:
+        with get_pool(db_file).connection() as conn:
+            for i in range(0, len(symbols), MAX_SYMBOLS_PER_QUERY):
+                chunk = symbols[i:i + MAX_SYMBOLS_PER_QUERY]
+                rows.extend(conn.execute(_quotes_sql(len(chunk), latest_per_day), (*chunk, *bounds)).fetchall())
+    frame = quote_frame([row[0] for row in rows], unpack_records([row[3] for row in rows]))
+    trade_date = pd.Series([row[1] for row in rows], dtype="int64")
+    frame.insert(1, "date", pd.to_datetime(pd.DataFrame({
+        "year": trade_date // 10000, "month": trade_date // 100 % 100, "day": trade_date % 100
+    })))
+    frame.insert(2, "snapshot_time", pd.Series([row[2] for row in rows], dtype="int64"))
+    return frame.set_index(["symbol", "date"]).sort_index(kind="stable")
+
+
+def buy_sell_percent_labels(history):
+    """
+        "buy/sell" percentage strings (as shown by the dashboards) for each row of a history frame
+    """
+    return (history["buy_pct"].round().astype("int64").astype(str) + "/" +
+            history["sell_pct"].round().astype("int64").astype(str))
@@ -0,0 +1,212 @@
+import sys
+import time
+import sqlite3
+import argparse
+from datetime import date, timedelta
+from logzero import logger
+from SmartApi.snapshotSchema import DAILY_ROLLUP_TABLE, HOURLY_ROLLUP_TABLE, QUOTE_TABLE, SNAPSHOT_TABLE, ensure_schema
+from SmartApi.snapshotWriter import WRITER_PRAGMAS
+from SmartApi.historyStore import QUOTES, SNAPSHOTS, HistoryStore, trade_date_of
+
+
+AUTO_VACUUM_INCREMENTAL = 2
+
+SELECT_DAY = f"""
+    SELECT symbol, trade_date, snapshot_time, buy_qty, sell_qty, buy_pct, sell_pct
+    FROM {SNAPSHOT_TABLE} WHERE trade_date = ?
+"""
+
+SELECT_QUOTES_DAY = f"""
+    SELECT symbol, trade_date, snapshot_time, record FROM {QUOTE_TABLE} WHERE trade_date = ?
+"""
+
+# Every snapshot of a day except the last one of each symbol
+COMPACT_DAY = f"""
+    DELETE FROM {SNAPSHOT_TABLE}
+    WHERE trade_date = ?1 AND snapshot_time < (
+        SELECT max(latest.snapshot_time) FROM {SNAPSHOT_TABLE} AS latest
+        WHERE latest.symbol = {SNAPSHOT_TABLE}.symbol AND latest.trade_date = ?1
+    )
+"""
+
+# Quote records whose snapshot row is gone
+COMPACT_QUOTES_DAY = f"""
+    DELETE FROM {QUOTE_TABLE}
+    WHERE trade_date = ?1 AND NOT EXISTS (
+        SELECT 1 FROM {SNAPSHOT_TABLE} AS kept
+        WHERE kept.symbol = {QUOTE_TABLE}.symbol AND kept.trade_date = ?1
+          AND kept.snapshot_time = {QUOTE_TABLE}.snapshot_time
+    )
+"""
+
+
+class RetentionManager(object):
+    """
+    Time-based retention for the snapshot database.
+
+    Days older than keep_intraday_days are compacted to the last snapshot of each symbol,
+    and days older than keep_days are deleted; market_quotes records follow their rows. The
+    rollups of compacted days are kept, so their hourly and daily aggregates survive. Every
+    day's snapshots and quote records are archived to Parquet (when an archive_dir is given)
+    before any of its rows are removed, and a day is removed only after the archive holds
+    every snapshot and quote key that was read. Each day is one transaction
+    found through the trade_date index, so the database stays usable while it runs. The
+    freed pages are returned to the file system with incremental vacuum; the first run on
+    a database without auto_vacuum=INCREMENTAL converts it with one full VACUUM.
+    """
+
+    VACUUM_PAGES = 0  # 0 frees every free page
+
+    def __init__(self, db_file, keep_days=365, keep_intraday_days=30, archive_dir=None, vacuum_pages=VACUUM_PAGES):
+        if keep_intraday_days is not None and keep_days is not None and keep_intraday_days > keep_days:
+            raise ValueError("keep_intraday_days cannot be longer than keep_days")
+        self.db_file = db_file
+        self.keep_days = keep_days
+        self.keep_intraday_days = keep_intraday_days
+        self.archive = HistoryStore(archive_dir) if archive_dir else None
+        self.vacuum_pages = vacuum_pages
+
+    def _cutoff(self, days, today):
+        return None if days is None else trade_date_of(today - timedelta(days=days))
+
+    def plan(self, conn, today=None):
+        """
+            (days to compact, days to delete) as sorted trade_date lists
+        """
+        today = today or date.today()
+        delete_before = self._cutoff(self.keep_days, today)
+        compact_before = self._cutoff(self.keep_intraday_days, today)
+        delete_days = []
+        if delete_before is not None:
+            delete_days = [row[0] for row in conn.execute(
+                f"SELECT DISTINCT trade_date FROM {SNAPSHOT_TABLE} WHERE trade_date < ? ORDER BY trade_date",
+                (delete_before,))]
+        compact_days = []
+        if compact_before is not None:
+            compact_days = [row[0] for row in conn.execute(
+                f"SELECT trade_date FROM {SNAPSHOT_TABLE} WHERE trade_date >= ? AND trade_date < ? "
+                f"GROUP BY trade_date HAVING count(*) > count(DISTINCT symbol) ORDER BY trade_date",
+                (delete_before or 0, compact_before))]
+        return compact_days, delete_days
+
+    def _archive_day(self, conn, trade_date):
+        """
+            Archive a day's snapshots and quote records; returns (snapshot rows, quote records) archived
+        """
+        if self.archive is None:
+            return 0, 0
+        rows = conn.execute(SELECT_DAY, (trade_date,)).fetchall()
+        quotes = conn.execute(SELECT_QUOTES_DAY, (trade_date,)).fetchall()
+        if rows:
+            self.archive.write_snapshots(rows)
+            self._verify_archive(SNAPSHOTS, trade_date, rows)
+        if quotes:
+            self.archive.write_quotes(quotes)
+            self._verify_archive(QUOTES, trade_date, quotes)
+        return len(rows), len(quotes)
+
+    def _verify_archive(self, dataset, trade_date, rows):
+        archived = self.archive.read_table(dataset, start_date=trade_date, end_date=trade_date,
+                                           columns=["symbol", "snapshot_time"])
+        stored = set(zip(archived.column("symbol").to_pylist(), archived.column("snapshot_time").to_pylist()))
+        missing = sum(1 for row in rows if (row[0], row[2]) not in stored)
+        if missing:
+            raise Exception(f"Archive of {dataset} {trade_date} is missing {missing} of {len(rows)} rows, "
+                            f"not removing it")
+
+    def run(self, today=None, dry_run=False):
+        """
+            Apply the policy; returns what was archived, compacted, deleted and vacuumed
+        """
+        started = time.perf_counter()
+        conn = sqlite3.connect(self.db_file, isolation_level=None)
+        stats = {"days_compacted": 0, "rows_compacted": 0, "days_deleted": 0, "rows_deleted": 0,
+                 "rows_archived": 0, "quotes_archived": 0, "pages_freed": 0, "seconds": 0.0}
+        try:
+            for pragma in WRITER_PRAGMAS:
+                conn.execute(pragma)
+            ensure_schema(conn)
+            compact_days, delete_days = self.plan(conn, today)
+            if dry_run:
+                stats.update({"compact_days": compact_days, "delete_days": delete_days})
+                return stats
+
+            for trade_date in compact_days:
+                self._count_archived(stats, self._archive_day(conn, trade_date))
+                with _transaction(conn):
+                    stats["rows_compacted"] += conn.execute(COMPACT_DAY, (trade_date,)).rowcount
+                    conn.execute(COMPACT_QUOTES_DAY, (trade_date,))
+                stats["days_compacted"] += 1
+
+            for trade_date in delete_days:
+                self._count_archived(stats, self._archive_day(conn, trade_date))
+                with _transaction(conn):
+                    stats["rows_deleted"] += conn.execute(
+                        f"DELETE FROM {SNAPSHOT_TABLE} WHERE trade_date = ?", (trade_date,)).rowcount
+                    for table in (QUOTE_TABLE, HOURLY_ROLLUP_TABLE, DAILY_ROLLUP_TABLE):
+                        conn.execute(f"DELETE FROM {table} WHERE trade_date = ?", (trade_date,))
+                stats["days_deleted"] += 1
+
+            if compact_days or delete_days:
+                stats["pages_freed"] = self._vacuum(conn)
+        finally:
+            conn.close()
+            stats["seconds"] = time.perf_counter() - started
+        logger.info(f"Retention on {self.db_file}: {stats['rows_compacted']} rows compacted over "
+                    f"{stats['days_compacted']} days, {stats['rows_deleted']} rows deleted over "
+                    f"{stats['days_deleted']} days, {stats['pages_freed']} pages freed in {stats['seconds']:.2f}s")
+        return stats
+
+    @staticmethod
+    def _count_archived(stats, archived):
+        stats["rows_archived"] += archived[0]
+        stats["quotes_archived"] += archived[1]
+
+    def _vacuum(self, conn):
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+            # auto_vacuum only changes with a full VACUUM; later runs free pages incrementally
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            conn.execute(f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}")
+            conn.execute("VACUUM")
+            return free_pages
+        free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        pages = self.vacuum_pages or free_pages
+        # executescript steps the pragma to completion; execute() would free a single page
+        conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        return free_pages - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+
+class _transaction(object):
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive, compact and delete old market snapshots")
+    parser.add_argument("database", help="snapshot database")
+    parser.add_argument("--keep-days", type=int, default=365, help="delete days older than this")
+    parser.add_argument("--keep-intraday-days", type=int, default=30,
+                        help="keep only the last snapshot per symbol of days older than this")
+    parser.add_argument("--archive-dir", help="Parquet archive for removed rows (requires pyarrow)")
+    parser.add_argument("--dry-run", action="store_true", help="only print the days that would change")
+    args = parser.parse_args(argv)
+    manager = RetentionManager(args.database, args.keep_days, args.keep_intraday_days, args.archive_dir)
+    stats = manager.run(dry_run=args.dry_run)
+    if args.dry_run:
+        print(f"compact: {stats['compact_days']}\ndelete: {stats['delete_days']}")
+    else:
+        print(f"{args.database}: {stats['rows_archived']} rows and {stats['quotes_archived']} quotes archived, "
+              f"{stats['rows_compacted']} compacted, "
+              f"{stats['rows_deleted']} deleted, {stats['pages_freed']} pages freed in {stats['seconds']:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
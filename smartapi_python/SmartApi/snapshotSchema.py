@@ -0,0 +1,495 @@
+import sys
+import time
+import sqlite3
+import argparse
+from datetime import datetime
+from logzero import logger
+from SmartApi.quoteRecord import record_trade_volume
+
+
+# Stored in PRAGMA user_version. 0 / 1 is the original untyped market_data table,
+# 2 added market_snapshots, 3 the market_quotes records, 4 the hourly/daily rollups and
+# 5 the traded volume of the quotes and rollups.
+SCHEMA_VERSION = 5
+
+LEGACY_TABLE = "market_data"
+SNAPSHOT_TABLE = "market_snapshots"
+QUOTE_TABLE = "market_quotes"
+HOURLY_ROLLUP_TABLE = "snapshot_rollup_hourly"
+DAILY_ROLLUP_TABLE = "snapshot_rollup_daily"
+
+# trade_date is YYYYMMDD and snapshot_time HHMMSS of the exchange-local snapshot time, so
+# both sort and range-compare as plain integers. buy_qty / sell_qty are NULL for rows
+# migrated from the old table, which only kept the rounded percentages.
+# WITHOUT ROWID makes the primary key the clustered index: per-symbol range reads are a
+# single covering b-tree scan.
+CREATE_SNAPSHOT_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {SNAPSHOT_TABLE} (
+        symbol TEXT NOT NULL,
+        trade_date INTEGER NOT NULL CHECK (trade_date BETWEEN 19000101 AND 99991231),
+        snapshot_time INTEGER NOT NULL CHECK (snapshot_time BETWEEN 0 AND 235959),
+        buy_qty INTEGER,
+        sell_qty INTEGER,
+        buy_pct REAL NOT NULL,
+        sell_pct REAL NOT NULL,
+        PRIMARY KEY (symbol, trade_date, snapshot_time)
+    ) WITHOUT ROWID
+"""
+
+# Covering index for date-range reads across all symbols
+CREATE_SNAPSHOT_DATE_INDEX = f"""
+    CREATE INDEX IF NOT EXISTS idx_{SNAPSHOT_TABLE}_date
+    ON {SNAPSHOT_TABLE} (trade_date, symbol, snapshot_time, buy_pct, sell_pct)
+"""
+
+# The whole FULL-mode quote of each snapshot row: record is one packed quoteRecord.QUOTE_DTYPE
+# record (all numeric fields and five levels of depth), so a day of quotes loads with a
+# single np.frombuffer instead of a decode per row and column. trade_volume repeats the
+# record's cumulative day volume so the rollups can read it in SQL.
+CREATE_QUOTE_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {QUOTE_TABLE} (
+        symbol TEXT NOT NULL,
+        trade_date INTEGER NOT NULL,
+        snapshot_time INTEGER NOT NULL,
+        trade_volume INTEGER,
+        record BLOB NOT NULL,
+        PRIMARY KEY (symbol, trade_date, snapshot_time)
+    ) WITHOUT ROWID
+"""
+
+CREATE_QUOTE_DATE_INDEX = f"""
+    CREATE INDEX IF NOT EXISTS idx_{QUOTE_TABLE}_date ON {QUOTE_TABLE} (trade_date)
+"""
+
+# Aggregates of the snapshots of one symbol in one hour / one day. The mean buy% is
+# buy_pct_sum / samples, so rollups combine exactly into coarser ones. book_*_qty_sum add up
+# the resting totBuyQuan / totSellQuan of the snapshots (divided by samples, the mean order
+# book size); they are not traded volume. The last_* columns are the values of the latest
+# snapshot (taken at last_time, HHMMSS) of the period; last_trade_volume is the cumulative
+# day volume of its quote, so the volume traded in a period is its last_trade_volume minus
+# the one of the period before it on the same day.
+ROLLUP_COLUMNS = ("samples", "buy_pct_sum", "buy_pct_min", "buy_pct_max", "book_buy_qty_sum", "book_sell_qty_sum",
+                  "last_time", "last_buy_pct", "last_sell_pct", "last_buy_qty", "last_sell_qty", "last_trade_volume")
+
+_ROLLUP_COLUMN_DEFINITIONS = """
+        samples INTEGER NOT NULL,
+        buy_pct_sum REAL NOT NULL,
+        buy_pct_min REAL NOT NULL,
+        buy_pct_max REAL NOT NULL,
+        book_buy_qty_sum INTEGER,
+        book_sell_qty_sum INTEGER,
+        last_time INTEGER NOT NULL,
+        last_buy_pct REAL NOT NULL,
+        last_sell_pct REAL NOT NULL,
+        last_buy_qty INTEGER,
+        last_sell_qty INTEGER,
+        last_trade_volume INTEGER,"""
+
+CREATE_HOURLY_ROLLUP_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {HOURLY_ROLLUP_TABLE} (
+        symbol TEXT NOT NULL,
+        trade_date INTEGER NOT NULL,
+        hour INTEGER NOT NULL,{_ROLLUP_COLUMN_DEFINITIONS}
+        PRIMARY KEY (symbol, trade_date, hour)
+    ) WITHOUT ROWID
+"""
+
+CREATE_DAILY_ROLLUP_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {DAILY_ROLLUP_TABLE} (
+        symbol TEXT NOT NULL,
+        trade_date INTEGER NOT NULL,{_ROLLUP_COLUMN_DEFINITIONS}
+        PRIMARY KEY (symbol, trade_date)
+    ) WITHOUT ROWID
+"""
+
+# What each level aggregates from: (table, samples, buy% sum, buy% min, buy% max, buy qty,
+# sell qty, time of the row, the row's last buy%, sell%, buy qty, sell qty and trade volume,
+# and the join that brings the trade volume in)
+ROLLUP_SOURCES = {
+    "snapshot": (SNAPSHOT_TABLE, "1", "buy_pct", "buy_pct", "buy_pct", "buy_qty", "sell_qty", "snapshot_time",
+                 ("l.buy_pct", "l.sell_pct", "l.buy_qty", "l.sell_qty", "q.trade_volume"),
+                 f"LEFT JOIN {QUOTE_TABLE} AS q ON q.symbol = l.symbol AND q.trade_date = l.trade_date "
+                 f"AND q.snapshot_time = l.snapshot_time"),
+    "hour": (HOURLY_ROLLUP_TABLE, "samples", "buy_pct_sum", "buy_pct_min", "buy_pct_max", "book_buy_qty_sum",
+             "book_sell_qty_sum", "last_time",
+             ("l.last_buy_pct", "l.last_sell_pct", "l.last_buy_qty", "l.last_sell_qty", "l.last_trade_volume"), ""),
+    "day": (DAILY_ROLLUP_TABLE, "samples", "buy_pct_sum", "buy_pct_min", "buy_pct_max", "book_buy_qty_sum",
+            "book_sell_qty_sum", "last_time",
+            ("l.last_buy_pct", "l.last_sell_pct", "l.last_buy_qty", "l.last_sell_qty", "l.last_trade_volume"), ""),
+}
+
+
+def rollup_select(source, bucket, where):
+    """
+        SELECT combining the rows of source ("snapshot", "hour" or "day") that match where into
+        one row per symbol, trade_date and hour (bucket "hour") or per symbol and trade_date
+        (bucket "day"). Its columns are symbol, trade_date, [hour,] then ROLLUP_COLUMNS.
+        Written without a WITH clause so it can also be used inside a trigger.
+    """
+    table, samples, pct_sum, pct_min, pct_max, buy_qty, sell_qty, row_time, last_columns, join = ROLLUP_SOURCES[source]
+    hour = ", g.hour" if bucket == "hour" else ""
+    group_hour = f", {row_time} / 10000 AS hour" if bucket == "hour" else ""
+    last = ", ".join(f"{column} AS {name}" for column, name in zip(last_columns, ROLLUP_COLUMNS[-5:]))
+    return f"""
+        SELECT g.symbol, g.trade_date{hour}, g.samples, g.buy_pct_sum, g.buy_pct_min, g.buy_pct_max,
+               g.book_buy_qty_sum, g.book_sell_qty_sum, g.last_time, {last}
+        FROM (
+            SELECT symbol, trade_date{group_hour}, sum({samples}) AS samples, sum({pct_sum}) AS buy_pct_sum,
+                   min({pct_min}) AS buy_pct_min, max({pct_max}) AS buy_pct_max, sum({buy_qty}) AS book_buy_qty_sum,
+                   sum({sell_qty}) AS book_sell_qty_sum, max({row_time}) AS last_time
+            FROM {table} WHERE {where}
+            GROUP BY symbol, trade_date{", hour" if bucket == "hour" else ""}
+        ) AS g
+        JOIN {table} AS l ON l.symbol = g.symbol AND l.trade_date = g.trade_date AND l.{row_time} = g.last_time
+        {join}
+    """
+
+
+def _rollup_upsert(bucket, where):
+    source, table, key = ("snapshot", HOURLY_ROLLUP_TABLE, "symbol, trade_date, hour") if bucket == "hour" \
+        else ("hour", DAILY_ROLLUP_TABLE, "symbol, trade_date")
+    return f"INSERT OR REPLACE INTO {table} ({key}, {', '.join(ROLLUP_COLUMNS)}) {rollup_select(source, bucket, where)}"
+
+
+# Recompute the rollups a batch of snapshot rows touched: the hour from its raw rows, then the
+# day from its (at most a dozen) hourly rows. Recomputing instead of adding the new rows in
+# keeps the rollups exact when a snapshot is written again and replaces an earlier row.
+REFRESH_HOURLY_ROLLUP = _rollup_upsert("hour", "symbol = ?1 AND trade_date = ?2 "
+                                               "AND snapshot_time BETWEEN ?3 * 10000 AND ?3 * 10000 + 9999")
+REFRESH_DAILY_ROLLUP = _rollup_upsert("day", "symbol = ?1 AND trade_date = ?2")
+REBUILD_HOURLY_ROLLUP = _rollup_upsert("hour", "trade_date = ?1")
+REBUILD_DAILY_ROLLUP = _rollup_upsert("day", "trade_date = ?1")
+
+# An hour of a day retention compacted keeps the rollup of every snapshot it had, but only
+# some of its rows. This is the part of its rollup whose rows are gone: the rollup minus
+# the stored rows (min / max / last_* stay those of the whole rollup); no row for an hour
+# whose rows are all stored.
+SELECT_COMPACTED_HOUR = f"""
+    SELECT h.samples - count(s.symbol), h.buy_pct_sum - total(s.buy_pct), h.buy_pct_min, h.buy_pct_max,
+           CAST(h.book_buy_qty_sum - total(s.buy_qty) AS INTEGER),
+           CAST(h.book_sell_qty_sum - total(s.sell_qty) AS INTEGER),
+           h.last_time, h.last_buy_pct, h.last_sell_pct, h.last_buy_qty, h.last_sell_qty, h.last_trade_volume
+    FROM {HOURLY_ROLLUP_TABLE} AS h
+    LEFT JOIN {SNAPSHOT_TABLE} AS s
+      ON s.symbol = h.symbol AND s.trade_date = h.trade_date
+     AND s.snapshot_time BETWEEN h.hour * 10000 AND h.hour * 10000 + 9999
+    WHERE h.symbol = ?1 AND h.trade_date = ?2 AND h.hour = ?3
+    GROUP BY h.symbol, h.trade_date, h.hour
+    HAVING h.samples > count(s.symbol)
+"""
+
+SELECT_HOUR_OF_SNAPSHOTS = rollup_select("snapshot", "hour", "symbol = ?1 AND trade_date = ?2 "
+                                                             "AND snapshot_time BETWEEN ?3 * 10000 AND ?3 * 10000 + 9999")
+
+REPLACE_HOURLY_ROLLUP = f"""
+    INSERT OR REPLACE INTO {HOURLY_ROLLUP_TABLE} (symbol, trade_date, hour, {', '.join(ROLLUP_COLUMNS)})
+    VALUES ({', '.join('?' * (3 + len(ROLLUP_COLUMNS)))})
+"""
+
+# Old readers keep selecting symbol, date and buy_sell_volume_percent from market_data
+CREATE_COMPATIBILITY_VIEW = f"""
+    CREATE VIEW IF NOT EXISTS {LEGACY_TABLE} AS
+    SELECT symbol,
+           printf('%04d-%02d-%02d %02d:%02d:%02d',
+                  trade_date / 10000, trade_date / 100 % 100, trade_date % 100,
+                  snapshot_time / 10000, snapshot_time / 100 % 100, snapshot_time % 100) AS date,
+           printf('%d/%d', CAST(round(buy_pct) AS INTEGER), CAST(round(sell_pct) AS INTEGER)) AS buy_sell_volume_percent
+    FROM {SNAPSHOT_TABLE}
+"""
+
+# ... and old writers keep inserting "YYYY-MM-DD HH:MM:SS" / "buy/sell" strings into it
+_NEW_TRADE_DATE = "CAST(replace(substr(NEW.date, 1, 10), '-', '') AS INTEGER)"
+_NEW_SNAPSHOT_TIME = "CAST(replace(substr(NEW.date || ' 00:00:00', 12, 8), ':', '') AS INTEGER)"
+
+CREATE_COMPATIBILITY_INSERT_TRIGGER = f"""
+    CREATE TRIGGER IF NOT EXISTS {LEGACY_TABLE}_insert INSTEAD OF INSERT ON {LEGACY_TABLE}
+    BEGIN
+        INSERT OR REPLACE INTO {SNAPSHOT_TABLE} (symbol, trade_date, snapshot_time, buy_qty, sell_qty, buy_pct, sell_pct)
+        VALUES (
+            NEW.symbol,
+            {_NEW_TRADE_DATE},
+            {_NEW_SNAPSHOT_TIME},
+            NULL,
+            NULL,
+            CAST(substr(NEW.buy_sell_volume_percent, 1, instr(NEW.buy_sell_volume_percent, '/') - 1) AS REAL),
+            CAST(substr(NEW.buy_sell_volume_percent, instr(NEW.buy_sell_volume_percent, '/') + 1) AS REAL)
+        );
+        {_rollup_upsert("hour", f"symbol = NEW.symbol AND trade_date = {_NEW_TRADE_DATE} AND snapshot_time "
+                                f"BETWEEN {_NEW_SNAPSHOT_TIME} / 10000 * 10000 AND {_NEW_SNAPSHOT_TIME} / 10000 * 10000 + 9999")};
+        {_rollup_upsert("day", f"symbol = NEW.symbol AND trade_date = {_NEW_TRADE_DATE}")};
+    END
+"""
+
+INSERT_SNAPSHOT = f"""
+    INSERT OR REPLACE INTO {SNAPSHOT_TABLE} (symbol, trade_date, snapshot_time, buy_qty, sell_qty, buy_pct, sell_pct)
+    VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_QUOTE = f"""
+    INSERT OR REPLACE INTO {QUOTE_TABLE} (symbol, trade_date, snapshot_time, trade_volume, record)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+# Schema 5 renamed the order book sums of the rollups, which schema 4 called buy_qty_sum / sell_qty_sum
+_RENAMED_ROLLUP_COLUMNS = (("buy_qty_sum", "book_buy_qty_sum"), ("sell_qty_sum", "book_sell_qty_sum"))
+
+MIGRATION_CHUNK_SIZE = 10000
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _object_type(conn, name):
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({table})")]
+
+
+def _add_trade_volumes(conn):
+    """
+        Bring the market_quotes and rollup tables of a schema 3 / 4 database to schema 5
+    """
+    if _object_type(conn, QUOTE_TABLE) == "table" and "trade_volume" not in _columns(conn, QUOTE_TABLE):
+        conn.execute(f"ALTER TABLE {QUOTE_TABLE} ADD COLUMN trade_volume INTEGER")
+        conn.create_function("record_trade_volume", 1, record_trade_volume, deterministic=True)
+        conn.execute(f"UPDATE {QUOTE_TABLE} SET trade_volume = record_trade_volume(record)")
+    for table in (HOURLY_ROLLUP_TABLE, DAILY_ROLLUP_TABLE):
+        if _object_type(conn, table) != "table" or "last_trade_volume" in _columns(conn, table):
+            continue
+        # ALTER keeps the rollups of compacted days, which could not be rebuilt from their rows
+        for old_name, new_name in _RENAMED_ROLLUP_COLUMNS:
+            conn.execute(f"ALTER TABLE {table} RENAME COLUMN {old_name} TO {new_name}")
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN last_trade_volume INTEGER")
+        conn.execute(f"""
+            UPDATE {table} SET last_trade_volume = (
+                SELECT q.trade_volume FROM {QUOTE_TABLE} AS q
+                WHERE q.symbol = {table}.symbol AND q.trade_date = {table}.trade_date
+                  AND q.snapshot_time = {table}.last_time
+            )
+        """)
+
+
+def snapshot_key(timestamp):
+    """
+        (trade_date, snapshot_time) integers of a datetime or a "YYYY-MM-DD[ HH:MM:SS]" string
+    """
+    if isinstance(timestamp, datetime):
+        return (timestamp.year * 10000 + timestamp.month * 100 + timestamp.day,
+                timestamp.hour * 10000 + timestamp.minute * 100 + timestamp.second)
+    text = str(timestamp).strip()
+    if len(text) >= 10 and text[4] == "-" and text[7] == "-":
+        trade_date = int(text[0:4]) * 10000 + int(text[5:7]) * 100 + int(text[8:10])
+        if len(text) >= 19 and text[13] == ":" and text[16] == ":":
+            return trade_date, int(text[11:13]) * 10000 + int(text[14:16]) * 100 + int(text[17:19])
+        if len(text) == 10:
+            return trade_date, 0
+    return snapshot_key(datetime.fromisoformat(text))
+
+
+def percentages(buy_qty, sell_qty):
+    """
+        Unrounded (buy_pct, sell_pct) of a pair of quantities; both 0 when nothing is quoted
+    """
+    total = (buy_qty or 0) + (sell_qty or 0)
+    if total <= 0:
+        return 0.0, 0.0
+    return buy_qty * 100.0 / total, sell_qty * 100.0 / total
+
+
+def snapshot_row(symbol, timestamp, buy_qty, sell_qty):
+    """
+        Row tuple for INSERT_SNAPSHOT from raw buy and sell quantities
+    """
+    trade_date, snapshot_time = snapshot_key(timestamp)
+    buy_pct, sell_pct = percentages(buy_qty, sell_qty)
+    return symbol, trade_date, snapshot_time, buy_qty, sell_qty, buy_pct, sell_pct
+
+
+def parse_legacy_row(symbol, date, buy_sell_volume_percent):
+    """
+        Row tuple for INSERT_SNAPSHOT from an old market_data row, or None if it cannot be parsed
+    """
+    try:
+        trade_date, snapshot_time = snapshot_key(date)
+        buy, sell = str(buy_sell_volume_percent).split("/")
+        return symbol.strip(), trade_date, snapshot_time, None, None, float(buy), float(sell)
+    except (ValueError, AttributeError, IndexError):
+        return None
+
+
+def compacted_hours(conn, rows):
+    """
+        {(symbol, trade_date, hour): the SELECT_COMPACTED_HOUR part} of the hours of snapshot rows
+        that retention compacted; call it before writing the rows, and pass it to refresh_rollups
+    """
+    compacted = {}
+    for hour in sorted(set((row[0], row[1], row[2] // 10000) for row in rows)):
+        part = conn.execute(SELECT_COMPACTED_HOUR, hour).fetchone()
+        if part is not None:
+            compacted[hour] = part
+    return compacted
+
+
+def _add(first, second):
+    return None if first is None and second is None else (first or 0) + (second or 0)
+
+
+def _combine_rollups(compacted, stored):
+    """
+        ROLLUP_COLUMNS of an hour from the part of its rollup compacted away and the rollup of its stored rows
+    """
+    if stored is None:
+        return tuple(compacted)
+    last = stored[6:] if stored[6] >= compacted[6] else compacted[6:]
+    return (compacted[0] + stored[0], compacted[1] + stored[1], min(compacted[2], stored[2]),
+            max(compacted[3], stored[3]), _add(compacted[4], stored[4]), _add(compacted[5], stored[5])) + tuple(last)
+
+
+def refresh_rollups(conn, rows, compacted=None):
+    """
+        Bring the hourly and daily rollups up to date with snapshot rows (INSERT_SNAPSHOT tuples)
+        just written on conn; run it in the same transaction as the write. An hour is recomputed
+        from its rows, except the hours in compacted (see compacted_hours), whose rollup combines
+        the part compacted away with their rows, so a compacted day is never rebuilt from the
+        rows retention left.
+    """
+    compacted = compacted or {}
+    hours = sorted(set((row[0], row[1], row[2] // 10000) for row in rows))
+    conn.executemany(REFRESH_HOURLY_ROLLUP, [hour for hour in hours if hour not in compacted])
+    for hour in hours:
+        if hour in compacted:
+            stored = conn.execute(SELECT_HOUR_OF_SNAPSHOTS, hour).fetchone()
+            conn.execute(REPLACE_HOURLY_ROLLUP, hour + _combine_rollups(compacted[hour], stored and stored[3:]))
+    conn.executemany(REFRESH_DAILY_ROLLUP, sorted(set(hour[:2] for hour in hours)))
+
+
+def rebuild_rollups(conn, trade_dates=None):
+    """
+        Recompute the rollups of whole days (every day with snapshots when trade_dates is None)
+        from their rows; a day retention compacted loses its intraday aggregates, so use
+        refresh_rollups for those
+    """
+    if trade_dates is None:
+        trade_dates = [row[0] for row in conn.execute(f"SELECT DISTINCT trade_date FROM {SNAPSHOT_TABLE}")]
+    days = [(trade_date,) for trade_date in sorted(set(trade_dates))]
+    conn.executemany(f"DELETE FROM {HOURLY_ROLLUP_TABLE} WHERE trade_date = ?", days)
+    conn.executemany(f"DELETE FROM {DAILY_ROLLUP_TABLE} WHERE trade_date = ?", days)
+    conn.executemany(REBUILD_HOURLY_ROLLUP, days)
+    conn.executemany(REBUILD_DAILY_ROLLUP, days)
+    return len(days)
+
+
+def _create_objects(conn):
+    conn.execute(CREATE_SNAPSHOT_TABLE)
+    conn.execute(CREATE_SNAPSHOT_DATE_INDEX)
+    conn.execute(CREATE_QUOTE_TABLE)
+    conn.execute(CREATE_QUOTE_DATE_INDEX)
+    conn.execute(CREATE_HOURLY_ROLLUP_TABLE)
+    conn.execute(CREATE_DAILY_ROLLUP_TABLE)
+    conn.execute(CREATE_COMPATIBILITY_VIEW)
+    conn.execute(CREATE_COMPATIBILITY_INSERT_TRIGGER)
+
+
+def _run_migration(conn, chunk_size):
+    """
+        Upgrade the database behind conn to SCHEMA_VERSION inside one transaction.
+        conn must be in autocommit mode (isolation_level=None).
+    """
+    stats = {"from_version": schema_version(conn), "to_version": SCHEMA_VERSION, "rows_read": 0,
+             "rows_written": 0, "rows_skipped": 0, "duplicates": 0, "seconds": 0.0}
+    if stats["from_version"] >= SCHEMA_VERSION:
+        return stats
+    started = time.perf_counter()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        legacy = _object_type(conn, LEGACY_TABLE) == "table"
+        if legacy:
+            conn.execute(f"ALTER TABLE {LEGACY_TABLE} RENAME TO {LEGACY_TABLE}_v1")
+        # The compatibility trigger changed in schemas 4 and 5; recreate it
+        conn.execute(f"DROP TRIGGER IF EXISTS {LEGACY_TABLE}_insert")
+        _add_trade_volumes(conn)
+        _create_objects(conn)
+        if legacy:
+            # Stream the old rows in rowid order so memory stays flat whatever the table size;
+            # a later duplicate of (symbol, date) replaces the earlier one, as the writer does
+            reader = conn.cursor()
+            reader.execute(f"SELECT symbol, date, buy_sell_volume_percent FROM {LEGACY_TABLE}_v1 ORDER BY rowid")
+            while True:
+                chunk = reader.fetchmany(chunk_size)
+                if not chunk:
+                    break
+                stats["rows_read"] += len(chunk)
+                rows = [row for row in (parse_legacy_row(*legacy_row) for legacy_row in chunk) if row is not None]
+                stats["rows_skipped"] += len(chunk) - len(rows)
+                conn.executemany(INSERT_SNAPSHOT, rows)
+            conn.execute(f"DROP TABLE {LEGACY_TABLE}_v1")
+            stats["rows_written"] = conn.execute(f"SELECT count(*) FROM {SNAPSHOT_TABLE}").fetchone()[0]
+            stats["duplicates"] = stats["rows_read"] - stats["rows_skipped"] - stats["rows_written"]
+        if stats["from_version"] < 4:
+            rebuild_rollups(conn)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    stats["seconds"] = time.perf_counter() - started
+    if stats["rows_read"]:
+        logger.info(f"Migrated {stats['rows_read']} market_data rows to schema {SCHEMA_VERSION} "
+                    f"({stats['duplicates']} duplicates, {stats['rows_skipped']} unparseable) "
+                    f"in {stats['seconds']:.2f}s")
+    return stats
+
+
+def ensure_schema(conn, chunk_size=MIGRATION_CHUNK_SIZE):
+    """
+        Create the current schema on a new database or migrate an old one in place.
+        Returns the migration stats (rows_read is 0 when there was nothing to convert).
+    """
+    isolation_level = conn.isolation_level
+    if conn.in_transaction:
+        conn.commit()
+    conn.isolation_level = None
+    try:
+        return _run_migration(conn, chunk_size)
+    finally:
+        conn.isolation_level = isolation_level
+
+
+def migrate(db_file, chunk_size=MIGRATION_CHUNK_SIZE, vacuum=False):
+    """
+        Convert db_file to the current schema in place; vacuum reclaims the space of the dropped table
+    """
+    conn = sqlite3.connect(db_file, isolation_level=None)
+    try:
+        conn.execute("PRAGMA busy_timeout=5000")
+        stats = _run_migration(conn, chunk_size)
+        if vacuum and stats["rows_read"]:
+            conn.execute("VACUUM")
+        return stats
+    finally:
+        conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Migrate market_data databases to the typed snapshot schema")
+    parser.add_argument("databases", nargs="+", help="SQLite files to convert in place")
+    parser.add_argument("--chunk-size", type=int, default=MIGRATION_CHUNK_SIZE, help="rows read per batch")
+    parser.add_argument("--vacuum", action="store_true", help="VACUUM each database after converting it")
+    args = parser.parse_args(argv)
+    for db_file in args.databases:
+        stats = migrate(db_file, args.chunk_size, args.vacuum)
+        if stats["from_version"] >= SCHEMA_VERSION:
+            print(f"{db_file}: already at schema {stats['from_version']}")
+        else:
+            print(f"{db_file}: schema {stats['from_version']} -> {SCHEMA_VERSION}, {stats['rows_read']} rows read, "
+                  f"{stats['rows_written']} kept, {stats['duplicates']} duplicates, {stats['rows_skipped']} skipped "
+                  f"in {stats['seconds']:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
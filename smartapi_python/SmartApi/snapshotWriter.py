@@ -0,0 +1,138 @@
+import time
+import sqlite3
+from logzero import logger
+from SmartApi.snapshotSchema import (INSERT_QUOTE, INSERT_SNAPSHOT, compacted_hours, ensure_schema, refresh_rollups,
+                                     snapshot_key, snapshot_row)
+from SmartApi.quoteRecord import decode_quotes
+
+
+# Connection settings for a single writer: WAL lets readers (the dashboards) keep reading while a
+# snapshot is written, and synchronous=NORMAL only fsyncs at checkpoints instead of on every commit
+WRITER_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA busy_timeout=5000"
+)
+
+
+class SnapshotWriter(object):
+    """
+    Batched writer of market_snapshots rows.
+
+    Keeps one connection open for the whole run, buffers rows in memory and writes each
+    batch with a single executemany inside one transaction, so a snapshot of a few
+    hundred instruments costs one commit instead of one commit (and fsync) per row.
+    Use it as a context manager, or call close() to flush the last batch. Opening a
+    database with the old untyped market_data table migrates it first. With a
+    history_store (HistoryStore) every flushed batch is also appended to its Parquet history.
+    add_quotes() also keeps the whole FULL-mode quote of each row in market_quotes. The hourly
+    and daily rollups of the symbols in a batch are brought up to date in the same transaction.
+    """
+
+    BATCH_SIZE = 5000
+
+    def __init__(self, db_file, batch_size=BATCH_SIZE, history_store=None):
+        self.db_file = db_file
+        self.batch_size = batch_size
+        self.history_store = history_store
+        self._conn = sqlite3.connect(db_file)
+        for pragma in WRITER_PRAGMAS:
+            self._conn.execute(pragma)
+        ensure_schema(self._conn)
+        self._rows = []
+        self._quote_rows = []
+        self.rows_written = 0
+        self.batches_written = 0
+        self.write_seconds = 0.0
+
+    def add(self, symbol, timestamp, buy_qty, sell_qty):
+        """
+            Buffer one snapshot row; the batch is written once batch_size rows are pending.
+            timestamp is a datetime or "YYYY-MM-DD HH:MM:SS" string; a row for the same symbol
+            and time replaces the earlier one.
+        """
+        self._rows.append(snapshot_row(symbol, timestamp, buy_qty, sell_qty))
+        if len(self._rows) >= self.batch_size:
+            self.flush()
+
+    def add_quotes(self, fetched, timestamp):
+        """
+            Buffer a snapshot row and a market_quotes record for every instrument of a FULL-mode
+            quote response (its data["fetched"] list), all stamped with timestamp
+        """
+        symbols, records = decode_quotes(fetched)
+        return self.add_records(symbols, records, timestamp)
+
+    def add_records(self, symbols, records, timestamp):
+        """
+            Buffer rows for quotes already decoded by quoteRecord.decode_quotes
+        """
+        trade_date, snapshot_time = snapshot_key(timestamp)
+        buy_qty = records["tot_buy_qty"].tolist()
+        sell_qty = records["tot_sell_qty"].tolist()
+        trade_volume = records["trade_volume"].tolist()
+        for i, symbol in enumerate(symbols):
+            self._quote_rows.append((symbol, trade_date, snapshot_time, trade_volume[i], records[i].tobytes()))
+            self.add(symbol, timestamp, buy_qty[i], sell_qty[i])
+        return len(symbols)
+
+    def flush(self):
+        """
+            Write the pending rows in one transaction; returns the number of rows written
+        """
+        if not self._rows:
+            return 0
+        rows = self._rows
+        quote_rows = self._quote_rows
+        started = time.perf_counter()
+        try:
+            with self._conn:
+                compacted = compacted_hours(self._conn, rows)
+                self._conn.executemany(INSERT_SNAPSHOT, rows)
+                self._conn.executemany(INSERT_QUOTE, quote_rows)
+                refresh_rollups(self._conn, rows, compacted)
+        except sqlite3.Error as e:
+            logger.error(f"Error writing {len(rows)} snapshot rows: {e}")
+            raise
+        self.write_seconds += time.perf_counter() - started
+        self._rows = []
+        self._quote_rows = []
+        if self.history_store is not None:
+            try:
+                self.history_store.write_snapshots(rows)
+            except Exception as e:
+                logger.error(f"Error writing {len(rows)} snapshot rows to the history store: {e}")
+        self.rows_written += len(rows)
+        self.batches_written += 1
+        return len(rows)
+
+    def pending(self):
+        return len(self._rows)
+
+    def stats(self):
+        return {
+            "rows_written": self.rows_written,
+            "batches_written": self.batches_written,
+            "write_seconds": self.write_seconds,
+            "rows_per_second": self.rows_written / self.write_seconds if self.write_seconds else None
+        }
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            # Keep the rows of a failed run out of the database rather than writing a partial batch
+            self._rows = []
+            self._quote_rows = []
+            self._conn.close()
@@ -0,0 +1,535 @@
+import os
+import json
+import socket
+import struct
+import threading
+from collections import deque
+from logzero import logger
+
+
+# Every message on a relay socket is a length-prefixed frame: payload length, kind, payload.
+# KIND_PACKET payloads are SmartStream binary packets exactly as received upstream;
+# KIND_CONTROL payloads are JSON requests (client -> relay) or replies (relay -> client).
+FRAME_HEADER = struct.Struct("<IB")
+KIND_PACKET = 1
+KIND_CONTROL = 2
+
+# Requests use the SmartWebSocketV2 format, {"action": ..., "params": {"mode": ..., "tokenList": [...]}},
+# plus a configure action whose params carry "conflateInterval" (seconds, 0 or None to disable)
+SUBSCRIBE_ACTION = 1
+UNSUBSCRIBE_ACTION = 0
+CONFIGURE_ACTION = 2
+
+# A packet starts with subscription mode (1 byte), exchange type (1 byte) and the
+# null-padded token (25 bytes); those 27 bytes route it to subscribed clients
+TOKEN_LENGTH = 25
+PACKET_KEY_LENGTH = 2 + TOKEN_LENGTH
+
+MAX_FRAME_LENGTH = 1 << 20
+
+
+def packet_key(mode, exchange_type, token):
+    """
+        Routing key of a (mode, exchange type, token) subscription, equal to the first bytes of its packets
+    """
+    return bytes((mode, exchange_type)) + str(token).encode("ascii").ljust(TOKEN_LENGTH, b"\x00")
+
+
+def parse_packet_key(packet):
+    """
+        (mode, exchange_type, token) of a packet or routing key
+    """
+    return packet[0], packet[1], bytes(packet[2:PACKET_KEY_LENGTH]).split(b"\x00", 1)[0].decode("ascii")
+
+
+def encode_frame(kind, payload):
+    return FRAME_HEADER.pack(len(payload), kind) + payload
+
+
+def read_frame(sock):
+    """
+        Read one frame from sock as (kind, payload); None once the peer has closed the connection
+    """
+    header = _read_exact(sock, FRAME_HEADER.size)
+    if header is None:
+        return None
+    length, kind = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_LENGTH:
+        raise ValueError(f"Relay frame of {length} bytes exceeds the limit")
+    payload = _read_exact(sock, length)
+    if payload is None:
+        return None
+    return kind, payload
+
+
+def _read_exact(sock, length):
+    buffer = bytearray(length)
+    view = memoryview(buffer)
+    received = 0
+    while received < length:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            return None
+        received += count
+    return bytes(buffer)
+
+
+def _create_socket(address):
+    if isinstance(address, str):
+        return socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    return socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+
+
+def _group_token_list(keys):
+    """
+        {mode: token_list} in SmartWebSocketV2 format for an iterable of routing keys
+    """
+    grouped = {}
+    for key in keys:
+        mode, exchange_type, token = parse_packet_key(key)
+        grouped.setdefault(mode, {}).setdefault(exchange_type, []).append(token)
+    return {
+        mode: [{"exchangeType": exchange_type, "tokens": tokens} for exchange_type, tokens in exchanges.items()]
+        for mode, exchanges in grouped.items()
+    }
+
+
+class _RelayClient(object):
+    """
+    One connected internal client: its subscriptions, outbound queue and writer thread.
+    """
+
+    def __init__(self, relay, sock, client_id):
+        self.relay = relay
+        self.sock = sock
+        self.client_id = client_id
+        self.keys = set()
+        self.conflate_interval = None
+        self.closed = False
+        self.packets_sent = 0
+        self.packets_conflated = 0
+        self._condition = threading.Condition()
+        self._control = deque()
+        self._queue = deque()
+        self._latest = {}
+        self._stop_event = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._read_loop, name=f"relay-client-{self.client_id}-reader", daemon=True).start()
+        threading.Thread(target=self._write_loop, name=f"relay-client-{self.client_id}-writer", daemon=True).start()
+
+    def enqueue(self, key, packet):
+        """
+            Queue a packet for this client; returns False if the client has fallen too far behind
+        """
+        with self._condition:
+            if self.closed:
+                return True
+            if self.conflate_interval:
+                if key in self._latest:
+                    self.packets_conflated += 1
+                self._latest[key] = packet
+            else:
+                if len(self._queue) >= self.relay.max_pending_packets:
+                    return False
+                self._queue.append(packet)
+            self._condition.notify()
+        return True
+
+    def send_control(self, message):
+        with self._condition:
+            self._control.append(json.dumps(message).encode("utf-8"))
+            self._condition.notify()
+
+    def configure(self, conflate_interval):
+        with self._condition:
+            self.conflate_interval = conflate_interval or None
+            # Packets queued before a switch keep their order ahead of conflated ones
+            if self.conflate_interval is None and self._latest:
+                self._queue.extend(self._latest.values())
+                self._latest.clear()
+            self._condition.notify()
+
+    def close(self):
+        with self._condition:
+            if self.closed:
+                return
+            self.closed = True
+            self._condition.notify()
+        self._stop_event.set()
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+    def _read_loop(self):
+        try:
+            while not self.closed:
+                frame = read_frame(self.sock)
+                if frame is None:
+                    break
+                kind, payload = frame
+                if kind != KIND_CONTROL:
+                    continue
+                try:
+                    request = json.loads(payload)
+                except ValueError:
+                    self.send_control({"status": False, "message": "Invalid JSON request"})
+                    continue
+                self.send_control(self.relay.handle_request(self, request))
+        except (OSError, ValueError) as e:
+            if not self.closed:
+                logger.warning(f"Relay client {self.client_id} read failed: {e}")
+        self.relay.remove_client(self)
+
+    def _write_loop(self):
+        try:
+            while True:
+                with self._condition:
+                    while not self.closed and not (self._control or self._queue or self._latest):
+                        self._condition.wait()
+                    if self.closed:
+                        return
+                    control = list(self._control)
+                    self._control.clear()
+                    packets = list(self._queue)
+                    self._queue.clear()
+                    if self._latest:
+                        packets.extend(self._latest.values())
+                        self._latest.clear()
+                    conflate_interval = self.conflate_interval
+                parts = [encode_frame(KIND_CONTROL, message) for message in control]
+                for packet in packets:
+                    parts.append(FRAME_HEADER.pack(len(packet), KIND_PACKET))
+                    parts.append(packet)
+                self.sock.sendall(b"".join(parts))
+                self.packets_sent += len(packets)
+                if conflate_interval and self._stop_event.wait(conflate_interval):
+                    return
+        except OSError as e:
+            if not self.closed:
+                logger.warning(f"Relay client {self.client_id} write failed: {e}")
+            self.relay.remove_client(self)
+
+
+class StreamRelay(object):
+    """
+    Local relay that holds the upstream SmartWebSocketV2 connections and rebroadcasts
+    their packets to internal clients over a Unix socket or a localhost TCP port.
+
+    Clients subscribe by mode and token with SmartWebSocketV2-style requests; the relay
+    reference-counts subscriptions across clients, so a token is subscribed upstream once
+    when the first client asks for it and unsubscribed when the last one leaves. New
+    tokens go to the upstream connection with the fewest subscriptions. Packets are
+    forwarded undecoded and only to the clients subscribed to them; a client that sets a
+    conflate interval receives just the latest packet of each token per interval, and a
+    client that lets max_pending_packets queue up without conflation is disconnected.
+    """
+
+    MAX_TOKENS_PER_CONNECTION = 1000
+    MAX_PENDING_PACKETS = 10000
+
+    def __init__(self, upstreams, address, max_pending_packets=MAX_PENDING_PACKETS, decode_upstream=False):
+        """
+            Parameters
+            ------
+            upstreams: SmartWebSocketV2 or list of SmartWebSocketV2
+                connections the relay subscribes through; they are hooked but not connected here
+            address: string or tuple
+                filesystem path of a Unix socket, or a (host, port) tuple such as ("127.0.0.1", 8765)
+            max_pending_packets: integer
+                per-client queue limit for clients that do not conflate
+            decode_upstream: bool
+                keep decoding packets and calling each upstream's on_data as well as relaying them
+        """
+        self.upstreams = upstreams if isinstance(upstreams, (list, tuple)) else [upstreams]
+        self.address = address
+        self.max_pending_packets = max_pending_packets
+        self._lock = threading.RLock()
+        # routing key -> tuple of clients, replaced rather than mutated so publish() needs no lock
+        self._subscribers = {}
+        self._owners = {}
+        self._clients = set()
+        self._next_client_id = 0
+        self._server = None
+        self._running = False
+        self.packets_in = 0
+        self.packets_routed = 0
+        for upstream in self.upstreams:
+            self.attach(upstream, decode_upstream)
+
+    def attach(self, smart_websocket, decode=False):
+        """
+            Relay every binary packet smart_websocket receives; without decode its own parsing is skipped
+        """
+        downstream = smart_websocket._on_data
+
+        def _on_data(wsapp, data, data_type, continue_flag):
+            if data_type == 2:
+                self.publish(data)
+                if not decode:
+                    return
+            downstream(wsapp, data, data_type, continue_flag)
+
+        smart_websocket._on_data = _on_data
+        return _on_data
+
+    def publish(self, packet):
+        """
+            Route one raw upstream packet to the clients subscribed to its mode and token
+        """
+        self.packets_in += 1
+        clients = self._subscribers.get(packet[:PACKET_KEY_LENGTH])
+        if not clients:
+            return
+        key = packet[:PACKET_KEY_LENGTH]
+        lagging = [client for client in clients if not client.enqueue(key, packet)]
+        self.packets_routed += len(clients)
+        for client in lagging:
+            logger.warning(f"Relay client {client.client_id} fell {self.max_pending_packets} packets behind, disconnecting")
+            self.remove_client(client)
+
+    def start(self, connect_upstreams=True):
+        """
+            Listen for clients on a background thread and, by default, run each upstream connection on its own thread
+        """
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        self._server = _create_socket(self.address)
+        if not isinstance(self.address, str):
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(self.address)
+        self._server.listen()
+        self._running = True
+        threading.Thread(target=self._accept_loop, name="relay-accept", daemon=True).start()
+        if connect_upstreams:
+            for upstream in self.upstreams:
+                threading.Thread(target=upstream.connect, name="relay-upstream", daemon=True).start()
+        logger.info(f"Stream relay listening on {self.address}")
+
+    def stop(self, close_upstreams=True):
+        self._running = False
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+        with self._lock:
+            clients = list(self._clients)
+        for client in clients:
+            self.remove_client(client)
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        if close_upstreams:
+            for upstream in self.upstreams:
+                upstream.close_connection()
+
+    def _accept_loop(self):
+        while self._running:
+            try:
+                sock, _ = self._server.accept()
+            except OSError:
+                break
+            with self._lock:
+                self._next_client_id += 1
+                client = _RelayClient(self, sock, self._next_client_id)
+                self._clients.add(client)
+            client.start()
+            logger.info(f"Relay client {client.client_id} connected")
+
+    def handle_request(self, client, request):
+        """
+            Apply one client request and return the reply sent back to it
+        """
+        action = request.get("action")
+        params = request.get("params") or {}
+        reply = {"status": True, "action": action}
+        if request.get("correlationID") is not None:
+            reply["correlationID"] = request["correlationID"]
+        try:
+            if action == CONFIGURE_ACTION:
+                client.configure(params.get("conflateInterval"))
+                return reply
+            mode = int(params["mode"])
+            keys = set(
+                packet_key(mode, int(entry["exchangeType"]), token)
+                for entry in params["tokenList"] for token in entry["tokens"]
+            )
+            if action == SUBSCRIBE_ACTION:
+                self.subscribe(client, keys)
+            elif action == UNSUBSCRIBE_ACTION:
+                self.unsubscribe(client, keys)
+            else:
+                raise ValueError(f"Unknown action {action}")
+        except Exception as e:
+            reply["status"] = False
+            reply["message"] = str(e)
+        return reply
+
+    def subscribe(self, client, keys):
+        with self._lock:
+            keys = set(keys) - client.keys
+            new_keys = [key for key in keys if key not in self._subscribers]
+            self._subscribe_upstream(new_keys)
+            for key in keys:
+                self._subscribers[key] = self._subscribers.get(key, ()) + (client,)
+            client.keys.update(keys)
+
+    def unsubscribe(self, client, keys):
+        with self._lock:
+            keys = set(keys) & client.keys
+            released = []
+            for key in keys:
+                remaining = tuple(c for c in self._subscribers[key] if c is not client)
+                if remaining:
+                    self._subscribers[key] = remaining
+                else:
+                    del self._subscribers[key]
+                    released.append(key)
+            client.keys.difference_update(keys)
+            self._unsubscribe_upstream(released)
+
+    def remove_client(self, client):
+        with self._lock:
+            if client not in self._clients:
+                return
+            self._clients.discard(client)
+            try:
+                self.unsubscribe(client, set(client.keys))
+            except Exception as e:
+                logger.error(f"Error releasing subscriptions of relay client {client.client_id}: {e}")
+        client.close()
+        logger.info(f"Relay client {client.client_id} disconnected")
+
+    def _subscribe_upstream(self, keys):
+        if not keys:
+            return
+        assigned = {}
+        loads = {upstream: upstream.subscriptions.count() for upstream in self.upstreams}
+        for key in keys:
+            upstream = min(self.upstreams, key=lambda u: loads[u])
+            if loads[upstream] >= self.MAX_TOKENS_PER_CONNECTION:
+                raise Exception(f"Relay is at capacity: {self.MAX_TOKENS_PER_CONNECTION} tokens on each of "
+                                f"{len(self.upstreams)} upstream connections")
+            loads[upstream] += 1
+            assigned.setdefault(upstream, []).append(key)
+        sent = []
+        try:
+            for upstream, upstream_keys in assigned.items():
+                by_mode = {}
+                for key in upstream_keys:
+                    by_mode.setdefault(parse_packet_key(key)[0], []).append(key)
+                for mode_keys in by_mode.values():
+                    for mode, token_list in _group_token_list(mode_keys).items():
+                        self._send_upstream(upstream, upstream.SUBSCRIBE_ACTION, mode, token_list)
+                    for key in mode_keys:
+                        self._owners[key] = upstream
+                    sent.extend(mode_keys)
+        except Exception:
+            # The caller records no subscribers for any of keys; release what already went
+            # upstream so a retry does not subscribe those keys a second time
+            try:
+                self._unsubscribe_upstream(sent)
+            except Exception as e:
+                logger.error(f"Error rolling back {len(sent)} upstream subscriptions: {e}")
+            raise
+
+    def _unsubscribe_upstream(self, keys):
+        if not keys:
+            return
+        by_upstream = {}
+        for key in keys:
+            by_upstream.setdefault(self._owners.pop(key), []).append(key)
+        for upstream, upstream_keys in by_upstream.items():
+            for mode, token_list in _group_token_list(upstream_keys).items():
+                self._send_upstream(upstream, upstream.UNSUBSCRIBE_ACTION, mode, token_list)
+
+    @staticmethod
+    def _send_upstream(upstream, action, mode, token_list):
+        wsapp = upstream.wsapp
+        if wsapp is not None and wsapp.sock is not None and wsapp.sock.connected:
+            if action == upstream.SUBSCRIBE_ACTION:
+                upstream.subscribe(None, mode, token_list)
+            else:
+                upstream.unsubscribe(None, mode, token_list)
+            return
+        # Not connected yet: register only, the upstream replays its registry when it opens
+        if action == upstream.SUBSCRIBE_ACTION:
+            upstream.subscriptions.add(mode, token_list)
+        else:
+            upstream.subscriptions.remove(mode, token_list)
+        upstream.RESUBSCRIBE_FLAG = True
+
+    def stats(self):
+        with self._lock:
+            clients = list(self._clients)
+            return {
+                "clients": len(clients),
+                "subscriptions": len(self._subscribers),
+                "client_subscriptions": sum(len(client.keys) for client in clients),
+                "upstream_tokens": [upstream.subscriptions.count() for upstream in self.upstreams],
+                "packets_in": self.packets_in,
+                "packets_routed": self.packets_routed,
+                "packets_sent": sum(client.packets_sent for client in clients),
+                "packets_conflated": sum(client.packets_conflated for client in clients)
+            }
+
+
+class StreamRelayClient(object):
+    """
+    Connection of an internal consumer to a StreamRelay.
+
+    subscribe() and unsubscribe() take the same mode and token_list arguments as
+    SmartWebSocketV2; messages() yields ("packet", raw SmartStream packet bytes) and
+    ("control", reply dict) tuples in the order the relay sent them.
+    """
+
+    def __init__(self, address, timeout=None):
+        self.address = address
+        self.sock = _create_socket(address)
+        self.sock.settimeout(timeout)
+        self.sock.connect(address)
+        self._send_lock = threading.Lock()
+
+    def _send(self, request):
+        with self._send_lock:
+            self.sock.sendall(encode_frame(KIND_CONTROL, json.dumps(request).encode("utf-8")))
+
+    def subscribe(self, mode, token_list, correlation_id=None):
+        self._send({"correlationID": correlation_id, "action": SUBSCRIBE_ACTION,
+                    "params": {"mode": mode, "tokenList": token_list}})
+
+    def unsubscribe(self, mode, token_list, correlation_id=None):
+        self._send({"correlationID": correlation_id, "action": UNSUBSCRIBE_ACTION,
+                    "params": {"mode": mode, "tokenList": token_list}})
+
+    def set_conflation(self, interval):
+        """
+            Receive at most one packet per token every interval seconds; 0 or None turns conflation off
+        """
+        self._send({"action": CONFIGURE_ACTION, "params": {"conflateInterval": interval}})
+
+    def receive(self):
+        """
+            Next ("packet", bytes) or ("control", dict) message, or None once the relay has closed the connection
+        """
+        frame = read_frame(self.sock)
+        if frame is None:
+            return None
+        kind, payload = frame
+        if kind == KIND_CONTROL:
+            return "control", json.loads(payload)
+        return "packet", payload
+
+    def messages(self):
+        while True:
+            message = self.receive()
+            if message is None:
+                return
+            yield message
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
@@ -0,0 +1,132 @@
+import threading
+
+
+class SubscriptionRegistry(object):
+    """
+    Per-connection record of the SmartStream tokens subscribed for each (mode, exchangeType).
+
+    Tokens are kept in sets so repeated subscribe calls never duplicate entries, and
+    every mutation returns only the tokens that actually changed. That diff is what
+    gets sent to the server, split into chunks of at most MAX_TOKENS_PER_REQUEST.
+    """
+
+    MAX_TOKENS_PER_REQUEST = 500
+
+    def __init__(self, max_tokens_per_request=None):
+        self._tokens = {}
+        self._lock = threading.Lock()
+        self.max_tokens_per_request = max_tokens_per_request or self.MAX_TOKENS_PER_REQUEST
+
+    def add(self, mode, token_list):
+        """
+            Record the tokens of token_list under mode and return the ones not already present
+            Parameters
+            ------
+            mode: integer
+                subscription mode (1 -> LTP, 2 -> Quote, 3 -> Snap Quote, 4 -> Depth)
+            token_list: list of dict
+                [{"exchangeType": 1, "tokens": ["10626", "5290"]}, ...]
+            Returns the newly added tokens in the same token_list shape.
+        """
+        added = []
+        with self._lock:
+            exchanges = self._tokens.setdefault(mode, {})
+            for entry in token_list:
+                exchange_type = entry["exchangeType"]
+                current = exchanges.setdefault(exchange_type, set())
+                new_tokens = []
+                for token in entry["tokens"]:
+                    token = str(token)
+                    if token not in current:
+                        current.add(token)
+                        new_tokens.append(token)
+                if new_tokens:
+                    added.append({"exchangeType": exchange_type, "tokens": new_tokens})
+        return added
+
+    def remove(self, mode, token_list):
+        """
+            Forget the tokens of token_list under mode and return the ones that were subscribed
+        """
+        removed = []
+        with self._lock:
+            exchanges = self._tokens.get(mode)
+            if not exchanges:
+                return removed
+            for entry in token_list:
+                exchange_type = entry["exchangeType"]
+                current = exchanges.get(exchange_type)
+                if not current:
+                    continue
+                gone = []
+                for token in entry["tokens"]:
+                    token = str(token)
+                    if token in current:
+                        current.discard(token)
+                        gone.append(token)
+                if not current:
+                    del exchanges[exchange_type]
+                if gone:
+                    removed.append({"exchangeType": exchange_type, "tokens": gone})
+            if not exchanges:
+                del self._tokens[mode]
+        return removed
+
+    def clear(self):
+        with self._lock:
+            self._tokens.clear()
+
+    def count(self, mode=None):
+        """
+            Number of subscribed tokens, for one mode or across all modes
+        """
+        with self._lock:
+            modes = [mode] if mode is not None else list(self._tokens)
+            return sum(len(tokens) for m in modes for tokens in self._tokens.get(m, {}).values())
+
+    def contains(self, mode, exchange_type, token):
+        with self._lock:
+            return str(token) in self._tokens.get(mode, {}).get(exchange_type, ())
+
+    def snapshot(self):
+        """
+            Copy of the registry as {mode: {exchangeType: [tokens]}} with tokens sorted
+        """
+        with self._lock:
+            return {
+                mode: {exchange_type: sorted(tokens) for exchange_type, tokens in exchanges.items()}
+                for mode, exchanges in self._tokens.items()
+            }
+
+    def token_list(self, mode):
+        """
+            Subscribed tokens of a mode in the token_list shape used by subscribe requests
+        """
+        return [
+            {"exchangeType": exchange_type, "tokens": tokens}
+            for exchange_type, tokens in self.snapshot().get(mode, {}).items()
+        ]
+
+    def chunk(self, token_list, limit=None):
+        """
+            Split token_list into token_lists holding at most limit (default max_tokens_per_request) tokens each
+        """
+        chunks = []
+        current = []
+        size = 0
+        limit = limit or self.max_tokens_per_request
+        for entry in token_list:
+            tokens = list(entry["tokens"])
+            start = 0
+            while start < len(tokens):
+                take = min(limit - size, len(tokens) - start)
+                current.append({"exchangeType": entry["exchangeType"], "tokens": tokens[start:start + take]})
+                size += take
+                start += take
+                if size == limit:
+                    chunks.append(current)
+                    current = []
+                    size = 0
+        if current:
+            chunks.append(current)
+        return chunks
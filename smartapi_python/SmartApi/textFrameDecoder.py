@@ -0,0 +1,78 @@
+import time
+import zlib
+import base64
+import binascii
+import threading
+
+try:
+    import orjson as _json_parser
+except ImportError:  # orjson is optional, fall back to the standard library parser
+    import json as _json_parser
+
+
+class TextFrameDecoder(object):
+    """
+    Decoder for the base64 + zlib compressed JSON text frames of the legacy feed.
+
+    Every frame is decoded in one pass: base64 -> inflate -> a single JSON parse, with orjson
+    used when installed. Each frame is a complete zlib stream, so it is inflated by a fresh
+    copy of an unused decompressobj; no zlib state is carried from one frame to the next.
+    The server quotes with ' which is swapped for " on the raw bytes only when present.
+    The decoded JSON is returned as it is, a list of records or a single object, as the
+    old parser passed it on; throughput counters are kept for stats().
+    """
+
+    def __init__(self):
+        self._inflater = zlib.decompressobj()
+        self._lock = threading.Lock()
+        self.frames = 0
+        self.records = 0
+        self.errors = 0
+        self.compressed_bytes = 0
+        self.decoded_bytes = 0
+        self.decode_seconds = 0.0
+
+    def decode(self, message):
+        """
+            Decode one text frame (str or bytes) into its JSON value, or None if it is not valid
+        """
+        started = time.perf_counter()
+        try:
+            compressed = base64.b64decode(message)
+            inflater = self._inflater.copy()
+            raw = inflater.decompress(compressed) + inflater.flush()
+            if b"'" in raw:
+                raw = raw.replace(b"'", b'"')
+            data = _json_parser.loads(raw)
+        except (ValueError, TypeError, binascii.Error, zlib.error):
+            with self._lock:
+                self.errors += 1
+            return None
+        if data is None:
+            return None
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.frames += 1
+            self.records += len(data) if isinstance(data, list) else 1
+            self.compressed_bytes += len(message)
+            self.decoded_bytes += len(raw)
+            self.decode_seconds += elapsed
+        return data
+
+    def stats(self):
+        """
+            Decode counters and throughput (frames, records and MB of JSON per second of decode time)
+        """
+        with self._lock:
+            seconds = self.decode_seconds
+            return {
+                "frames": self.frames,
+                "records": self.records,
+                "errors": self.errors,
+                "compressed_bytes": self.compressed_bytes,
+                "decoded_bytes": self.decoded_bytes,
+                "decode_seconds": seconds,
+                "frames_per_second": self.frames / seconds if seconds else None,
+                "records_per_second": self.records / seconds if seconds else None,
+                "mb_per_second": self.decoded_bytes / seconds / 1e6 if seconds else None
+            }
@@ -0,0 +1,165 @@
+import struct
+from datetime import datetime
+
+
+# Segment constants carried in the low byte of the instrument token
+EXCHANGE_MAP = {
+    "nse": 1,
+    "nfo": 2,
+    "cds": 3,
+    "bse": 4,
+    "bfo": 5,
+    "bsecds": 6,
+    "mcx": 7,
+    "mcxsx": 8,
+    "indices": 9
+}
+
+MODE_LTP = "ltp"
+MODE_QUOTE = "quote"
+MODE_FULL = "full"
+
+DEPTH_LEVELS = 5
+
+# Big-endian packet layouts, keyed by packet length
+FRAME_HEADER = struct.Struct(">H")
+PACKET_HEADER = struct.Struct(">H")
+LTP_PACKET = struct.Struct(">II")
+INDEX_QUOTE_PACKET = struct.Struct(">II5i")
+INDEX_FULL_PACKET = struct.Struct(">II5iI")
+QUOTE_PACKET = struct.Struct(">11I")
+# Quote fields, last trade time, OI, OI day high/low, exchange timestamp, then 10 depth levels
+FULL_PACKET = struct.Struct(">16I" + "IIH2x" * (2 * DEPTH_LEVELS))
+
+LTP_PACKET_LENGTH = LTP_PACKET.size
+INDEX_QUOTE_PACKET_LENGTH = INDEX_QUOTE_PACKET.size
+INDEX_FULL_PACKET_LENGTH = INDEX_FULL_PACKET.size
+QUOTE_PACKET_LENGTH = QUOTE_PACKET.size
+FULL_PACKET_LENGTH = FULL_PACKET.size
+
+
+def split_packets(frame):
+    """
+        Offsets of the packets in a multi-packet binary frame as a list of (start, end).
+        Frames shorter than the packet count header (heartbeats) yield no packets.
+    """
+    if len(frame) < FRAME_HEADER.size:
+        return []
+    number_of_packets = FRAME_HEADER.unpack_from(frame, 0)[0]
+    offsets = []
+    j = FRAME_HEADER.size
+    for _ in range(number_of_packets):
+        packet_length = PACKET_HEADER.unpack_from(frame, j)[0]
+        start = j + PACKET_HEADER.size
+        offsets.append((start, start + packet_length))
+        j = start + packet_length
+    return offsets
+
+
+def decode_frame(frame):
+    """
+        Decode every packet of a binary frame into a list of tick dicts
+    """
+    view = memoryview(frame)
+    ticks = []
+    for start, end in split_packets(view):
+        tick = decode_packet(view, start, end - start)
+        if tick is not None:
+            ticks.append(tick)
+    return ticks
+
+
+def decode_packet(buffer, offset, length):
+    """
+        Decode one packet of the given length starting at offset; unknown lengths return None
+    """
+    instrument_token = LTP_PACKET.unpack_from(buffer, offset)[0] if length >= 4 else 0
+    segment = instrument_token & 0xff
+    divisor = 10000000.0 if segment == EXCHANGE_MAP["cds"] else 100.0
+    tradable = segment != EXCHANGE_MAP["indices"]
+
+    if length == LTP_PACKET_LENGTH:
+        _, last_price = LTP_PACKET.unpack_from(buffer, offset)
+        return {
+            "tradable": tradable,
+            "mode": MODE_LTP,
+            "instrument_token": instrument_token,
+            "last_price": last_price / divisor
+        }
+
+    if length in (INDEX_QUOTE_PACKET_LENGTH, INDEX_FULL_PACKET_LENGTH):
+        if length == INDEX_FULL_PACKET_LENGTH:
+            fields = INDEX_FULL_PACKET.unpack_from(buffer, offset)
+        else:
+            fields = INDEX_QUOTE_PACKET.unpack_from(buffer, offset)
+        last_price, high, low, open_, close, change = fields[1:7]
+        tick = {
+            "tradable": tradable,
+            "mode": MODE_FULL if length == INDEX_FULL_PACKET_LENGTH else MODE_QUOTE,
+            "instrument_token": instrument_token,
+            "last_price": last_price / divisor,
+            "ohlc": {
+                "high": high / divisor,
+                "low": low / divisor,
+                "open": open_ / divisor,
+                "close": close / divisor
+            },
+            "change": _change(last_price, close)
+        }
+        if length == INDEX_FULL_PACKET_LENGTH:
+            tick["timestamp"] = _datetime(fields[7])
+        return tick
+
+    if length in (QUOTE_PACKET_LENGTH, FULL_PACKET_LENGTH):
+        if length == FULL_PACKET_LENGTH:
+            fields = FULL_PACKET.unpack_from(buffer, offset)
+        else:
+            fields = QUOTE_PACKET.unpack_from(buffer, offset)
+        tick = {
+            "tradable": tradable,
+            "mode": MODE_FULL if length == FULL_PACKET_LENGTH else MODE_QUOTE,
+            "instrument_token": instrument_token,
+            "last_price": fields[1] / divisor,
+            "last_traded_quantity": fields[2],
+            "average_traded_price": fields[3] / divisor,
+            "volume_traded": fields[4],
+            "total_buy_quantity": fields[5],
+            "total_sell_quantity": fields[6],
+            "ohlc": {
+                "open": fields[7] / divisor,
+                "high": fields[8] / divisor,
+                "low": fields[9] / divisor,
+                "close": fields[10] / divisor
+            },
+            "change": _change(fields[1], fields[10])
+        }
+        if length == FULL_PACKET_LENGTH:
+            tick["last_trade_time"] = _datetime(fields[11])
+            tick["oi"] = fields[12]
+            tick["oi_day_high"] = fields[13]
+            tick["oi_day_low"] = fields[14]
+            tick["timestamp"] = _datetime(fields[15])
+            levels = fields[16:]
+            depth = {"buy": [], "sell": []}
+            for i in range(2 * DEPTH_LEVELS):
+                quantity, price, orders = levels[3 * i:3 * i + 3]
+                depth["sell" if i >= DEPTH_LEVELS else "buy"].append({
+                    "quantity": quantity,
+                    "price": price / divisor,
+                    "orders": orders
+                })
+            tick["depth"] = depth
+        return tick
+
+    return None
+
+
+def _change(last_price, close):
+    return (last_price - close) * 100.0 / close if close != 0 else 0
+
+
+def _datetime(epoch_seconds):
+    try:
+        return datetime.fromtimestamp(epoch_seconds)
+    except Exception:
+        return None
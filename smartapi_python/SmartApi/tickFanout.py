@@ -0,0 +1,241 @@
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from logzero import logger
+
+
+RING_MAGIC = b"SMTRING1"
+DEFAULT_RING_NAME = "smartstream_ticks"
+
+HEADER_DTYPE = np.dtype([
+    ("magic", "S8"), ("capacity", "<u8"), ("max_tokens", "<u8"), ("write_seq", "<u8"), ("token_count", "<u8")
+])
+
+# Decoded LTP / QUOTE / SNAP_QUOTE fields of a SmartWebSocketV2 packet, one fixed-size record per tick.
+# seq is position + 1 of the record in the stream and is written last, so a reader can tell a
+# complete record from one that is being overwritten.
+TICK_DTYPE = np.dtype([
+    ("seq", "<u8"),
+    ("received_at_ns", "<i8"),
+    ("subscription_mode", "u1"),
+    ("exchange_type", "u1"),
+    ("token", "S25"),
+    ("sequence_number", "<i8"),
+    ("exchange_timestamp", "<i8"),
+    ("last_traded_price", "<i8"),
+    ("last_traded_quantity", "<i8"),
+    ("average_traded_price", "<i8"),
+    ("volume_trade_for_the_day", "<i8"),
+    ("total_buy_quantity", "<f8"),
+    ("total_sell_quantity", "<f8"),
+    ("open_price_of_the_day", "<i8"),
+    ("high_price_of_the_day", "<i8"),
+    ("low_price_of_the_day", "<i8"),
+    ("closed_price", "<i8"),
+    ("last_traded_timestamp", "<i8"),
+    ("open_interest", "<i8"),
+    ("open_interest_change_percentage", "<f8"),
+    ("upper_circuit_limit", "<i8"),
+    ("lower_circuit_limit", "<i8"),
+    ("52_week_high_price", "<i8"),
+    ("52_week_low_price", "<i8"),
+])
+
+# Per-token index: position of the latest record of each token
+TOKEN_INDEX_DTYPE = np.dtype([("exchange_type", "u1"), ("token", "S25"), ("position", "<u8")])
+
+_VALUE_FIELDS = TICK_DTYPE.names[5:]
+
+# Rings created by a writer in this process, whose resource tracker registration must be kept
+_local_rings = set()
+
+
+def _layout(capacity, max_tokens):
+    header_end = HEADER_DTYPE.itemsize
+    index_end = header_end + max_tokens * TOKEN_INDEX_DTYPE.itemsize
+    return header_end, index_end, index_end + capacity * TICK_DTYPE.itemsize
+
+
+def _views(buffer, capacity, max_tokens):
+    header_end, index_end, ring_end = _layout(capacity, max_tokens)
+    header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=buffer, offset=0)
+    index = np.ndarray((max_tokens,), dtype=TOKEN_INDEX_DTYPE, buffer=buffer, offset=header_end)
+    ring = np.ndarray((capacity,), dtype=TICK_DTYPE, buffer=buffer, offset=index_end)
+    return header, index, ring
+
+
+class TickRingWriter(object):
+    """
+    Single-writer ring buffer of decoded ticks in multiprocessing.shared_memory.
+
+    One process holds the SmartWebSocketV2 connection, decodes every packet once and
+    publishes it here; any number of local processes read the same memory through
+    TickRingReader without copying. attach() hooks the writer into a websocket's on_data.
+    """
+
+    def __init__(self, name=DEFAULT_RING_NAME, capacity=1 << 16, max_tokens=8192):
+        self.name = name
+        self.capacity = capacity
+        self.max_tokens = max_tokens
+        self._shm = shared_memory.SharedMemory(name=name, create=True, size=_layout(capacity, max_tokens)[2])
+        _local_rings.add(name)
+        self._header, self._index, self._ring = _views(self._shm.buf, capacity, max_tokens)
+        self._header[0] = (RING_MAGIC, capacity, max_tokens, 0, 0)
+        self._token_slots = {}
+        self._write_seq = 0
+
+    def publish(self, tick, received_at_ns=None):
+        """
+            Append one decoded tick dict (as produced by SmartWebSocketV2) to the ring
+        """
+        position = self._write_seq
+        slot = position % self.capacity
+        exchange_type = tick.get("exchange_type", 0)
+        token = tick.get("token", "")
+        record = [0, received_at_ns or time.time_ns(), tick.get("subscription_mode", 0), exchange_type,
+                  token.encode("ascii")]
+        record.extend(tick.get(field, 0) or 0 for field in _VALUE_FIELDS)
+        ring = self._ring
+        ring["seq"][slot] = 0
+        ring[slot] = tuple(record)
+        ring["seq"][slot] = position + 1
+        self._write_seq = position + 1
+        self._header["write_seq"][0] = position + 1
+        self._index_token(exchange_type, token, position)
+
+    def _index_token(self, exchange_type, token, position):
+        key = (exchange_type, token)
+        index_slot = self._token_slots.get(key)
+        if index_slot is None:
+            index_slot = len(self._token_slots)
+            if index_slot >= self.max_tokens:
+                return
+            self._token_slots[key] = index_slot
+            self._index[index_slot] = (exchange_type, token.encode("ascii"), position)
+            self._header["token_count"][0] = index_slot + 1
+        else:
+            self._index["position"][index_slot] = position
+
+    def attach(self, smart_websocket):
+        """
+            Publish every tick the websocket decodes, then pass it on to its existing on_data
+        """
+        downstream = smart_websocket.on_data
+
+        def on_data(wsapp, data):
+            if "subscription_mode" in data:
+                self.publish(data)
+            downstream(wsapp, data)
+
+        smart_websocket.on_data = on_data
+        return on_data
+
+    def close(self, unlink=True):
+        self._header = self._index = self._ring = None
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
+            _local_rings.discard(self.name)
+
+
+class TickRingReader(object):
+    """
+    Zero-copy reader of a TickRingWriter ring in another process.
+
+    poll() returns numpy views of the records written since the previous call, in one or two
+    contiguous pieces, with the stream position of the first record. A reader that falls more than capacity - safety_margin records behind
+    is moved forward and the skipped records are counted in overruns. Records can still be
+    overwritten while a view is held if the reader stalls, so long-running consumers should
+    compare each record's seq with the position they expect or use copy_valid():
+
+        views, position, lost = reader.poll()
+        for view in views:
+            records = reader.copy_valid(view, position)
+            position += len(view)
+    """
+
+    def __init__(self, name=DEFAULT_RING_NAME, start_at_end=True, safety_margin=None):
+        self.name = name
+        self._shm = shared_memory.SharedMemory(name=name)
+        if name not in _local_rings:
+            try:
+                # Readers must not unlink the writer's segment when they exit
+                from multiprocessing import resource_tracker
+                resource_tracker.unregister(self._shm._name, "shared_memory")
+            except Exception:
+                pass
+        header = np.ndarray((1,), dtype=HEADER_DTYPE, buffer=self._shm.buf, offset=0)
+        if header["magic"][0] != RING_MAGIC:
+            self._shm.close()
+            raise ValueError(f"Shared memory {name} is not a tick ring")
+        self.capacity = int(header["capacity"][0])
+        self.max_tokens = int(header["max_tokens"][0])
+        self._header, self._index, self._ring = _views(self._shm.buf, self.capacity, self.max_tokens)
+        self.safety_margin = self.capacity // 8 if safety_margin is None else safety_margin
+        self.position = self.head() if start_at_end else 0
+        self.overruns = 0
+        self._token_positions = {}
+        self._indexed_tokens = 0
+
+    def head(self):
+        return int(self._header["write_seq"][0])
+
+    def lag(self):
+        return self.head() - self.position
+
+    def poll(self, max_records=None):
+        """
+            (views, position, lost): the unread records as a list of 0-2 numpy arrays, the
+            stream position of the first of them (the next view starts len(views[0]) later)
+            and the number of records lost because this reader fell behind
+        """
+        head = self.head()
+        lost = 0
+        limit = self.capacity - self.safety_margin
+        if head - self.position > limit:
+            lost = head - limit - self.position
+            self.position = head - limit
+            self.overruns += lost
+            logger.warning(f"Tick ring reader fell behind, skipped {lost} records")
+        end = head if max_records is None else min(head, self.position + max_records)
+        views = []
+        first_position = position = self.position
+        while position < end:
+            slot = position % self.capacity
+            count = min(end - position, self.capacity - slot)
+            views.append(self._ring[slot:slot + count])
+            position += count
+        self.position = end
+        return views, first_position, lost
+
+    def copy_valid(self, view, first_position):
+        """
+            Copy of the records of view whose seq still matches their stream position;
+            first_position is the position poll() returned for the view (plus the length of
+            the views before it)
+        """
+        records = view.copy()
+        expected = np.arange(first_position + 1, first_position + 1 + len(records), dtype=np.uint64)
+        return records[records["seq"] == expected]
+
+    def latest(self, exchange_type, token):
+        """
+            Copy of the most recent record of a token, or None
+        """
+        token = token.encode("ascii") if isinstance(token, str) else token
+        count = int(self._header["token_count"][0])
+        if count != self._indexed_tokens:
+            for index_slot in range(self._indexed_tokens, count):
+                entry = self._index[index_slot]
+                self._token_positions[(int(entry["exchange_type"]), bytes(entry["token"]))] = index_slot
+            self._indexed_tokens = count
+        index_slot = self._token_positions.get((exchange_type, token))
+        if index_slot is None:
+            return None
+        position = int(self._index["position"][index_slot])
+        record = self._ring[position % self.capacity].copy()
+        return record if int(record["seq"]) == position + 1 else None
+
+    def close(self):
+        self._header = self._index = self._ring = None
+        self._shm.close()
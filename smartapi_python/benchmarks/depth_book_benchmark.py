@@ -0,0 +1,62 @@
+"""
+Update throughput of SmartApi.depthBook against the per-level struct parse of DEPTH packets.
+
+    python benchmarks/depth_book_benchmark.py [tokens] [packets]
+"""
+import os
+import sys
+import time
+import struct
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi.depthBook import DEPTH_LEVELS, DEPTH_REGION_OFFSET, DepthBookEngine
+from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+
+DEPTH_LEVEL = struct.Struct("<iih")
+
+
+def build_packet(token, seed):
+    header = struct.pack("<BB25sqq", SmartWebSocketV2.DEPTH, SmartWebSocketV2.NSE_CM, str(token).encode(), seed,
+                         int(time.time() * 1000))
+    levels = []
+    for side in range(2):
+        for level in range(DEPTH_LEVELS):
+            price = 100000 + (level + 1) * (5 if side else -5) + seed % 7
+            levels.append(DEPTH_LEVEL.pack(100 + level * 10 + seed % 13, price, 1 + level % 5))
+    return header + b"".join(levels)
+
+
+def legacy_parser():
+    # Only the depth parser is needed, not a connected client
+    return object.__new__(SmartWebSocketV2)
+
+
+def run(tokens=50, packets=20000):
+    frames = [build_packet(3045 + i % tokens, i) for i in range(max(tokens, 1000))]
+    engine = DepthBookEngine(capacity=tokens)
+    parser = legacy_parser()
+    book = engine.update(SmartWebSocketV2.NSE_CM, "3045", frames[0])
+    assert book.to_dict() == parser._parse_depth_20_buy_and_sell_data(frames[0][DEPTH_REGION_OFFSET:])
+
+    started = time.perf_counter()
+    for i in range(packets):
+        parser._parse_depth_20_buy_and_sell_data(frames[i % len(frames)][DEPTH_REGION_OFFSET:])
+    legacy = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for i in range(packets):
+        frame = frames[i % len(frames)]
+        engine.update(SmartWebSocketV2.NSE_CM, str(3045 + i % tokens), frame)
+    arrays = time.perf_counter() - started
+
+    print(f"{packets} DEPTH packets over {tokens} tokens ({len(frames[0])} bytes/packet)")
+    print(f"struct parse to dicts: {packets / legacy:,.0f} packets/s, {legacy / packets * 1e6:.2f} us/packet")
+    print(f"depth book arrays:     {packets / arrays:,.0f} packets/s, {arrays / packets * 1e6:.2f} us/packet "
+          f"(with spread, microprice and imbalance)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
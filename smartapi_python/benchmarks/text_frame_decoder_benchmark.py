@@ -0,0 +1,62 @@
+"""
+Decode throughput of SmartApi.textFrameDecoder against the old triple-parse path.
+
+    python benchmarks/text_frame_decoder_benchmark.py [records_per_frame] [frames]
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import base64
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi.textFrameDecoder import TextFrameDecoder
+
+
+def build_frame(records_per_frame):
+    records = []
+    for i in range(records_per_frame):
+        records.append({"name": "sf", "tk": str(3045 + i), "e": "nse_cm", "ltp": "%.2f" % (500 + i * 0.05),
+                        "v": str(100000 + i), "bp": "499.95", "sp": "500.05", "bq": "120", "bs": "80",
+                        "ltt": "19/10/2026 10:15:00", "c": "497.40", "nc": "0.52"})
+    # The feed quotes with single quotes, which the decoder has to tolerate
+    text = json.dumps(records).replace('"', "'")
+    return base64.b64encode(zlib.compress(text.encode("utf-8")))
+
+
+def legacy_decode(message):
+    data = base64.b64decode(message)
+    data = bytes((zlib.decompress(data)).decode("utf-8"), 'utf-8')
+    data = json.loads(data.decode('utf8').replace("'", '"'))
+    return json.loads(json.dumps(data, indent=4, sort_keys=True))
+
+
+def run(records_per_frame=20, frames=5000):
+    frame = build_frame(records_per_frame)
+    decoder = TextFrameDecoder()
+    assert decoder.decode(frame) == legacy_decode(frame)
+
+    started = time.perf_counter()
+    for _ in range(frames):
+        legacy_decode(frame)
+    legacy = time.perf_counter() - started
+
+    decoder = TextFrameDecoder()
+    started = time.perf_counter()
+    for _ in range(frames):
+        decoder.decode(frame)
+    single = time.perf_counter() - started
+
+    stats = decoder.stats()
+    print(f"{frames} frames x {records_per_frame} records ({len(frame)} bytes/frame)")
+    print(f"legacy triple parse: {frames / legacy:,.0f} frames/s")
+    print(f"single pass:         {frames / single:,.0f} frames/s "
+          f"({stats['records_per_second']:,.0f} records/s, {stats['mb_per_second']:.1f} MB/s JSON)")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
@@ -0,0 +1,55 @@
+"""
+Throughput of SmartApi.tickDecoder on synthetic multi-packet frames.
+
+    python benchmarks/tick_decoder_benchmark.py [packets_per_frame] [frames]
+"""
+import os
+import sys
+import time
+import struct
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi import tickDecoder
+
+
+def build_packet(mode, instrument_token, seed):
+    price = 100000 + seed
+    if mode == tickDecoder.MODE_LTP:
+        return tickDecoder.LTP_PACKET.pack(instrument_token, price)
+    quote = [instrument_token, price, 10, price, 5000 + seed, 700, 800, price - 50, price + 75, price - 90, price - 20]
+    if mode == tickDecoder.MODE_QUOTE:
+        return tickDecoder.QUOTE_PACKET.pack(*quote)
+    now = int(time.time())
+    depth = []
+    for i in range(2 * tickDecoder.DEPTH_LEVELS):
+        depth.extend([100 + i, price + (i - 5) * 5, 3 + i])
+    return tickDecoder.FULL_PACKET.pack(*(quote + [now, 1200, 1300, 1100, now] + depth))
+
+
+def build_frame(packets_per_frame):
+    modes = (tickDecoder.MODE_LTP, tickDecoder.MODE_QUOTE, tickDecoder.MODE_FULL)
+    parts = [struct.pack(">H", packets_per_frame)]
+    for i in range(packets_per_frame):
+        packet = build_packet(modes[i % 3], (408065 + i) << 8 | 1, i)
+        parts.append(struct.pack(">H", len(packet)))
+        parts.append(packet)
+    return b"".join(parts)
+
+
+def run(packets_per_frame=50, frames=2000):
+    frame = build_frame(packets_per_frame)
+    started = time.perf_counter()
+    decoded = 0
+    for _ in range(frames):
+        decoded += len(tickDecoder.decode_frame(frame))
+    elapsed = time.perf_counter() - started
+    print(f"{frames} frames x {packets_per_frame} packets ({len(frame)} bytes/frame) in {elapsed:.3f}s")
+    print(f"{frames / elapsed:,.0f} frames/s, {decoded / elapsed:,.0f} packets/s, "
+          f"{elapsed / decoded * 1e6:.2f} us/packet")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    run(*args)
@@ -1,35 +1,14 @@
-import sqlite3
-import time
+from SmartApi.snapshotMerge import merge_shards
 
 # File paths
 main_db = "market_data.db"
-source_db = "market_data1.db"
-table_name = "market_data"  # Use your actual table name
+shard_dbs = ["market_data1.db"]  # Local databases written by each collector host
 
-# Connect to main database
-conn = sqlite3.connect(main_db)
-cursor = conn.cursor()
+# Upsert every shard row into the main database in one transaction; safe to run again
+stats = merge_shards(main_db, shard_dbs)
 
-# Attach the source database
-cursor.execute(f"ATTACH DATABASE '{source_db}' AS src")
+for shard, shard_stats in stats["shards"].items():
+    print(f"📥 {shard}: {shard_stats['rows_read']} rows read, {shard_stats['rows_inserted']} new")
 
-# Insert all rows from source to main
-cursor.execute(f"""
-    INSERT INTO {table_name} (symbol, date, buy_sell_volume_percent)
-    SELECT symbol, date, buy_sell_volume_percent FROM src.{table_name}
-""")
-
-# 💡 Commit to finalize changes
-conn.commit()
-
-# ⏱ Optional: short delay before detaching (helps release write lock)
-time.sleep(0.5)
-
-# Detach the source database
-cursor.execute("DETACH DATABASE src")
-
-# Final cleanup
-conn.commit()
-conn.close()
-
-print("✅ All rows merged from market_data1.db into market_data.db")
+print(f"✅ Merged {len(shard_dbs)} shard(s) into {main_db}: {stats['rows_before']} -> {stats['rows_after']} rows "
+      f"in {stats['seconds']:.2f}s ({stats['rows_per_second'] or 0:,.0f} rows/sec)")
@@ -1,35 +1,17 @@
-import sqlite3
+from SmartApi.snapshotRetention import RetentionManager
 
 # --- CONFIG ---
 DB_PATH = "market_data.db"
-TABLE_NAME = "market_data"
-START_ROW = 174   # Inclusive
-END_ROW = 418  # Inclusive
-
-# --- Connect to DB ---
-conn = sqlite3.connect(DB_PATH)
-cursor = conn.cursor()
+KEEP_DAYS = 365            # Delete snapshot days older than this
+KEEP_INTRADAY_DAYS = 30    # Keep only the last snapshot of each symbol for days older than this
+ARCHIVE_DIR = "archive"    # Parquet copy of every removed row (requires pyarrow); None to skip
 
 try:
-    # Step 1: Get rowids of rows in desired range
-    cursor.execute(f"""
-        SELECT rowid FROM {TABLE_NAME}
-        ORDER BY rowid
-        LIMIT ? OFFSET ?
-    """, (END_ROW - START_ROW + 1, START_ROW - 1))
-    
-    rowids = [row[0] for row in cursor.fetchall()]
-
-    if not rowids:
-        print(f"⚠️ No rows found between row {START_ROW} and {END_ROW}")
-    else:
-        # Step 2: Delete by rowid
-        cursor.executemany(f"DELETE FROM {TABLE_NAME} WHERE rowid = ?", [(rid,) for rid in rowids])
-        conn.commit()
-        print(f"✅ Deleted {cursor.rowcount} rows (row numbers {START_ROW} to {END_ROW})")
-
+    manager = RetentionManager(DB_PATH, keep_days=KEEP_DAYS, keep_intraday_days=KEEP_INTRADAY_DAYS,
+                               archive_dir=ARCHIVE_DIR)
+    stats = manager.run()
+    print(f"✅ Archived {stats['rows_archived']} rows, compacted {stats['rows_compacted']} rows "
+          f"({stats['days_compacted']} days), deleted {stats['rows_deleted']} rows ({stats['days_deleted']} days)")
+    print(f"🧹 Freed {stats['pages_freed']} pages in {stats['seconds']:.2f}s")
 except Exception as e:
     print(f"❌ Error: {e}")
-
-finally:
-    conn.close()
@@ -0,0 +1,73 @@
+import unittest
+import os
+import sys
+import math
+import struct
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi.depthBook import DEPTH_LEVELS, DEPTH_REGION_OFFSET, DepthBookEngine
+from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+
+def depth_packet(token, bids, asks, timestamp=1751362200000):
+    """
+        DEPTH packet of (quantity, price, orders) levels; missing levels are left empty
+    """
+    header = struct.pack("<BB25sqq", SmartWebSocketV2.DEPTH, SmartWebSocketV2.NSE_CM, token.encode(), 0, timestamp)
+    levels = []
+    for side in (bids, asks):
+        side = list(side) + [(0, 0, 0)] * (DEPTH_LEVELS - len(side))
+        levels.extend(struct.pack("<iih", *level) for level in side)
+    return header + b"".join(levels)
+
+class TestDepthBook(unittest.TestCase):
+    def setUp(self):
+        self.engine = DepthBookEngine(capacity=2, imbalance_levels=2)
+
+    def test_book_matches_the_struct_parser(self):
+        bids = [(100 + i, 50000 - i * 5, 1 + i) for i in range(DEPTH_LEVELS)]
+        asks = [(200 + i, 50005 + i * 5, 2 + i) for i in range(DEPTH_LEVELS)]
+        packet = depth_packet("3045", bids, asks)
+        book = self.engine.update(SmartWebSocketV2.NSE_CM, "3045", packet)
+        parser = object.__new__(SmartWebSocketV2)
+        self.assertEqual(book.to_dict(), parser._parse_depth_20_buy_and_sell_data(packet[DEPTH_REGION_OFFSET:]))
+        self.assertEqual(book.cumulative_bid_quantities[-1], sum(level[0] for level in bids))
+
+        # The client hands DEPTH packets to the engine instead of parsing the levels
+        parser.depth_book = DepthBookEngine()
+        parsed = parser._parse_binary_data(packet)
+        self.assertEqual((parsed["token"], parsed["packet_received_time"]), ("3045", 1751362200000))
+        self.assertEqual(parsed["depth_book"].to_dict(), book.to_dict())
+
+    def test_metrics(self):
+        book = self.engine.update(1, "3045", depth_packet("3045", [(300, 1000, 3), (100, 995, 1)],
+                                                          [(100, 1010, 1), (100, 1015, 2)]), timestamp=7)
+        self.assertEqual((book.spread, book.mid), (10.0, 1005.0))
+        # Leans towards the ask, the side with less quantity at the top
+        self.assertEqual(book.microprice, (1000 * 100 + 1010 * 300) / 400.0)
+        self.assertEqual(book.imbalance, (400 - 200) / 600.0)
+        metrics = book.metrics()
+        self.assertEqual((metrics["total_buy_depth"], metrics["total_sell_depth"], metrics["timestamp"],
+                          metrics["updates"]), (400, 200, 7, 1))
+
+        # A one-sided book has no spread, mid or microprice
+        book = self.engine.update(1, "3045", depth_packet("3045", [(300, 1000, 3)], []))
+        self.assertTrue(math.isnan(book.spread) and math.isnan(book.microprice))
+        self.assertEqual((book.imbalance, book.metrics()["updates"]), (1.0, 2))
+
+    def test_tokens_grow_past_capacity_and_keep_their_books(self):
+        for i in range(5):
+            self.engine.update(1, str(i), depth_packet(str(i), [(10 * (i + 1), 1000, 1)], [(10, 1005, 1)]))
+        self.assertEqual(self.engine.tokens(), [(1, str(i)) for i in range(5)])
+        self.assertEqual([int(self.engine.book(1, str(i)).bid_quantities[0]) for i in range(5)], [10, 20, 30, 40, 50])
+        self.assertIsNone(self.engine.book(1, "missing"))
+
+        snapshot = self.engine.book(1, "0").snapshot()
+        self.engine.update(1, "0", depth_packet("0", [(99, 1000, 1)], [(10, 1005, 1)]))
+        self.assertEqual(int(snapshot["quantity"][0, 0]), 10)
+        self.assertEqual(int(self.engine.book(1, "0").bid_quantities[0]), 99)
+        self.assertEqual(self.engine.metrics()[(1, "0")]["updates"], 2)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import os
+import sys
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi.feedMetrics import FeedMetrics, LatencyHistogram
+
+def packet(sequence, token="2885", exchange_timestamp=None):
+    return {"exchange_type": 1, "token": token, "sequence_number": sequence, "exchange_timestamp": exchange_timestamp}
+
+class TestFeedMetrics(unittest.TestCase):
+    def setUp(self):
+        self.metrics = FeedMetrics()
+
+    def control_types(self, sequences, token="2885"):
+        events = [self.metrics.record_packet(packet(sequence, token), 0) for sequence in sequences]
+        return [event and event["control_type"] for event in events]
+
+    def test_gaps_count_the_missing_packets(self):
+        self.assertEqual(self.control_types([10, 11, 14, 15, 20]),
+                         [None, None, FeedMetrics.SEQUENCE_GAP, None, FeedMetrics.SEQUENCE_GAP])
+        stats = self.metrics.token_stats(1, "2885")
+        self.assertEqual((stats["packets"], stats["gaps"], stats["missing"], stats["last_sequence"]), (5, 2, 6, 20))
+        event = self.metrics.record_packet(packet(22), 0)
+        self.assertEqual(event, {"control_type": FeedMetrics.SEQUENCE_GAP, "exchange_type": 1, "token": "2885",
+                                 "last_sequence_number": 20, "sequence_number": 22})
+
+    def test_late_and_repeated_packets_are_reorders(self):
+        self.assertEqual(self.control_types([10, 12, 11, 12, 13]),
+                         [None, FeedMetrics.SEQUENCE_GAP, FeedMetrics.SEQUENCE_REORDER, FeedMetrics.SEQUENCE_REORDER,
+                          None])
+        stats = self.metrics.token_stats(1, "2885")
+        self.assertEqual((stats["gaps"], stats["reordered"], stats["last_sequence"]), (1, 2, 13))
+
+    def test_wraparound_starts_the_token_over(self):
+        last = 2 ** 63 - 1
+        self.assertEqual(self.control_types([last - 1, last, -2 ** 63, -2 ** 63 + 1]),
+                         [None, None, FeedMetrics.SEQUENCE_RESET, None])
+        # A restarted counter is not a reorder for every packet that follows
+        self.assertEqual(self.control_types([50000, 50001, 1, 2, 3], token="1594"),
+                         [None, None, FeedMetrics.SEQUENCE_RESET, None, None])
+        stats = self.metrics.token_stats(1, "1594")
+        self.assertEqual((stats["resets"], stats["reordered"], stats["last_sequence"]), (1, 0, 3))
+        self.assertEqual(self.metrics.snapshot()["resets"], 2)
+
+    def test_tokens_are_tracked_separately(self):
+        self.control_types([1, 2], token="2885")
+        self.assertEqual(self.control_types([7, 8], token="1594"), [None, None])
+        snapshot = self.metrics.snapshot(per_token=True)
+        self.assertEqual((snapshot["packets"], snapshot["tokens"], snapshot["gaps"]), (4, 2, 0))
+        self.assertEqual(sorted(snapshot["per_token"]), ["1:1594", "1:2885"])
+        self.metrics.reset()
+        self.assertEqual((self.metrics.snapshot()["packets"], self.metrics.token_stats(1, "2885")), (0, None))
+
+    def test_latency_histograms(self):
+        for sequence, latency in enumerate([3, 4, 30, 700]):
+            self.metrics.record_packet(packet(sequence, exchange_timestamp=1000), 1000 + latency)
+        self.metrics.record_decode(0.2)
+        snapshot = self.metrics.snapshot()
+        exchange = snapshot["exchange_to_receive_ms"]
+        self.assertEqual((exchange["count"], exchange["min"], exchange["max"], exchange["mean"]), (4, 3, 700, 184.25))
+        self.assertEqual((exchange["p50"], exchange["p90"]), (5, 1000))
+        self.assertEqual(exchange["buckets"]["5"], 2)
+        self.assertEqual(snapshot["receive_to_callback_ms"]["buckets"]["0.25"], 1)
+        # Packets without an exchange timestamp do not count towards the latency
+        self.metrics.record_packet(packet(4), 5000)
+        self.assertEqual(self.metrics.token_stats(1, "2885")["exchange_latency_ms"]["count"], 4)
+
+    def test_histogram_percentiles_use_bucket_bounds(self):
+        histogram = LatencyHistogram()
+        self.assertIsNone(histogram.percentile(50))
+        for value in [0.01, 1, 1, 20000]:
+            histogram.add(value)
+        self.assertEqual(histogram.counts[0], 1)
+        self.assertEqual(histogram.counts[-1], 1)
+        self.assertEqual(histogram.percentile(50), 1)
+        # The overflow bucket reports the largest value seen
+        self.assertEqual(histogram.percentile(99), 20000)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import unittest
+import os
+import sys
+import struct
+import shutil
+import tempfile
+import logzero
+from unittest import mock
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi.frameRecorder import FrameRecorder, FrameReplayer, SEGMENT_HEADER, RECORD_HEADER, segment_paths
+from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+
+# A stand-in packet: token and exchange timestamp in epoch milliseconds
+PACKET = struct.Struct("<iq")
+BASE_NS = 1760000000000000000
+
+def packet(token, exchange_timestamp, size=PACKET.size):
+    return PACKET.pack(token, exchange_timestamp).ljust(size, b"\x00")
+
+def parse_packet(data):
+    token, exchange_timestamp = PACKET.unpack_from(data)
+    return {"exchange_type": 1, "token": str(token), "exchange_timestamp": exchange_timestamp}
+
+class TestFrameRecorder(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_segments_roll_over_and_replay_in_order(self):
+        record_size = RECORD_HEADER.size + 50
+        # Room for three records plus the end marker
+        segment_size = SEGMENT_HEADER.size + 3 * record_size + RECORD_HEADER.size
+        written = [(BASE_NS + i, packet(i, i, size=50)) for i in range(10)]
+        with FrameRecorder(self.directory, segment_size=segment_size) as recorder:
+            for received_at_ns, frame in written:
+                recorder.write(frame, received_at_ns)
+            self.assertEqual((recorder.frames, recorder.bytes_written), (10, 10 * record_size))
+
+        paths = segment_paths(self.directory)
+        self.assertEqual([os.path.basename(path) for path in paths],
+                         ["smartstream-%06d.frames" % i for i in range(4)])
+        # Full segments keep their end marker room, the last one is trimmed to its data
+        self.assertEqual([os.path.getsize(path) for path in paths],
+                         [segment_size - RECORD_HEADER.size] * 3 + [SEGMENT_HEADER.size + record_size])
+        self.assertEqual(list(FrameReplayer(self.directory).frames()), written)
+
+        # A new recorder continues after the existing segments
+        with FrameRecorder(self.directory, segment_size=segment_size) as recorder:
+            recorder.write(packet(10, 10, size=50), BASE_NS + 10)
+        self.assertEqual(os.path.basename(segment_paths(self.directory)[-1]), "smartstream-000004.frames")
+        self.assertEqual(len(list(FrameReplayer(self.directory).frames())), 11)
+
+    def test_unfinished_segment_is_read_up_to_the_end_marker(self):
+        recorder = FrameRecorder(self.directory, segment_size=4096)
+        recorder.write(packet(1, 1), BASE_NS)
+        recorder.write(packet(2, 2), BASE_NS + 1)
+        recorder.flush()
+        # Not closed yet: the segment is still preallocated
+        self.assertEqual(os.path.getsize(segment_paths(self.directory)[0]), 4096)
+        self.assertEqual([received_at_ns for received_at_ns, _ in FrameReplayer(self.directory).frames()],
+                         [BASE_NS, BASE_NS + 1])
+        recorder.close()
+
+    def test_rejected_writes(self):
+        recorder = FrameRecorder(self.directory, segment_size=128)
+        with self.assertRaises(ValueError):
+            recorder.write(b"\x00" * 100)
+        recorder.close()
+        with self.assertRaises(ValueError):
+            recorder.write(b"\x00")
+
+class TestFrameReplay(unittest.TestCase):
+    def setUp(self):
+        # The client writes a dated log folder in the working directory
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+
+    def tearDown(self):
+        logzero.logfile(None)
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def client(self, recorder):
+        sws = SmartWebSocketV2("auth", "api_key", "client", "feed", collect_metrics=True, recorder=recorder)
+        sws._parse_binary_data = parse_packet
+        sws.received = []
+        sws.on_data = lambda wsapp, data: sws.received.append(data)
+        return sws
+
+    def test_replay_uses_recorded_times_and_does_not_record_again(self):
+        recorded = os.path.join(self.directory, "recorded")
+        with FrameRecorder(recorded) as recorder:
+            for i in range(5):
+                # Received 40 + i ms after the exchange timestamp
+                recorder.write(packet(3045, 1760000000000 + i * 100), BASE_NS + (i * 100 + 40 + i) * 1000000)
+
+        live_recorder = FrameRecorder(os.path.join(self.directory, "live"))
+        sws = self.client(live_recorder)
+        self.assertEqual(FrameReplayer(recorded).replay(sws, speed=None), 5)
+        live_recorder.close()
+
+        self.assertEqual([tick["exchange_timestamp"] for tick in sws.received],
+                         [1760000000000 + i * 100 for i in range(5)])
+        latency = sws.metrics.snapshot()["exchange_to_receive_ms"]
+        self.assertEqual((latency["count"], latency["min"], latency["max"]), (5, 40, 44))
+        self.assertEqual(live_recorder.frames, 0)
+        self.assertEqual(list(FrameReplayer(os.path.join(self.directory, "live")).frames()), [])
+
+    def test_replay_keeps_the_recorded_spacing(self):
+        with FrameRecorder(self.directory) as recorder:
+            for i in range(4):
+                recorder.write(packet(3045, 1), BASE_NS + i * 100000000)
+        sws = self.client(None)
+        with mock.patch("SmartApi.frameRecorder.time.sleep") as sleep:
+            FrameReplayer(self.directory).replay(sws, speed=10)
+        # sleep is mocked out, so each wait is the full offset of the frame from the first
+        waits = [call.args[0] for call in sleep.call_args_list]
+        self.assertEqual(len(waits), 3)
+        for wait, due in zip(waits, [0.01, 0.02, 0.03]):
+            self.assertAlmostEqual(wait, due, delta=0.005)
+
+    def test_live_frames_are_recorded_with_the_time_metrics_use(self):
+        recorder = FrameRecorder(os.path.join(self.directory, "live"))
+        sws = self.client(recorder)
+        sws._on_data(None, packet(3045, 1760000000000), 2, True)
+        sws._on_data(None, "text", 1, True)
+        recorder.close()
+        [(received_at_ns, frame)] = list(FrameReplayer(os.path.join(self.directory, "live")).frames())
+        latency = sws.metrics.snapshot()["exchange_to_receive_ms"]
+        self.assertEqual(latency["min"], received_at_ns / 1e6 - 1760000000000)
+        self.assertEqual(len(sws.received), 1)
+
+if __name__ == '__main__':
+    unittest.main()
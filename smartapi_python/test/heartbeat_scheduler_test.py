@@ -0,0 +1,154 @@
+import unittest
+import os
+import sys
+import time
+import shutil
+import tempfile
+import threading
+import logzero
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi.heartbeatScheduler import HeartbeatScheduler
+from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+
+class FakeClock(object):
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+class FakeSocket(object):
+    def __init__(self):
+        self.sent = []
+        self.closed = False
+
+    def send(self, data, opcode=None):
+        self.sent.append(data)
+
+    def close(self):
+        self.closed = True
+
+class TestHeartbeatScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        # Eight slots of half a second: intervals over 4s go round the wheel more than once
+        self.scheduler = HeartbeatScheduler(tick_seconds=0.5, wheel_slots=8, clock=self.clock, threaded=False)
+        self.runs = []
+
+    def recorder(self, name):
+        return lambda: self.runs.append((name, self.clock.now - 1000))
+
+    def advance(self, seconds):
+        self.clock.now += seconds
+        return self.scheduler.run_due()
+
+    def run_for(self, seconds):
+        for _ in range(int(seconds / self.scheduler.tick_seconds)):
+            self.advance(self.scheduler.tick_seconds)
+
+    def test_tasks_run_on_their_interval_around_the_wheel(self):
+        self.scheduler.schedule(1, self.recorder("fast"))
+        self.scheduler.schedule(5, self.recorder("slow"))
+        self.scheduler.schedule(0.1, self.recorder("tick"))
+        self.assertEqual(self.advance(0.25), 0)
+        ticks = 0
+        for _ in range(20):
+            ticks += self.advance(0.5)
+        self.assertEqual(ticks, 20)
+        self.assertEqual([at for name, at in self.runs if name == "fast"], [1.25, 2.25, 3.25, 4.25, 5.25, 6.25, 7.25, 8.25, 9.25, 10.25])
+        self.assertEqual([at for name, at in self.runs if name == "slow"], [5.25, 10.25])
+        # Shorter than a tick rounds up to one
+        self.assertEqual(len([name for name, at in self.runs if name == "tick"]), 20)
+
+    def test_missed_ticks_are_caught_up(self):
+        self.scheduler.schedule(1, self.recorder("fast"))
+        self.assertEqual(self.advance(3.25), 6)
+        self.assertEqual(len(self.runs), 3)
+        # Deadlines stay on the start time, not on when the ticks were run
+        self.assertEqual(self.advance(0.25), 1)
+        self.assertEqual(self.advance(0.25), 0)
+
+    def test_cancel_and_reschedule(self):
+        fast = self.scheduler.schedule(1, self.recorder("fast"))
+        self.assertEqual(self.scheduler.task_count(), 1)
+        self.advance(1)
+        fast.cancel()
+        fast.cancel()
+        self.assertEqual(self.scheduler.task_count(), 0)
+        self.advance(3)
+        self.assertEqual(len(self.runs), 1)
+
+        # A task that replaces itself from its callback, as a reconnecting client does
+        tasks = []
+
+        def reconnect():
+            self.runs.append(("reconnect", self.clock.now - 1000))
+            tasks[-1].cancel()
+            if len(tasks) < 3:
+                tasks.append(self.scheduler.schedule(2, reconnect))
+
+        tasks.append(self.scheduler.schedule(1, reconnect))
+        self.run_for(10)
+        self.assertEqual([at for name, at in self.runs if name == "reconnect"], [5.0, 7.0, 9.0])
+        self.assertEqual(self.scheduler.task_count(), 0)
+
+    def test_failing_task_keeps_its_schedule(self):
+        def fail():
+            self.runs.append(("fail", self.clock.now - 1000))
+            raise ValueError("socket closed")
+
+        self.scheduler.schedule(1, fail)
+        self.scheduler.schedule(1, self.recorder("other"))
+        self.advance(2)
+        self.assertEqual([name for name, at in self.runs], ["fail", "other", "fail", "other"])
+
+    def test_threaded_scheduler_runs_tasks(self):
+        scheduler = HeartbeatScheduler(tick_seconds=0.01)
+        ran = threading.Event()
+        scheduler.schedule(0.02, ran.set)
+        try:
+            self.assertTrue(ran.wait(2))
+        finally:
+            scheduler.shutdown()
+
+class TestStaleConnection(unittest.TestCase):
+    def setUp(self):
+        # The client writes a dated log folder in the working directory
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+        self.clock = FakeClock()
+        self.scheduler = HeartbeatScheduler(clock=self.clock, threaded=False)
+
+    def tearDown(self):
+        logzero.logfile(None)
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def test_heartbeat_closes_a_connection_without_pongs(self):
+        sws = SmartWebSocketV2("auth", "api_key", "client", "feed")
+        sws.wsapp = FakeSocket()
+        sws.last_pong_timestamp = time.time()
+        sws._heartbeat_task = self.scheduler.schedule(sws.HEART_BEAT_INTERVAL, sws._send_heartbeat)
+
+        self.clock.now += sws.HEART_BEAT_INTERVAL
+        self.scheduler.run_due()
+        self.assertEqual((sws.wsapp.sent, sws.wsapp.closed), ([sws.HEART_BEAT_MESSAGE], False))
+
+        # No pong for longer than the missed-heartbeat limit
+        sws.last_pong_timestamp = time.time() - sws.HEART_BEAT_MISSED_LIMIT * sws.HEART_BEAT_INTERVAL - 1
+        self.clock.now += sws.HEART_BEAT_INTERVAL
+        self.scheduler.run_due()
+        self.assertTrue(sws.wsapp.closed)
+        self.assertIsNone(sws._heartbeat_task)
+        self.assertEqual(self.scheduler.task_count(), 0)
+
+        self.clock.now += 3 * sws.HEART_BEAT_INTERVAL
+        self.scheduler.run_due()
+        self.assertEqual(len(sws.wsapp.sent), 1)
+
+if __name__ == '__main__':
+    unittest.main()
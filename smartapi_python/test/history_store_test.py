@@ -0,0 +1,110 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+from datetime import date
+import pandas as pd
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi import historyStore
+from SmartApi.historyStore import BHAVCOPY, SNAPSHOTS, HistoryStore, cached_bhavcopy, missing_ranges
+
+def bhavcopy_frame(symbol, days):
+    return pd.DataFrame({
+        "Symbol": [symbol] * len(days), "Series": ["EQ"] * len(days),
+        "Date": [day.strftime("%d-%b-%Y") for day in days], "ClosePrice": [100.0 + day.day for day in days],
+        "TotalTradedQuantity": ["1,000"] * len(days)
+    })
+
+class TestHistoryStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.store = HistoryStore(self.directory)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def day_files(self, dataset, trade_date):
+        return sorted(os.listdir(os.path.join(self.directory, dataset, f"trade_date={trade_date}")))
+
+    def test_writes_append_parts_and_the_last_write_wins(self):
+        self.store.write_snapshots([("TCS", 20250701, 100000, 100, 300, 25.0, 75.0),
+                                    ("INFY", 20250701, 100000, 50, 50, 50.0, 50.0)])
+        self.store.write_snapshots([("TCS", 20250701, 100000, 300, 100, 75.0, 25.0),
+                                    ("TCS", 20250702, 100000, 1, 1, 50.0, 50.0)])
+        self.assertEqual(len(self.day_files(SNAPSHOTS, 20250701)), 2)
+
+        frame = self.store.read(SNAPSHOTS)
+        self.assertEqual(list(zip(frame["symbol"], frame["trade_date"], frame["buy_qty"])),
+                         [("INFY", 20250701, 50), ("TCS", 20250701, 300), ("TCS", 20250702, 1)])
+        only_tcs = self.store.read(SNAPSHOTS, ["tcs"], 20250701, 20250701, columns=["buy_pct"])
+        self.assertEqual(list(only_tcs.columns), ["buy_pct", "trade_date"])
+        self.assertEqual(only_tcs["buy_pct"].tolist(), [75.0])
+
+        self.assertEqual(self.store.compact(SNAPSHOTS), 2)
+        self.assertEqual(self.day_files(SNAPSHOTS, 20250701), ["data.parquet"])
+        self.assertTrue(self.store.read(SNAPSHOTS).equals(frame))
+        self.assertEqual(self.store.compact(SNAPSHOTS), 0)
+        if historyStore.duckdb is not None:
+            count = self.store.duckdb().execute("SELECT count(*) FROM snapshots").fetchone()[0]
+            self.assertEqual(count, 3)
+
+    def test_a_day_is_compacted_once_it_has_enough_parts(self):
+        for position in range(historyStore.COMPACT_PARTS + 1):
+            self.store.write_snapshots([("TCS", 20250701, 91500 + position, position, 1, 50.0, 50.0)])
+        self.assertEqual(self.day_files(SNAPSHOTS, 20250701), ["data.parquet"])
+        self.assertEqual(len(self.store.read(SNAPSHOTS)), historyStore.COMPACT_PARTS + 1)
+
+    def test_missing_ranges(self):
+        self.assertEqual(missing_ranges(20250701, 20250731, []), [(20250701, 20250731)])
+        self.assertEqual(missing_ranges(20250701, 20250731, [(20250610, 20250705), (20250710, 20250720)]),
+                         [(20250706, 20250709), (20250721, 20250731)])
+        self.assertEqual(missing_ranges(20250701, 20250731, [(20250701, 20250715), (20250716, 20250731)]), [])
+
+    def test_cached_bhavcopy_requests_each_day_once(self):
+        calls = []
+        published = {"TCS": [date(2025, 7, 1), date(2025, 7, 2), date(2025, 7, 4)], "NEWCO": []}
+
+        def fetch(symbol, from_date, to_date):
+            calls.append((symbol, from_date, to_date))
+            return bhavcopy_frame(symbol, [day for day in published[symbol] if from_date <= day <= to_date])
+
+        rows = cached_bhavcopy(self.store, ["TCS", "NEWCO"], "2025-07-01", "2025-07-04", fetch, today=date(2025, 7, 10))
+        self.assertEqual(rows["trade_date"].tolist(), [20250701, 20250702, 20250704])
+        self.assertEqual(rows["total_traded_quantity"].tolist(), [1000] * 3)
+        self.assertEqual(len(calls), 2)
+
+        # The holiday on the 3rd and the symbol without trades are not asked for again
+        calls.clear()
+        again = cached_bhavcopy(self.store, ["TCS", "NEWCO"], "2025-07-01", "2025-07-04", fetch, today=date(2025, 7, 10))
+        self.assertEqual(calls, [])
+        self.assertEqual(again["close_price"].tolist(), rows["close_price"].tolist())
+
+        # Only the days outside the requested ranges are fetched, including the gap between them
+        cached_bhavcopy(self.store, ["TCS"], "2025-07-08", "2025-07-09", fetch, today=date(2025, 7, 10))
+        calls.clear()
+        cached_bhavcopy(self.store, ["TCS"], "2025-07-01", "2025-07-09", fetch, today=date(2025, 7, 10))
+        self.assertEqual(calls, [("TCS", date(2025, 7, 5), date(2025, 7, 7))])
+
+    def test_cached_bhavcopy_asks_again_for_an_unpublished_today(self):
+        calls = []
+        published = []
+
+        def fetch(symbol, from_date, to_date):
+            calls.append((from_date, to_date))
+            return bhavcopy_frame(symbol, [day for day in published if from_date <= day <= to_date])
+
+        cached_bhavcopy(self.store, ["TCS"], "2025-07-09", "2025-07-10", fetch, today=date(2025, 7, 10))
+        published.append(date(2025, 7, 10))
+        rows = cached_bhavcopy(self.store, ["TCS"], "2025-07-09", "2025-07-10", fetch, today=date(2025, 7, 10))
+        self.assertEqual(calls, [(date(2025, 7, 9), date(2025, 7, 10)), (date(2025, 7, 10), date(2025, 7, 10))])
+        self.assertEqual(rows["trade_date"].tolist(), [20250710])
+        cached_bhavcopy(self.store, ["TCS"], "2025-07-09", "2025-07-10", fetch, today=date(2025, 7, 10))
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.store.fetched_ranges(BHAVCOPY), {"TCS": [(20250709, 20250710)]})
+
+if __name__ == '__main__':
+    unittest.main()
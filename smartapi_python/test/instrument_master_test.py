@@ -0,0 +1,130 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+from datetime import date
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi.instrumentMaster import CURRENT_FILE, load_instrument_master
+
+def instrument(token, symbol, name, exch_seg, instrumenttype="", expiry="", strike="-1.000000"):
+    return {"token": str(token), "symbol": symbol, "name": name, "expiry": expiry, "strike": strike,
+            "lotsize": "1", "instrumenttype": instrumenttype, "exch_seg": exch_seg, "tick_size": "5.000000"}
+
+SCRIP_MASTER = [
+    instrument(2885, "RELIANCE-EQ", "RELIANCE", "NSE"),
+    instrument(1594, "INFY-EQ", "INFY", "NSE"),
+    instrument(99926000, "Nifty 50", "NIFTY", "NSE", "AMXIDX"),
+    instrument(500325, "RELIANCE", "RELIANCE", "BSE"),
+    instrument(1001, "RELIANCE27NOV25FUT", "RELIANCE", "NFO", "FUTSTK", "27NOV2025"),
+    instrument(1002, "RELIANCE27NOV251400CE", "RELIANCE", "NFO", "OPTSTK", "27NOV2025", "140000.000000"),
+    instrument(1003, "RELIANCE27NOV251400PE", "RELIANCE", "NFO", "OPTSTK", "27NOV2025", "140000.000000"),
+    instrument(1004, "NIFTY27NOV2525000CE", "NIFTY", "NFO", "OPTIDX", "27NOV2025", "2500000.000000"),
+]
+
+class TestInstrumentMaster(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.directory, "cache")
+        self.source = os.path.join(self.directory, "OpenAPIScripMaster.json")
+        self.write_source(SCRIP_MASTER)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_source(self, records, mtime=1000000000):
+        with open(self.source, "w") as f:
+            json.dump(records, f)
+        os.utime(self.source, (mtime, mtime))
+
+    def test_lookups(self):
+        master = load_instrument_master(self.cache_dir, self.source)
+        self.assertEqual(len(master), len(SCRIP_MASTER))
+        self.assertEqual(master.by_token(2885), 0)
+        self.assertEqual(master.by_token("500325", exch_seg="BSE"), 3)
+        self.assertIsNone(master.by_token(500325))
+        self.assertEqual(master.by_symbol("INFY-EQ"), 1)
+        self.assertEqual(master.by_name("RELIANCE").tolist(), [0, 3, 4, 5, 6])
+        self.assertEqual(master.by_contract("RELIANCE", date(2025, 11, 27)), 4)
+        self.assertEqual(master.by_contract("RELIANCE", "27NOV2025", 1400, "PE"), 6)
+        self.assertEqual(master.by_contract("NIFTY", 20251127, 25000, "CE"), 7)
+        self.assertIsNone(master.by_contract("RELIANCE", "2025-11-27", 1450, "CE"))
+        frame = master.frame([5], ["symbol", "name", "expiry", "strike", "option_type"])
+        self.assertEqual(frame.iloc[0].tolist(), ["RELIANCE27NOV251400CE", "RELIANCE", 20251127, 1400.0, "CE"])
+        self.assertEqual(master.equity_symbols(), ["INFY", "RELIANCE"])
+        self.assertEqual(master.fno_underlying_tokens(), ["2885"])
+
+    def test_conversion_is_reused_until_the_source_changes(self):
+        master = load_instrument_master(self.cache_dir, self.source)
+        build = master.meta["build"]
+        # Built today: the source is not even looked at
+        self.write_source(SCRIP_MASTER[:2], mtime=1000000100)
+        self.assertEqual(load_instrument_master(self.cache_dir, self.source).meta["build"], build)
+
+        self.write_source(SCRIP_MASTER, mtime=1000000000)
+        self.make_stale()
+        self.assertEqual(load_instrument_master(self.cache_dir, self.source).meta["build"], build)
+
+        self.write_source(SCRIP_MASTER[:2], mtime=1000000100)
+        self.make_stale()
+        master = load_instrument_master(self.cache_dir, self.source)
+        self.assertNotEqual(master.meta["build"], build)
+        self.assertEqual(len(master), 2)
+        # The previous build stays for readers that have not seen the new one yet
+        self.assertEqual(self.builds(), sorted([build, master.meta["build"]]))
+
+        self.write_source(SCRIP_MASTER[:3], mtime=1000000200)
+        self.make_stale()
+        latest = load_instrument_master(self.cache_dir, self.source)
+        self.assertEqual(self.builds(), sorted([master.meta["build"], latest.meta["build"]]))
+        self.assertEqual(len(master.frame()), 2)
+
+    def test_another_source_converts_again(self):
+        master = load_instrument_master(self.cache_dir, self.source)
+        other = os.path.join(self.directory, "Other.json")
+        with open(other, "w") as f:
+            json.dump(SCRIP_MASTER[:2], f)
+        os.utime(other, (1000000000, 1000000000))
+        # Same mtime and built today, but a different file
+        master = load_instrument_master(self.cache_dir, other)
+        self.assertEqual((master.meta["source"], len(master)), (other, 2))
+        self.assertEqual(len(load_instrument_master(self.cache_dir, self.source)), len(SCRIP_MASTER))
+
+    def test_missing_source_falls_back_to_the_last_build(self):
+        load_instrument_master(self.cache_dir, self.source)
+        os.remove(self.source)
+        self.make_stale()
+        self.assertEqual(load_instrument_master(self.cache_dir, self.source).by_symbol("INFY-EQ"), 1)
+        with self.assertRaises(OSError):
+            load_instrument_master(os.path.join(self.directory, "empty"), self.source)
+
+    def test_filtered_master_keeps_matching_rows(self):
+        master = load_instrument_master(self.cache_dir, self.source, exch_seg=("NSE", "NFO"),
+                                        instrumenttype=("", "FUTSTK", "OPTSTK"))
+        self.assertEqual(len(master), 5)
+        self.assertIsNone(master.by_symbol("RELIANCE", exch_seg="BSE"))
+        self.assertEqual(master.fno_underlying_tokens(), ["2885"])
+        build = master.meta["build"]
+        # Other filters on the same cache_dir convert the source again
+        master = load_instrument_master(self.cache_dir, self.source, exch_seg="NSE", symbol_suffix="-EQ")
+        self.assertNotEqual(master.meta["build"], build)
+        self.assertEqual(master.equity_symbols(), ["INFY", "RELIANCE"])
+        self.assertEqual(len(master), 2)
+
+    def builds(self):
+        return sorted(entry for entry in os.listdir(self.cache_dir) if entry != CURRENT_FILE)
+
+    def make_stale(self):
+        path = os.path.join(self.cache_dir, CURRENT_FILE)
+        with open(path, "r") as f:
+            meta = json.load(f)
+        meta["built_on"] = "2000-01-01"
+        with open(path, "w") as f:
+            json.dump(meta, f)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+from datetime import datetime
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi.kiteInstruments import KiteInstrumentCache, diff_instruments, latest_futures, parse_instruments
+
+HEADER = "instrument_token,exchange_token,tradingsymbol,name,last_price,expiry,strike,tick_size,lot_size,instrument_type,segment,exchange"
+
+def dump(*rows):
+    return ("\n".join((HEADER,) + rows) + "\n").encode("utf-8")
+
+EQUITY = '738561,2885,RELIANCE,"RELIANCE",1400.5,,0,0.05,1,EQ,NSE,NSE'
+RELIANCE_OCT = '100,1,RELIANCE25OCTFUT,"RELIANCE",0,2025-10-30,0,0.1,500,FUT,NFO-FUT,NFO'
+RELIANCE_NOV = '101,2,RELIANCE25NOVFUT,"RELIANCE",0,2025-11-27,0,0.1,500,FUT,NFO-FUT,NFO'
+RELIANCE_CALL = '102,3,RELIANCE25NOV1400CE,"RELIANCE",0,2025-11-27,1400,0.05,500,CE,NFO-OPT,NFO'
+INFY_OCT = '200,4,INFY25OCTFUT,"INFY",0,2025-10-30,0,0.1,400,FUT,NFO-FUT,NFO'
+NIFTY_NOV = '300,5,NIFTY25NOVFUT,"NIFTY",0,2025-11-27,0,0.1,75,FUT,NFO-FUT,NFO'
+TCS_NOV = '400,6,TCS25NOVFUT,"TCS",0,2025-11-27,0,0.1,175,FUT,NFO-FUT,NFO'
+
+class TestKiteInstruments(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_latest_futures(self):
+        frame = parse_instruments(dump(EQUITY, RELIANCE_OCT, RELIANCE_NOV, RELIANCE_CALL, INFY_OCT, NIFTY_NOV))
+        futures = latest_futures(frame, datetime(2025, 10, 20))
+        self.assertEqual(futures["name"].tolist(), ["INFY", "RELIANCE"])
+        self.assertEqual(futures["instrument_token"].tolist(), [200, 101])
+        self.assertEqual(latest_futures(frame, datetime(2025, 11, 1))["instrument_token"].tolist(), [101])
+
+    def test_diff_ignores_last_price(self):
+        old = parse_instruments(dump(EQUITY, RELIANCE_OCT, INFY_OCT))
+        new = parse_instruments(dump(EQUITY.replace("1400.5", "1410.0"), RELIANCE_OCT.replace(",500,", ",250,"), TCS_NOV))
+        diff = diff_instruments(old, new)
+        self.assertEqual(diff["added"]["instrument_token"].tolist(), [400])
+        self.assertEqual(diff["removed"]["instrument_token"].tolist(), [200])
+        self.assertEqual(diff["changed"]["lot_size"].tolist(), [250])
+        self.assertEqual(diff["changed_from"]["lot_size"].tolist(), [500])
+
+    def test_refresh_reselects_only_what_changed(self):
+        cache = KiteInstrumentCache(self.directory)
+        stats = cache.refresh(datetime(2025, 10, 20, 9), dump(EQUITY, RELIANCE_OCT, RELIANCE_NOV, INFY_OCT, NIFTY_NOV))
+        self.assertEqual(stats["reselected"], 2)
+        self.assertEqual(cache.fno_tokens(), ["200", "101"])
+
+        stats = cache.refresh(datetime(2025, 10, 20, 10), dump(EQUITY, RELIANCE_OCT, RELIANCE_NOV, INFY_OCT, NIFTY_NOV))
+        self.assertFalse(stats["changed"])
+        self.assertEqual(stats["reselected"], 0)
+
+        # A new process starts from the stored copy: only TCS is new
+        cache = KiteInstrumentCache(self.directory)
+        stats = cache.refresh(datetime(2025, 10, 21, 9), dump(EQUITY, RELIANCE_OCT, RELIANCE_NOV, INFY_OCT, NIFTY_NOV, TCS_NOV))
+        self.assertEqual((stats["added"], stats["reselected"]), (1, 1))
+        self.assertEqual(cache.fno_tokens(), ["200", "101", "400"])
+
+        # Past the October expiry INFY has no future left; the dump itself is unchanged
+        stats = cache.refresh(datetime(2025, 10, 31, 9), dump(EQUITY, RELIANCE_OCT, RELIANCE_NOV, INFY_OCT, NIFTY_NOV, TCS_NOV))
+        self.assertEqual(stats["reselected"], 1)
+        self.assertEqual(cache.fno_tokens(), ["101", "400"])
+
+if __name__ == '__main__':
+    unittest.main()
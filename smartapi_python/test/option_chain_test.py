@@ -0,0 +1,81 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi.instrumentMaster import load_instrument_master
+from SmartApi.optionChain import MISSING_TOKEN, OptionChainIndex
+
+def option(token, name, expiry, strike, option_type):
+    return {"token": str(token), "symbol": f"{name}{expiry}{strike}{option_type}", "name": name, "expiry": expiry,
+            "strike": f"{strike * 100:.6f}", "lotsize": "75", "instrumenttype": "OPTIDX", "exch_seg": "NFO",
+            "tick_size": "5.000000"}
+
+def nifty_options(expiry="27NOV2025", first_token=1000):
+    records = []
+    for position, strike in enumerate(range(24000, 26001, 100)):
+        records.append(option(first_token + 2 * position, "NIFTY", expiry, strike, "CE"))
+        records.append(option(first_token + 2 * position + 1, "NIFTY", expiry, strike, "PE"))
+    return records
+
+class TestOptionChain(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.source = os.path.join(self.directory, "OpenAPIScripMaster.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def master(self, records, mtime):
+        with open(self.source, "w") as f:
+            json.dump(records, f)
+        os.utime(self.source, (mtime, mtime))
+        # A cache of its own per version, as the cache is only checked against the source once a day
+        return load_instrument_master(os.path.join(self.directory, f"cache-{mtime}"), self.source)
+
+    def test_strike_lookups(self):
+        records = nifty_options() + [option(5000, "BANKNIFTY", "25NOV2025", 52000, "CE")]
+        index = OptionChainIndex(self.master(records, 1000000000))
+        chain = index.chain("NIFTY", "2025-11-27")
+        self.assertEqual(len(chain), 21)
+        self.assertEqual(chain.atm_strike(25049), 25000.0)
+        self.assertEqual(chain.atm_strike(25050), 25000.0)
+        self.assertEqual(chain.atm_strike(30000), 26000.0)
+        strikes = chain.around(25020, 2)
+        self.assertEqual(chain.strikes[strikes].tolist(), [24800, 24900, 25000, 25100, 25200])
+        self.assertEqual(chain.tokens(chain.between(24050, 24200)), ["1002", "1004", "1003", "1005"])
+        self.assertEqual(chain.subscription(chain.between(24000, 24000), "PE"), [{"exchangeType": 2, "tokens": ["1001"]}])
+        self.assertEqual(chain.greek_params(), {"name": "NIFTY", "expirydate": "27NOV2025"})
+
+        bank = index.chain("BANKNIFTY", on=20251101)
+        self.assertEqual(bank.pe_tokens.tolist(), [MISSING_TOKEN])
+        self.assertEqual(bank.tokens(), ["5000"])
+        self.assertIsNone(index.chain("BANKNIFTY", on=20251201))
+
+    def test_update_rebuilds_only_changed_chains(self):
+        november = nifty_options()
+        december = nifty_options("24DEC2025", first_token=2000)
+        index = OptionChainIndex(self.master(november + december, 1000000000))
+        chain = index.chain("NIFTY", 20251127)
+        self.assertEqual(index.expiries("NIFTY"), [20251127, 20251224])
+
+        # A new December strike and a January expiry; November is untouched
+        january = nifty_options("29JAN2026", first_token=3000)
+        extra = [option(2100, "NIFTY", "24DEC2025", 26100, "CE")]
+        stats = index.update(self.master(november + december + extra + january, 1000000100))
+        self.assertEqual(stats, {"chains": 3, "kept": 1, "rebuilt": 2, "removed": 0})
+        self.assertIs(index.chain("NIFTY", 20251127), chain)
+        self.assertEqual(index.chain("NIFTY", 20251224).strikes[-1], 26100)
+        self.assertEqual(index.chain("NIFTY", 20251224).pe_tokens[-1], MISSING_TOKEN)
+
+        stats = index.update(self.master(january, 1000000200))
+        self.assertEqual(stats, {"chains": 1, "kept": 1, "rebuilt": 0, "removed": 2})
+        self.assertEqual(index.expiries("NIFTY"), [20260129])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import unittest
+import os
+import sys
+import json
+import asyncio
+import threading
+from concurrent.futures import TimeoutError
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi.orderStateCache import OrderStateCache, order_update_from_dict, parse_order_update
+
+def order(status, update_time="25-Feb-2025 09:54:02", order_id="250225000001", filled=0, symbol="SBIN-EQ"):
+    return {"orderid": order_id, "orderstatus": status, "tradingsymbol": symbol, "quantity": "10",
+            "filledshares": str(filled), "unfilledshares": str(10 - filled), "updatetime": update_time}
+
+def update(*args, **kwargs):
+    return order_update_from_dict(order(*args, **kwargs))
+
+class TestOrderStateCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = OrderStateCache()
+
+    def test_parse_order_update(self):
+        message = json.dumps({"orderData": order("Open"), "user-id": "A1"})
+        parsed = parse_order_update(message.encode())
+        self.assertEqual((parsed.order_id, parsed.status, parsed.unfilled_quantity), ("250225000001", "open", 10))
+        self.assertIsNone(parse_order_update("pong"))
+        self.assertIsNone(parse_order_update(json.dumps({"status-code": "200"})))
+        self.assertIsNone(order_update_from_dict({"orderstatus": "open"}))
+
+    def test_out_of_order_updates_keep_the_latest(self):
+        self.assertTrue(self.cache.apply(update("open", "25-Feb-2025 09:54:05", filled=4)))
+        # Delivered after the later one
+        self.assertFalse(self.cache.apply(update("open", "25-Feb-2025 09:54:03", filled=0)))
+        self.assertEqual(self.cache.get(250225000001).filled_quantity, 4)
+        self.assertTrue(self.cache.apply(update("open", "25-Feb-2025 09:54:06", filled=7)))
+        self.assertEqual(self.cache.get("250225000001").filled_quantity, 7)
+
+        # An orderBook() response older than the pushes does not roll them back
+        self.assertEqual(self.cache.seed({"data": [order("open", "25-Feb-2025 09:54:01"),
+                                                   order("open", order_id="250225000002", symbol="TCS-EQ")]}), 2)
+        self.assertEqual(self.cache.get("250225000001").filled_quantity, 7)
+        self.assertEqual([o.order_id for o in self.cache.orders_for("SBIN-EQ")], ["250225000001"])
+        self.assertEqual(len(self.cache.open_orders()), 2)
+
+    def test_terminal_status_is_never_replaced_by_a_late_update(self):
+        self.cache.apply(update("open", "25-Feb-2025 09:54:05"))
+        # Stamped before the open update but terminal: the order is still done
+        self.assertTrue(self.cache.apply(update("complete", "25-Feb-2025 09:54:04", filled=10)))
+        self.assertFalse(self.cache.apply(update("open", "25-Feb-2025 09:54:09", filled=9)))
+        self.assertFalse(self.cache.apply(update("trigger pending")._replace(update_time=None)))
+        self.assertEqual(self.cache.get("250225000001").status, "complete")
+        self.assertEqual(self.cache.open_orders(), [])
+
+    def test_wait_resolves_on_the_requested_status(self):
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(self.cache.wait("250225000001", timeout=5)))
+        waiter.start()
+        self.cache.apply(update("open"))
+        self.cache.apply(update("rejected", "25-Feb-2025 09:54:03"))
+        waiter.join(5)
+        self.assertEqual(result[0].status, "rejected")
+        # Already in the status: resolved at once
+        self.assertTrue(self.cache.wait_for_status("250225000001", ["Rejected"]).done())
+
+        future = self.cache.wait_for_status("250225000003", ["open"])
+        self.cache.apply(update("open", order_id="250225000003"))
+        self.assertEqual(future.result(0).order_id, "250225000003")
+
+    def test_wait_times_out_and_forgets_the_waiter(self):
+        self.cache.apply(update("open"))
+        with self.assertRaises(TimeoutError):
+            self.cache.wait("250225000001", timeout=0.05)
+        self.assertEqual(self.cache._waiters, {})
+        self.assertTrue(self.cache.apply(update("complete", "25-Feb-2025 09:54:03", filled=10)))
+
+    def test_wait_async(self):
+        async def wait_for_fill():
+            loop = asyncio.get_running_loop()
+            loop.call_later(0.01, self.cache.apply, update("complete", filled=10))
+            return await asyncio.wait_for(self.cache.wait_async("250225000001"), 5)
+
+        self.assertEqual(asyncio.run(wait_for_fill()).filled_quantity, 10)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import unittest
+import io
+import os
+import sys
+import json
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi.scripMasterParser import iter_scrip_master, scrip_master_columns, source_chunks
+
+RECORDS = [
+    {"token": "2885", "symbol": "RELIANCE-EQ", "name": "RELIANCE", "exch_seg": "NSE", "instrumenttype": ""},
+    {"token": "99926000", "symbol": "Nifty 50", "name": "NIFTY", "exch_seg": "NSE", "instrumenttype": "AMXIDX"},
+    {"token": "1001", "symbol": "RELIANCE27NOV25FUT", "name": "RELIANCE", "exch_seg": "NFO", "instrumenttype": "FUTSTK"},
+    {"token": "1004", "symbol": "NIFTY27NOV2525000CE", "name": "NIFTY", "exch_seg": "NFO", "instrumenttype": "OPTIDX"},
+    {"token": "500325", "symbol": "RELIANCE", "name": "RELIANCE é", "exch_seg": "BSE", "instrumenttype": ""},
+]
+
+def chunked(records, size, indent=None):
+    data = json.dumps(records, indent=indent, ensure_ascii=False).encode("utf-8")
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+class TestScripMasterParser(unittest.TestCase):
+    def test_parses_across_any_chunk_boundary(self):
+        # Chunks of one byte split keys, strings and multi-byte characters
+        for size in (1, 7, 64, 1 << 20):
+            self.assertEqual(list(iter_scrip_master(chunked(RECORDS, size, indent=2))), RECORDS)
+        self.assertEqual(list(iter_scrip_master([b"[]"])), [])
+
+    def test_filters(self):
+        tokens = lambda **filters: [row["token"] for row in iter_scrip_master(chunked(RECORDS, 16), **filters)]
+        self.assertEqual(tokens(exch_seg="NSE", symbol_suffix="-EQ"), ["2885"])
+        self.assertEqual(tokens(exch_seg=("NSE", "NFO"), instrumenttype=("", "FUTSTK")), ["2885", "1001"])
+        self.assertEqual(tokens(instrumenttype="OPTIDX"), ["1004"])
+        columns = scrip_master_columns(chunked(RECORDS, 16), ["token", "name", "expiry"], exch_seg="NFO")
+        self.assertEqual(columns, {"token": ["1001", "1004"], "name": ["RELIANCE", "NIFTY"], "expiry": [None, None]})
+        self.assertEqual(list(iter_scrip_master(source_chunks(io.BytesIO(b'[{"a": 1}]'), chunk_size=3))), [{"a": 1}])
+
+    def test_rejects_truncated_or_malformed_input(self):
+        data = json.dumps(RECORDS).encode("utf-8")
+        with self.assertRaises(ValueError):
+            list(iter_scrip_master([data[:-1]]))
+        with self.assertRaises(ValueError):
+            list(iter_scrip_master([data[:len(data) // 2]]))
+        with self.assertRaises(ValueError):
+            list(iter_scrip_master([b'{"token": "1"}']))
+        with self.assertRaises(ValueError):
+            list(iter_scrip_master([b'[{"token": "1"}, {"token" "2"}]']))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import logzero
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi import smartWebSocketV2
+from SmartApi.smartWebSocketV2 import SmartWebSocketV2
+
+class FakeSocket(object):
+    """
+    Stands in for websocket.WebSocketApp: each run_forever plays the next outcome of the script.
+    "fail" raises, "drop" opens the connection and returns as if the server closed it and
+    "block" opens it and waits for close().
+    """
+
+    script = []
+    sockets = []
+
+    def __init__(self, url, header=None, on_open=None, on_error=None, on_close=None, on_data=None,
+                 on_ping=None, on_pong=None):
+        self.on_open = on_open
+        self.on_close = on_close
+        self.sent = []
+        self.closed = threading.Event()
+        FakeSocket.sockets.append(self)
+
+    def run_forever(self, sslopt=None):
+        outcome = FakeSocket.script.pop(0) if FakeSocket.script else "block"
+        if outcome == "fail":
+            raise ConnectionError("connection refused")
+        self.on_open(self)
+        if outcome == "block":
+            self.closed.wait()
+        self.on_close(self)
+
+    def send(self, data, opcode=None):
+        self.sent.append(data)
+
+    def close(self):
+        self.closed.set()
+
+class RecordingStopEvent(threading.Event):
+    """
+    _stop_event that records each backoff delay instead of sleeping, and stops after `waits` of them
+    """
+
+    def __init__(self, waits):
+        super(RecordingStopEvent, self).__init__()
+        self.waits = waits
+        self.delays = []
+
+    def wait(self, timeout=None):
+        self.delays.append(timeout)
+        if len(self.delays) >= self.waits:
+            self.set()
+        return self.is_set()
+
+class FakeSmartConnect(object):
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def getMarketData(self, mode, exchange_tokens):
+        with self.lock:
+            self.calls.append((mode, exchange_tokens))
+        fetched = [{"exchange": exchange, "symbolToken": token}
+                   for exchange, tokens in exchange_tokens.items() for token in tokens]
+        return {"status": True, "data": {"fetched": fetched}}
+
+class TestSmartWebSocketV2(unittest.TestCase):
+    def setUp(self):
+        # The client writes a dated log folder in the working directory
+        self.cwd = os.getcwd()
+        self.directory = tempfile.mkdtemp()
+        os.chdir(self.directory)
+        self.web_socket_app = smartWebSocketV2.websocket.WebSocketApp
+        smartWebSocketV2.websocket.WebSocketApp = FakeSocket
+        FakeSocket.script = []
+        FakeSocket.sockets = []
+
+    def tearDown(self):
+        smartWebSocketV2.websocket.WebSocketApp = self.web_socket_app
+        logzero.logfile(None)
+        os.chdir(self.cwd)
+        shutil.rmtree(self.directory)
+
+    def client(self, **kwargs):
+        return SmartWebSocketV2("auth", "api_key", "client", "feed", **kwargs)
+
+    def test_backoff_grows_and_resets_after_a_successful_connect(self):
+        sws = self.client(max_retry_attempt=5, retry_strategy=1, retry_delay=1, retry_multiplier=2, retry_jitter=0)
+        sws._stop_event = RecordingStopEvent(waits=5)
+        sws.subscriptions.add(sws.QUOTE, [{"exchangeType": 1, "tokens": ["26009"]}])
+        FakeSocket.script = ["fail", "fail", "fail", "drop", "fail"]
+        sws.connect()
+        self.assertEqual(sws._stop_event.delays, [1, 2, 4, 1, 2])
+        self.assertEqual(len(FakeSocket.sockets), 5)
+        # The connection that came up replayed the registered subscription
+        request = json.loads(FakeSocket.sockets[3].sent[0])
+        self.assertEqual((request["action"], request["params"]["tokenList"]),
+                         (sws.SUBSCRIBE_ACTION, [{"exchangeType": 1, "tokens": ["26009"]}]))
+
+    def test_retries_stop_once_exhausted(self):
+        sws = self.client(max_retry_attempt=2, retry_strategy=0, retry_delay=3, retry_jitter=0)
+        sws._stop_event = RecordingStopEvent(waits=10)
+        errors = []
+        sws.on_error = lambda error, message: errors.append(error)
+        FakeSocket.script = ["fail", "fail", "fail"]
+        sws.connect()
+        self.assertEqual(sws._stop_event.delays, [3, 3])
+        self.assertEqual(errors, ["Max retry attempt reached"])
+        self.assertTrue(sws.DISCONNECT_FLAG)
+
+    def test_close_connection_ends_the_backoff_wait(self):
+        sws = self.client(max_retry_attempt=5, retry_delay=30, retry_jitter=0)
+        FakeSocket.script = ["drop"]
+        thread = threading.Thread(target=sws.connect, daemon=True)
+        thread.start()
+        # The dropped connection puts connect() into its 30s wait
+        while not sws.current_retry_attempt:
+            thread.join(0.01)
+        sws.close_connection()
+        thread.join(2)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(FakeSocket.sockets), 1)
+
+    def test_close_connection_ends_a_live_connection(self):
+        sws = self.client(max_retry_attempt=5, retry_delay=30)
+        thread = threading.Thread(target=sws.connect, daemon=True)
+        thread.start()
+        while not FakeSocket.sockets:
+            thread.join(0.01)
+        sws.close_connection()
+        thread.join(2)
+        self.assertFalse(thread.is_alive())
+        self.assertTrue(FakeSocket.sockets[0].closed.is_set())
+
+    def test_backfill_fetches_in_batches_of_50_tokens(self):
+        smart_api = FakeSmartConnect()
+        sws = self.client(smart_api=smart_api)
+        sws.subscriptions.add(sws.QUOTE, [{"exchangeType": 1, "tokens": [str(i) for i in range(120)]}])
+        sws.subscriptions.add(sws.LTP_MODE, [{"exchangeType": 1, "tokens": [str(i) for i in range(100, 130)]},
+                                             {"exchangeType": 2, "tokens": ["35001", "35002"]}])
+        received = []
+        sws.on_backfill = lambda wsapp, fetched: received.extend(fetched)
+        sws.backfill()
+
+        sizes = sorted(sum(len(tokens) for tokens in exchange_tokens.values()) for _, exchange_tokens in smart_api.calls)
+        self.assertEqual(sizes, [32, 50, 50])
+        self.assertEqual(set(mode for mode, _ in smart_api.calls), {"FULL"})
+        # Every token once, whatever mode it is subscribed in
+        self.assertEqual(sorted((quote["exchange"], quote["symbolToken"]) for quote in received),
+                         sorted([("NSE", str(i)) for i in range(130)] + [("NFO", "35001"), ("NFO", "35002")]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import unittest
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+from datetime import date, datetime, timedelta
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi.snapshotDaemon import SnapshotDaemon, TradingCalendar
+from SmartApi.snapshotPipeline import SnapshotPipeline
+from SmartApi.snapshotWriter import SnapshotWriter
+
+class FakeClient(object):
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+
+    def fetch(self, tokens):
+        self.calls += 1
+        time.sleep(self.delay)
+        return [{"tradingSymbol": f"S{token}-EQ", "totBuyQuan": int(token), "totSellQuan": 10} for token in tokens]
+
+class TestSnapshotDaemon(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.directory, "market_data.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_calendar_skips_weekends_and_holidays(self):
+        calendar = TradingCalendar(holidays=["2025-08-15"])
+        self.assertFalse(calendar.is_trading_day(date(2025, 8, 16)))
+        self.assertFalse(calendar.is_trading_day(date(2025, 8, 15)))
+        self.assertEqual(calendar.next_session(datetime(2025, 8, 14, 16, 0)),
+                         (datetime(2025, 8, 18, 9, 15), datetime(2025, 8, 18, 15, 30)))
+        self.assertEqual(calendar.next_session(datetime(2025, 8, 14, 12, 0))[0], datetime(2025, 8, 14, 9, 15))
+
+    def test_session_writes_one_row_per_symbol_and_cycle(self):
+        daemon = SnapshotDaemon(FakeClient(), [["1", "2"], ["3"]], self.db_file, interval=1)
+        session_open = (datetime.now() + timedelta(seconds=1)).replace(microsecond=0)
+        daemon.run_session(session_open, session_open + timedelta(seconds=2))
+        self.assertEqual(daemon.stats()["cycles_run"], 3)
+        self.assertEqual(daemon.stats()["rows_written"], 9)
+        # Every cycle ran through the pipeline's fetch, decode and write stages
+        self.assertEqual(set(daemon.stats()["mean_stage_seconds"]), {"fetch", "decode", "write"})
+        self.assertEqual([cycle["rows_written"] for cycle in daemon.cycles], [3, 3, 3])
+
+        conn = sqlite3.connect(self.db_file)
+        times = [row[0] for row in conn.execute("SELECT DISTINCT snapshot_time FROM market_snapshots ORDER BY 1")]
+        self.assertEqual(times, [int((session_open + timedelta(seconds=s)).strftime("%H%M%S")) for s in (0, 1, 2)])
+        self.assertEqual(conn.execute("SELECT buy_qty, sell_qty FROM market_snapshots WHERE symbol = 'S3' LIMIT 1").fetchone(), (3, 10))
+        conn.close()
+
+    def test_overrunning_cycle_skips_the_next_one(self):
+        daemon = SnapshotDaemon(FakeClient(delay=1.2), [["1"]], self.db_file, interval=1)
+        session_open = (datetime.now() + timedelta(seconds=1)).replace(microsecond=0)
+        daemon.run_session(session_open, session_open + timedelta(seconds=2))
+        self.assertEqual((daemon.stats()["cycles_run"], daemon.stats()["cycles_skipped"]), (2, 1))
+
+class TestSnapshotPipeline(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.directory, "market_data.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_stages_overlap_and_failed_batches_are_skipped(self):
+        client = FakeClient(delay=0.1)
+        def fetch(tokens):
+            if tokens == ["bad"]:
+                raise Exception("rejected")
+            return client.fetch(tokens)
+        batches = [[str(i * 10 + j) for j in range(10)] for i in range(8)] + [["bad"]]
+        stats = SnapshotPipeline(fetch, self.db_file, fetch_workers=4).run(batches, "2025-07-01 10:00:00")
+        self.assertEqual((stats["batches"], stats["failed_batches"], stats["rows_written"]), (9, 1, 80))
+        self.assertEqual(stats["bottleneck"], "fetch")
+        self.assertLess(stats["seconds"], stats["stages"]["fetch"]["busy_seconds"])
+
+        conn = sqlite3.connect(self.db_file)
+        self.assertEqual(conn.execute("SELECT count(*) FROM market_quotes WHERE snapshot_time = 100000").fetchone()[0], 80)
+        conn.close()
+
+    def test_failed_write_leaves_no_partial_snapshot(self):
+        add_records = SnapshotWriter.add_records
+        calls = []
+
+        def failing_add_records(writer, symbols, records, timestamp):
+            calls.append(len(symbols))
+            if len(calls) == 2:
+                raise Exception("disk full")
+            return add_records(writer, symbols, records, timestamp)
+
+        SnapshotWriter.add_records = failing_add_records
+        try:
+            pipeline = SnapshotPipeline(FakeClient().fetch, self.db_file, fetch_workers=2, queue_size=1)
+            with self.assertRaises(Exception):
+                pipeline.run([[str(i)] for i in range(6)], "2025-07-01 10:00:00")
+        finally:
+            SnapshotWriter.add_records = add_records
+        self.assertEqual(len(calls), 2)
+
+        conn = sqlite3.connect(self.db_file)
+        self.assertEqual(conn.execute("SELECT count(*) FROM market_snapshots").fetchone()[0], 0)
+        self.assertEqual(conn.execute("SELECT count(*) FROM market_quotes").fetchone()[0], 0)
+        conn.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+import unittest
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+from datetime import date
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi import snapshotMerge
+from SmartApi.snapshotMerge import merge_shards
+from SmartApi.snapshotQuery import fetch_quotes
+from SmartApi.snapshotRetention import RetentionManager
+from SmartApi.snapshotSchema import DAILY_ROLLUP_TABLE, HOURLY_ROLLUP_TABLE
+from SmartApi.snapshotWriter import SnapshotWriter
+
+def create_shard(path, rows):
+    with SnapshotWriter(path) as writer:
+        for row in rows:
+            writer.add(*row)
+    return path
+
+def create_legacy_shard(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE market_data (symbol TEXT, date TEXT, buy_sell_volume_percent TEXT)")
+    conn.executemany("INSERT INTO market_data VALUES (?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return path
+
+class TestSnapshotMerge(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.target = os.path.join(self.directory, "market_data.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def snapshots(self):
+        conn = sqlite3.connect(self.target)
+        try:
+            return conn.execute("SELECT symbol, snapshot_time, buy_qty, sell_qty, buy_pct, sell_pct "
+                                "FROM market_snapshots ORDER BY symbol, snapshot_time").fetchall()
+        finally:
+            conn.close()
+
+    def test_later_shard_wins_whatever_order_the_readers_finish_in(self):
+        first = create_shard(self.path("first.db"), [("TCS", "2025-07-01 10:00:00", 100, 300),
+                                                      ("TCS", "2025-07-01 10:01:00", 1, 1)])
+        second = create_shard(self.path("second.db"), [("TCS", "2025-07-01 10:00:00", 300, 100)])
+        shard_rows = snapshotMerge._shard_rows
+
+        def slow_first_shard(shard_file, chunk_size):
+            if shard_file == first:
+                time.sleep(0.2)
+            return shard_rows(shard_file, chunk_size)
+
+        snapshotMerge._shard_rows = slow_first_shard
+        try:
+            stats = merge_shards(self.target, [first, second], workers=2)
+        finally:
+            snapshotMerge._shard_rows = shard_rows
+        self.assertEqual(self.snapshots(), [("TCS", 100000, 300, 100, 75.0, 25.0), ("TCS", 100100, 1, 1, 50.0, 50.0)])
+        self.assertEqual((stats["rows_read"], stats["rows_inserted"], stats["rows_updated"]), (3, 2, 0))
+        self.assertEqual(stats["shards"][first]["rows_inserted"], 1)
+        self.assertEqual(stats["shards"][second]["rows_inserted"], 1)
+
+        again = merge_shards(self.target, [first, second], workers=2)
+        self.assertEqual((again["rows_inserted"], again["rows_updated"]), (0, 0))
+        self.assertEqual(self.snapshots()[0], ("TCS", 100000, 300, 100, 75.0, 25.0))
+
+        reversed_order = merge_shards(self.target, [second, first], workers=2)
+        self.assertEqual((reversed_order["rows_inserted"], reversed_order["rows_updated"]), (0, 1))
+        self.assertEqual(self.snapshots()[0], ("TCS", 100000, 100, 300, 25.0, 75.0))
+
+    def test_legacy_rows_keep_stored_quantities_consistent(self):
+        typed = create_shard(self.path("typed.db"), [("TCS", "2025-07-01 10:00:00", 100, 300)])
+        legacy = create_legacy_shard(self.path("legacy.db"), [
+            ("TCS", "2025-07-01 10:00:00", "40/60"),
+            ("INFY", "2025-07-01 10:00:00", "55/45"),
+            ("INFY", "2025-07-01 10:00:00", "56/44"),
+            ("BAD", "not a date", "1/2")
+        ])
+        stats = merge_shards(self.target, [typed, legacy])
+        self.assertEqual(self.snapshots(), [("INFY", 100000, None, None, 56.0, 44.0),
+                                            ("TCS", 100000, 100, 300, 25.0, 75.0)])
+        self.assertEqual(stats["shards"][legacy],
+                         {"rows_read": 4, "rows_skipped": 1, "rows_compacted": 0, "rows_inserted": 1, "rows_updated": 0,
+                          "quotes_written": 0})
+
+        # A typed row replaces the percentages of an untyped one
+        merge_shards(self.target, [create_shard(self.path("later.db"), [("INFY", "2025-07-01 10:00:00", 1, 3)])])
+        self.assertEqual(self.snapshots()[0], ("INFY", 100000, 1, 3, 25.0, 75.0))
+
+    def test_quotes_follow_their_rows(self):
+        def quote_shard(name, ltp, buy_qty=300):
+            with SnapshotWriter(self.path(name)) as writer:
+                writer.add_quotes([{"tradingSymbol": "SBIN-EQ", "symbolToken": "3045", "ltp": ltp,
+                                    "totBuyQuan": buy_qty, "totSellQuan": 100}], "2025-07-01 10:00:00")
+            return self.path(name)
+
+        first, second = quote_shard("first.db", 571.8), quote_shard("second.db", 572.5)
+        stats = merge_shards(self.target, [first, second])
+        self.assertEqual(stats["quotes_written"], 1)
+        self.assertEqual(stats["shards"][second]["quotes_written"], 1)
+        self.assertEqual(fetch_quotes(self.target, ["SBIN"], "2025-07-01", "2025-07-01")["ltp"].tolist(), [572.5])
+        self.assertEqual(merge_shards(self.target, [first, second])["quotes_written"], 0)
+
+        # Untyped rows leave the record alone; typed rows without one drop the stale record
+        legacy = create_legacy_shard(self.path("legacy.db"), [("SBIN", "2025-07-01 10:00:00", "50/50")])
+        self.assertEqual(merge_shards(self.target, [legacy])["quotes_written"], 0)
+        self.assertEqual(len(fetch_quotes(self.target, ["SBIN"], "2025-07-01", "2025-07-01")), 1)
+        plain = create_shard(self.path("plain.db"), [("SBIN", "2025-07-01 10:00:00", 100, 100)])
+        self.assertEqual(merge_shards(self.target, [plain])["quotes_written"], 1)
+        self.assertTrue(fetch_quotes(self.target, ["SBIN"], "2025-07-01", "2025-07-01").empty)
+
+    def rollups(self, table, symbol):
+        conn = sqlite3.connect(self.target)
+        try:
+            return conn.execute(f"SELECT * FROM {table} WHERE symbol = ? ORDER BY 2, 3", (symbol,)).fetchall()
+        finally:
+            conn.close()
+
+    def test_merging_into_a_compacted_day_keeps_its_rollups(self):
+        day = [("TCS", "2025-07-01 09:30:00", 100, 300), ("TCS", "2025-07-01 10:00:00", 200, 200),
+               ("TCS", "2025-07-01 12:00:00", 300, 100), ("TCS", "2025-07-01 15:30:00", 100, 100)]
+        before = create_shard(self.path("before.db"), day)
+        merge_shards(self.target, [before])
+        daily, hourly = self.rollups(DAILY_ROLLUP_TABLE, "TCS"), self.rollups(HOURLY_ROLLUP_TABLE, "TCS")
+        RetentionManager(self.target, keep_days=365, keep_intraday_days=7).run(today=date(2025, 7, 10))
+        self.assertEqual(self.snapshots(), [("TCS", 153000, 100, 100, 50.0, 50.0)])
+
+        stats = merge_shards(self.target, [create_shard(self.path("other.db"), [("INFY", "2025-07-01 10:00:00", 1, 3)])])
+        self.assertEqual(stats["rows_inserted"], 1)
+        self.assertEqual(self.rollups(DAILY_ROLLUP_TABLE, "TCS"), daily)
+        self.assertEqual(self.rollups(HOURLY_ROLLUP_TABLE, "TCS"), hourly)
+        self.assertEqual(self.rollups(DAILY_ROLLUP_TABLE, "INFY")[0][2], 1)
+
+        # Rows retention compacted away are not brought back, and a later row of the kept hour adds to it
+        again = merge_shards(self.target, [before])
+        self.assertEqual((again["rows_inserted"], again["rows_updated"], again["rows_compacted"]), (0, 0, 3))
+        self.assertEqual(self.rollups(DAILY_ROLLUP_TABLE, "TCS"), daily)
+        merge_shards(self.target, [create_shard(self.path("late.db"), [("TCS", "2025-07-01 15:45:00", 300, 100)])])
+        self.assertEqual(self.rollups(DAILY_ROLLUP_TABLE, "TCS")[0][2], 5)
+        self.assertEqual(self.rollups(HOURLY_ROLLUP_TABLE, "TCS")[:3], hourly[:3])
+        self.assertEqual(self.rollups(HOURLY_ROLLUP_TABLE, "TCS")[3][3], 2)
+
+    def test_unreadable_shard_rolls_the_merge_back(self):
+        good = create_shard(self.path("good.db"), [("TCS", "2025-07-01 10:00:00", 100, 300)])
+        empty = self.path("empty.db")
+        sqlite3.connect(empty).close()
+        with self.assertRaises(Exception):
+            merge_shards(self.target, [good, empty])
+        self.assertEqual(self.snapshots(), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,258 @@
+import unittest
+import os
+import sys
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime
+import pandas as pd
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi import snapshotSchema
+from SmartApi.snapshotWriter import SnapshotWriter
+from SmartApi.snapshotQuery import (ReadConnectionPool, fetch_buy_sell_history, fetch_quotes, fetch_rollups,
+                                    buy_sell_percent_labels)
+from SmartApi.snapshotRetention import RetentionManager
+from SmartApi.historyStore import QUOTES, HistoryStore, history_store_available
+from SmartApi.quoteRecord import unpack_records
+
+def create_legacy_database(path, rows):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE market_data (symbol TEXT, date TEXT, buy_sell_volume_percent TEXT)")
+    conn.executemany("INSERT INTO market_data VALUES (?, ?, ?)", rows)
+    conn.commit()
+    conn.close()
+
+class TestSnapshotStore(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.directory, "market_data.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_snapshot_key(self):
+        self.assertEqual(snapshotSchema.snapshot_key("2025-07-01 15:29:46"), (20250701, 152946))
+        self.assertEqual(snapshotSchema.snapshot_key("2025-07-01"), (20250701, 0))
+        self.assertEqual(snapshotSchema.snapshot_key("2025-07-01T09:15:00"), (20250701, 91500))
+
+    def test_migration_keeps_rows_and_compatibility_view(self):
+        create_legacy_database(self.db_file, [
+            ("LT", "2025-07-01 15:29:46", "31/69"),
+            ("ITC", "2025-07-01 15:29:46", "36/64"),
+            ("LT", "2025-07-01 15:29:46", "33/67"),
+            ("BAD", "not a date", "1/2"),
+            ("SBIN", "2025-07-02 09:21:51", "0/0")
+        ])
+        stats = snapshotSchema.migrate(self.db_file, chunk_size=2)
+        self.assertEqual((stats["rows_read"], stats["rows_written"], stats["duplicates"], stats["rows_skipped"]),
+                         (5, 3, 1, 1))
+        self.assertEqual(snapshotSchema.migrate(self.db_file)["rows_read"], 0)
+
+        conn = sqlite3.connect(self.db_file)
+        self.assertEqual(snapshotSchema.schema_version(conn), snapshotSchema.SCHEMA_VERSION)
+        self.assertEqual(conn.execute("SELECT * FROM market_data ORDER BY symbol").fetchall(), [
+            ("ITC", "2025-07-01 15:29:46", "36/64"),
+            ("LT", "2025-07-01 15:29:46", "33/67"),
+            ("SBIN", "2025-07-02 09:21:51", "0/0")
+        ])
+        conn.execute("INSERT INTO market_data (symbol, date, buy_sell_volume_percent) VALUES ('TCS', '2025-07-02 10:00:00', '55/45')")
+        conn.commit()
+        self.assertEqual(conn.execute("SELECT trade_date, snapshot_time, buy_pct FROM market_snapshots WHERE symbol = 'TCS'").fetchone(),
+                         (20250702, 100000, 55.0))
+        conn.close()
+
+    def test_writer_batches_typed_rows(self):
+        create_legacy_database(self.db_file, [("LT", "2025-07-01 15:29:46", "31/69")])
+        with SnapshotWriter(self.db_file, batch_size=2) as writer:
+            writer.add("TCS", "2025-07-02 15:30:00", 300, 100)
+            writer.add("INFY", "2025-07-02 15:30:00", 0, 0)
+            writer.add("TCS", "2025-07-02 15:30:00", 100, 300)
+        self.assertEqual(writer.stats()["rows_written"], 3)
+        self.assertEqual(writer.stats()["batches_written"], 2)
+
+        conn = sqlite3.connect(self.db_file)
+        rows = conn.execute("SELECT symbol, buy_qty, sell_qty, buy_pct, sell_pct FROM market_snapshots ORDER BY symbol").fetchall()
+        self.assertEqual(rows, [("INFY", 0, 0, 0.0, 0.0), ("LT", None, None, 31.0, 69.0), ("TCS", 100, 300, 25.0, 75.0)])
+        conn.close()
+
+    def test_read_pool_never_creates_a_database(self):
+        with self.assertRaises(FileNotFoundError):
+            ReadConnectionPool(self.db_file)
+        self.assertFalse(os.path.exists(self.db_file))
+
+        create_legacy_database(self.db_file, [("LT", "2025-07-01 15:29:46", "31/69")])
+        pool = ReadConnectionPool(self.db_file)
+        with pool.connection() as conn:
+            self.assertEqual(snapshotSchema.schema_version(conn), snapshotSchema.SCHEMA_VERSION)
+            self.assertEqual(conn.execute("SELECT count(*) FROM market_snapshots").fetchone()[0], 1)
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM market_snapshots")
+        pool.close()
+
+    def test_history_of_a_legacy_database(self):
+        # Schema 0, as the market_data.db shipped with the dashboards
+        create_legacy_database(self.db_file, [
+            ("TCS", "2025-07-01 10:00:00", "25.0/75.0"),
+            ("TCS", "2025-07-01 15:29:46", "60.5/39.5"),
+            ("INFY", "2025-07-02", "50/50"),
+            ("INFY", "2025-07-03", "not a percentage"),
+        ])
+        history = fetch_buy_sell_history(self.db_file, ["tcs", "INFY"], "2025-07-01", "2025-07-03")
+        self.assertEqual(history.index.tolist(), [("INFY", pd.Timestamp("2025-07-02")),
+                                                  ("TCS", pd.Timestamp("2025-07-01"))])
+        self.assertEqual(history["buy_pct"].tolist(), [50.0, 60.5])
+        self.assertEqual(history["snapshot_time"].tolist(), [0, 152946])
+        self.assertTrue(history["buy_qty"].isna().all())
+        # Old readers of the table keep working through the compatibility view
+        conn = sqlite3.connect(self.db_file)
+        self.assertEqual(conn.execute("SELECT count(*) FROM market_data").fetchone()[0], 3)
+        conn.close()
+
+    def test_history_query_keeps_last_snapshot_per_day(self):
+        with SnapshotWriter(self.db_file) as writer:
+            writer.add("TCS", "2025-07-01 10:00:00", 100, 300)
+            writer.add("TCS", "2025-07-01 15:30:00", 300, 100)
+            writer.add("INFY", "2025-07-02 15:30:00", 50, 50)
+            writer.add("INFY", "2025-07-03 15:30:00", 50, 50)
+            writer.add("LT", "2025-07-01 15:30:00", 1, 1)
+        history = fetch_buy_sell_history(self.db_file, ["tcs", "INFY", "MISSING"], "2025-07-01", "2025-07-02")
+        self.assertEqual(list(history.index), [("INFY", datetime(2025, 7, 2)), ("TCS", datetime(2025, 7, 1))])
+        self.assertEqual(buy_sell_percent_labels(history).tolist(), ["50/50", "75/25"])
+        self.assertEqual(str(history["buy_qty"].dtype), "Int64")
+        every_snapshot = fetch_buy_sell_history(self.db_file, ["TCS"], "2025-07-01", "2025-07-01", latest_per_day=False)
+        self.assertEqual(every_snapshot["snapshot_time"].tolist(), [100000, 153000])
+
+    def test_rollups_follow_writes_and_match_raw_snapshots(self):
+        with SnapshotWriter(self.db_file, batch_size=2) as writer:
+            writer.add("TCS", "2025-07-01 09:15:00", 100, 300)
+            writer.add("TCS", "2025-07-01 09:45:00", 300, 100)
+            writer.add("TCS", "2025-07-01 10:15:00", 200, 200)
+            writer.add("TCS", "2025-07-02 10:15:00", 0, 0)
+            writer.add("TCS", "2025-07-01 09:45:00", 100, 100)
+        daily = fetch_rollups(self.db_file, ["TCS"], "2025-07-01", "2025-07-02")
+        self.assertEqual(daily.attrs["source"], "day")
+        day = daily.loc[("TCS", datetime(2025, 7, 1))]
+        self.assertEqual((day["samples"], day["mean_buy_pct"], day["min_buy_pct"], day["max_buy_pct"]), (3, 125 / 3.0, 25.0, 50.0))
+        self.assertEqual((day["last_buy_pct"], day["mean_book_buy_qty"], day["mean_book_sell_qty"]), (50.0, 400 / 3.0, 200.0))
+        self.assertTrue(day["volume"] is pd.NA)
+
+        raw = fetch_rollups(self.db_file, ["TCS"], "2025-07-01 00:00:00", "2025-07-02 23:59:58")
+        self.assertEqual(raw.attrs["source"], "snapshot")
+        self.assertTrue(raw.equals(daily))
+        hourly = fetch_rollups(self.db_file, ["TCS"], "2025-07-01 09:00:00", "2025-07-01 09:59:59", bucket="hour")
+        self.assertEqual(hourly.attrs["source"], "hour")
+        self.assertEqual(hourly["samples"].tolist(), [2])
+
+        conn = sqlite3.connect(self.db_file)
+        conn.execute("INSERT INTO market_data (symbol, date, buy_sell_volume_percent) VALUES ('TCS', '2025-07-02 15:00:00', '80/20')")
+        conn.commit()
+        conn.close()
+        history = fetch_buy_sell_history(self.db_file, ["TCS"], "2025-07-02", "2025-07-02")
+        self.assertEqual(buy_sell_percent_labels(history).tolist(), ["80/20"])
+
+    def test_rollup_volume_comes_from_cumulative_trade_volume(self):
+        def snapshot(writer, timestamp, trade_volume):
+            writer.add_quotes([{"tradingSymbol": "SBIN-EQ", "symbolToken": "3045", "tradeVolume": trade_volume,
+                                "totBuyQuan": 300, "totSellQuan": 100}], timestamp)
+
+        with SnapshotWriter(self.db_file) as writer:
+            snapshot(writer, "2025-07-01 09:15:00", 1000)
+            snapshot(writer, "2025-07-01 09:45:00", 1500)
+            snapshot(writer, "2025-07-01 10:15:00", 4000)
+            snapshot(writer, "2025-07-02 09:15:00", 700)
+        daily = fetch_rollups(self.db_file, ["SBIN"], "2025-07-01", "2025-07-02")
+        self.assertEqual(daily["volume"].tolist(), [4000, 700])
+        hourly = fetch_rollups(self.db_file, ["SBIN"], "2025-07-01 09:00:00", "2025-07-01 10:59:59", bucket="hour")
+        self.assertEqual(hourly.attrs["source"], "hour")
+        self.assertEqual(hourly["volume"].tolist(), [1500, 2500])
+        partial_hours = fetch_rollups(self.db_file, ["SBIN"], "2025-07-01 10:00:00", "2025-07-02 23:59:59")
+        self.assertEqual(partial_hours.attrs["source"], "hour")
+        self.assertEqual(partial_hours["volume"].tolist(), [2500, 700])
+        raw = fetch_rollups(self.db_file, ["SBIN"], "2025-07-01 09:30:00", "2025-07-01 10:30:00", bucket="hour")
+        self.assertEqual(raw.attrs["source"], "snapshot")
+        self.assertEqual(raw["volume"].tolist(), [500, 2500])
+
+    def test_migration_from_schema_4_keeps_rollups_and_adds_trade_volume(self):
+        with SnapshotWriter(self.db_file) as writer:
+            for timestamp, trade_volume in (("2025-06-02 09:15:00", 10), ("2025-06-02 12:15:00", 30)):
+                writer.add_quotes([{"tradingSymbol": "SBIN-EQ", "tradeVolume": trade_volume, "totBuyQuan": 300,
+                                    "totSellQuan": 100}], timestamp)
+        conn = sqlite3.connect(self.db_file)
+        # Back to the schema 4 layout, with the day compacted to its last snapshot
+        conn.execute("DROP TRIGGER market_data_insert")
+        for table in ("snapshot_rollup_hourly", "snapshot_rollup_daily"):
+            conn.execute(f"ALTER TABLE {table} DROP COLUMN last_trade_volume")
+            conn.execute(f"ALTER TABLE {table} RENAME COLUMN book_buy_qty_sum TO buy_qty_sum")
+            conn.execute(f"ALTER TABLE {table} RENAME COLUMN book_sell_qty_sum TO sell_qty_sum")
+        conn.execute("ALTER TABLE market_quotes DROP COLUMN trade_volume")
+        conn.execute("DELETE FROM market_snapshots WHERE snapshot_time = 91500")
+        conn.execute("DELETE FROM market_quotes WHERE snapshot_time = 91500")
+        conn.execute("PRAGMA user_version = 4")
+        conn.commit()
+        conn.close()
+
+        self.assertEqual(snapshotSchema.migrate(self.db_file)["from_version"], 4)
+        conn = sqlite3.connect(self.db_file)
+        self.assertEqual(conn.execute("SELECT trade_volume FROM market_quotes").fetchall(), [(30,)])
+        self.assertEqual(conn.execute("SELECT hour, samples, book_buy_qty_sum, last_trade_volume FROM snapshot_rollup_hourly "
+                                      "ORDER BY hour").fetchall(), [(9, 1, 300, None), (12, 1, 300, 30)])
+        self.assertEqual(conn.execute("SELECT samples, last_trade_volume FROM snapshot_rollup_daily").fetchall(), [(2, 30)])
+        conn.close()
+
+    def test_writer_keeps_full_quotes(self):
+        quote = {"tradingSymbol": "SBIN-EQ", "symbolToken": "3045", "ltp": 571.8, "avgPrice": "570.12", "tradeVolume": 1234567,
+                 "totBuyQuan": 300, "totSellQuan": 100, "exchFeedTime": "21-Mar-2024 12:34:56", "52WeekHigh": 629.55,
+                 "depth": {"buy": [{"price": 571.7, "quantity": 100, "orders": 2}], "sell": [{"price": 571.9, "quantity": 50, "orders": 1}]}}
+        with SnapshotWriter(self.db_file) as writer:
+            writer.add_quotes([quote, {"tradingSymbol": "INFY-EQ", "symbolToken": "1594"}], "2024-03-21 12:35:00")
+        quotes = fetch_quotes(self.db_file, ["SBIN", "INFY"], "2024-03-21", "2024-03-21")
+        sbin = quotes.loc[("SBIN", datetime(2024, 3, 21))]
+        self.assertEqual((sbin["token"], sbin["ltp"], sbin["avg_price"], sbin["trade_volume"]), (3045, 571.8, 570.12, 1234567))
+        self.assertEqual(sbin["exch_feed_time"], datetime(2024, 3, 21, 12, 34, 56))
+        self.assertAlmostEqual(sbin["spread"], 0.2)
+        self.assertAlmostEqual(sbin["depth_imbalance"], 50 / 150.0)
+        self.assertEqual(quotes.loc[("INFY", datetime(2024, 3, 21)), "bid_depth"], 0)
+        history = fetch_buy_sell_history(self.db_file, ["SBIN"], "2024-03-21", "2024-03-21")
+        self.assertEqual(buy_sell_percent_labels(history).tolist(), ["75/25"])
+
+    def test_retention_compacts_and_deletes_old_days(self):
+        with SnapshotWriter(self.db_file) as writer:
+            writer.add("TCS", "2025-06-01 15:30:00", 100, 100)
+            writer.add("TCS", "2025-07-01 10:00:00", 100, 300)
+            writer.add("TCS", "2025-07-01 15:30:00", 300, 100)
+            writer.add("TCS", "2025-07-09 10:00:00", 100, 300)
+            writer.add("TCS", "2025-07-09 15:30:00", 300, 100)
+        manager = RetentionManager(self.db_file, keep_days=30, keep_intraday_days=7)
+        stats = manager.run(today=datetime(2025, 7, 10).date())
+        self.assertEqual((stats["rows_deleted"], stats["rows_compacted"]), (1, 1))
+        self.assertEqual(manager.run(today=datetime(2025, 7, 10).date())["rows_compacted"], 0)
+
+        conn = sqlite3.connect(self.db_file)
+        self.assertEqual(conn.execute("SELECT trade_date, snapshot_time FROM market_snapshots ORDER BY trade_date, snapshot_time").fetchall(),
+                         [(20250701, 153000), (20250709, 100000), (20250709, 153000)])
+        conn.close()
+
+    @unittest.skipUnless(history_store_available(), "pyarrow is not installed")
+    def test_retention_archives_quotes_before_removing_them(self):
+        with SnapshotWriter(self.db_file) as writer:
+            for timestamp in ("2025-06-01 10:00:00", "2025-07-01 10:00:00", "2025-07-01 15:30:00"):
+                writer.add_quotes([{"tradingSymbol": "SBIN-EQ", "symbolToken": "3045", "ltp": 570.0,
+                                    "totBuyQuan": 300, "totSellQuan": 100}], timestamp)
+        archive_dir = os.path.join(self.directory, "archive")
+        stats = RetentionManager(self.db_file, keep_days=30, keep_intraday_days=7, archive_dir=archive_dir).run(
+            today=datetime(2025, 7, 10).date())
+        self.assertEqual((stats["rows_archived"], stats["quotes_archived"]), (3, 3))
+        self.assertEqual(fetch_quotes(self.db_file, ["SBIN"], "2025-06-01", "2025-07-31").index.tolist(),
+                         [("SBIN", datetime(2025, 7, 1))])
+
+        archived = HistoryStore(archive_dir).read(QUOTES)
+        self.assertEqual(list(zip(archived["trade_date"], archived["snapshot_time"])),
+                         [(20250601, 100000), (20250701, 100000), (20250701, 153000)])
+        records = unpack_records(archived["record"].tolist())
+        self.assertEqual(records["ltp"].tolist(), [570.0] * 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi.streamRelay import StreamRelay, StreamRelayClient, packet_key
+from SmartApi.subscriptionRegistry import SubscriptionRegistry
+
+QUOTE = 2
+
+class FakeUpstream(object):
+    """
+    The parts of SmartWebSocketV2 the relay uses, recording what it sends upstream
+    """
+
+    SUBSCRIBE_ACTION = 1
+    UNSUBSCRIBE_ACTION = 0
+
+    class _Connection(object):
+        class _Socket(object):
+            connected = True
+
+        sock = _Socket()
+
+    def __init__(self, connected=True):
+        self.subscriptions = SubscriptionRegistry()
+        self.wsapp = self._Connection() if connected else None
+        self.requests = []
+        self.fail = False
+        self.RESUBSCRIBE_FLAG = False
+        self.decoded = []
+
+    def _on_data(self, wsapp, data, data_type, continue_flag):
+        self.decoded.append(data)
+
+    def subscribe(self, correlation_id, mode, token_list):
+        if self.fail:
+            raise ConnectionError("send failed")
+        self.requests.append(("subscribe", mode, token_list))
+        self.subscriptions.add(mode, token_list)
+
+    def unsubscribe(self, correlation_id, mode, token_list):
+        self.requests.append(("unsubscribe", mode, token_list))
+        self.subscriptions.remove(mode, token_list)
+
+    def close_connection(self):
+        pass
+
+class FakeClient(object):
+    def __init__(self, client_id, accept=True):
+        self.client_id = client_id
+        self.keys = set()
+        self.packets = []
+        self.accept = accept
+        self.closed = False
+        self.packets_sent = 0
+        self.packets_conflated = 0
+
+    def enqueue(self, key, packet):
+        if self.accept:
+            self.packets.append(packet)
+        return self.accept
+
+    def close(self):
+        self.closed = True
+
+def keys(*tokens, mode=QUOTE, exchange_type=1):
+    return set(packet_key(mode, exchange_type, token) for token in tokens)
+
+def packet(token, mode=QUOTE, exchange_type=1):
+    return packet_key(mode, exchange_type, token) + b"\x00" * 16
+
+class TestStreamRelay(unittest.TestCase):
+    def setUp(self):
+        self.upstream = FakeUpstream()
+        self.relay = StreamRelay(self.upstream, ("127.0.0.1", 0))
+
+    def client(self, client_id, accept=True):
+        client = FakeClient(client_id, accept)
+        self.relay._clients.add(client)
+        return client
+
+    def test_a_token_is_subscribed_upstream_once_for_all_clients(self):
+        first, second = self.client(1), self.client(2)
+        self.relay.subscribe(first, keys("3045", "1594"))
+        self.relay.subscribe(second, keys("3045"))
+        self.relay.subscribe(second, keys("3045"))
+        self.assertEqual(len(self.upstream.requests), 1)
+        action, mode, token_list = self.upstream.requests[0]
+        self.assertEqual((action, mode, sorted(token_list[0]["tokens"])), ("subscribe", QUOTE, ["1594", "3045"]))
+        self.assertEqual(self.relay.stats()["client_subscriptions"], 3)
+
+        # Released upstream only when the last client leaves
+        self.relay.unsubscribe(first, keys("3045"))
+        self.assertEqual(len(self.upstream.requests), 1)
+        self.relay.unsubscribe(second, keys("3045"))
+        self.assertEqual(self.upstream.requests[-1], ("unsubscribe", QUOTE, [{"exchangeType": 1, "tokens": ["3045"]}]))
+        # Tokens a client never subscribed are ignored
+        self.relay.unsubscribe(second, keys("1594"))
+        self.assertEqual(len(self.upstream.requests), 2)
+        self.assertEqual(self.upstream.subscriptions.snapshot(), {QUOTE: {1: ["1594"]}})
+
+    def test_modes_are_counted_separately(self):
+        first, second = self.client(1), self.client(2)
+        self.relay.subscribe(first, keys("3045"))
+        self.relay.subscribe(second, keys("3045", mode=1))
+        self.assertEqual([request[1] for request in self.upstream.requests], [QUOTE, 1])
+        self.relay.unsubscribe(first, keys("3045"))
+        self.assertEqual(self.upstream.subscriptions.snapshot(), {1: {1: ["3045"]}})
+
+    def test_removing_a_client_releases_its_subscriptions(self):
+        first, second = self.client(1), self.client(2)
+        self.relay.subscribe(first, keys("3045", "1594"))
+        self.relay.subscribe(second, keys("1594"))
+        self.relay.remove_client(first)
+        self.assertTrue(first.closed)
+        self.assertEqual(self.upstream.subscriptions.snapshot(), {QUOTE: {1: ["1594"]}})
+        self.assertEqual(self.relay.stats()["subscriptions"], 1)
+        self.relay.remove_client(first)
+        self.assertEqual(len(self.upstream.requests), 2)
+
+    def test_packets_go_only_to_subscribed_clients(self):
+        first, second = self.client(1), self.client(2)
+        self.relay.subscribe(first, keys("3045"))
+        self.relay.subscribe(second, keys("3045", "1594"))
+        for token in ("3045", "1594", "999"):
+            self.relay.publish(packet(token))
+        self.assertEqual(len(first.packets), 1)
+        self.assertEqual(len(second.packets), 2)
+        self.assertEqual((self.relay.packets_in, self.relay.packets_routed), (3, 3))
+
+        # A client that cannot keep up is dropped and its tokens released
+        lagging = self.client(3, accept=False)
+        self.relay.subscribe(lagging, keys("777"))
+        self.relay.publish(packet("777"))
+        self.assertTrue(lagging.closed)
+        self.assertEqual(self.upstream.requests[-1][0], "unsubscribe")
+
+    def test_upstream_relays_without_decoding(self):
+        client = self.client(1)
+        self.relay.subscribe(client, keys("3045"))
+        self.upstream._on_data(None, packet("3045"), 2, True)
+        self.upstream._on_data(None, "text", 1, True)
+        self.assertEqual((len(client.packets), self.upstream.decoded), (1, ["text"]))
+
+    def test_new_tokens_go_to_the_least_loaded_upstream(self):
+        upstreams = [FakeUpstream(), FakeUpstream(connected=False)]
+        relay = StreamRelay(upstreams, ("127.0.0.1", 0))
+        relay.MAX_TOKENS_PER_CONNECTION = 2
+        client = FakeClient(1)
+        relay._clients.add(client)
+        relay.subscribe(client, keys("1", "2", "3"))
+        self.assertEqual(relay.stats()["upstream_tokens"], [2, 1])
+        # Not connected yet: registered for the upstream to replay when it opens
+        self.assertEqual(upstreams[1].requests, [])
+        self.assertTrue(upstreams[1].RESUBSCRIBE_FLAG)
+        relay.subscribe(client, keys("4"))
+        with self.assertRaises(Exception):
+            relay.subscribe(client, keys("5"))
+        self.assertEqual(relay.handle_request(client, {"action": 1, "params": {
+            "mode": QUOTE, "tokenList": [{"exchangeType": 1, "tokens": ["6"]}]}})["status"], False)
+
+    def test_failed_upstream_subscribe_is_rolled_back(self):
+        upstreams = [FakeUpstream(), FakeUpstream()]
+        relay = StreamRelay(upstreams, ("127.0.0.1", 0))
+        client = FakeClient(1)
+        relay._clients.add(client)
+        upstreams[1].fail = True
+        with self.assertRaises(ConnectionError):
+            relay.subscribe(client, keys("1", "2", "3", "4"))
+        # The upstream that accepted its half released it again
+        self.assertEqual([request[0] for request in upstreams[0].requests], ["subscribe", "unsubscribe"])
+        self.assertEqual([upstream.subscriptions.count() for upstream in upstreams], [0, 0])
+        self.assertEqual((relay._owners, relay._subscribers, client.keys), ({}, {}, set()))
+
+        upstreams[1].fail = False
+        relay.subscribe(client, keys("1", "2", "3", "4"))
+        self.assertEqual(relay.stats()["upstream_tokens"], [2, 2])
+        self.assertEqual(len(relay._owners), 4)
+
+class TestStreamRelaySocket(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.upstream = FakeUpstream()
+        self.relay = StreamRelay(self.upstream, os.path.join(self.directory, "relay.sock"))
+        self.relay.start(connect_upstreams=False)
+
+    def tearDown(self):
+        self.relay.stop()
+        shutil.rmtree(self.directory)
+
+    def test_client_subscribes_and_receives_packets(self):
+        client = StreamRelayClient(self.relay.address, timeout=5)
+        try:
+            client.subscribe(QUOTE, [{"exchangeType": 1, "tokens": ["3045"]}], correlation_id="abc")
+            self.assertEqual(client.receive(), ("control", {"status": True, "action": 1, "correlationID": "abc"}))
+            self.relay.publish(packet("1594"))
+            self.relay.publish(packet("3045"))
+            self.assertEqual(client.receive(), ("packet", packet("3045")))
+            client.unsubscribe(QUOTE, [{"exchangeType": 1, "tokens": ["3045"]}])
+            self.assertEqual(client.receive()[1]["status"], True)
+            self.assertEqual(self.upstream.subscriptions.count(), 0)
+        finally:
+            client.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,43 @@
+import unittest
+import os
+import sys
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi.subscriptionRegistry import SubscriptionRegistry
+
+class TestSubscriptionRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = SubscriptionRegistry(max_tokens_per_request=3)
+
+    def test_add_returns_only_new_tokens(self):
+        added = self.registry.add(1, [{"exchangeType": 1, "tokens": ["26009", "1594"]}])
+        self.assertEqual(added, [{"exchangeType": 1, "tokens": ["26009", "1594"]}])
+        added = self.registry.add(1, [{"exchangeType": 1, "tokens": ["1594", "3045"]}])
+        self.assertEqual(added, [{"exchangeType": 1, "tokens": ["3045"]}])
+        self.assertEqual(self.registry.count(1), 3)
+
+    def test_remove_keeps_registry_consistent(self):
+        self.registry.add(2, [{"exchangeType": 1, "tokens": ["26009"]}, {"exchangeType": 2, "tokens": ["35001"]}])
+        removed = self.registry.remove(2, [{"exchangeType": 2, "tokens": ["35001", "99999"]}])
+        self.assertEqual(removed, [{"exchangeType": 2, "tokens": ["35001"]}])
+        self.assertEqual(self.registry.snapshot(), {2: {1: ["26009"]}})
+        self.assertEqual(self.registry.remove(3, [{"exchangeType": 1, "tokens": ["26009"]}]), [])
+
+    def test_chunk_respects_limit(self):
+        token_list = [{"exchangeType": 1, "tokens": ["1", "2"]}, {"exchangeType": 2, "tokens": ["3", "4", "5", "6"]}]
+        chunks = self.registry.chunk(token_list)
+        self.assertEqual(len(chunks), 2)
+        for chunk in chunks:
+            self.assertLessEqual(sum(len(entry["tokens"]) for entry in chunk), 3)
+        flattened = [(entry["exchangeType"], t) for chunk in chunks for entry in chunk for t in entry["tokens"]]
+        self.assertEqual(flattened, [(1, "1"), (1, "2"), (2, "3"), (2, "4"), (2, "5"), (2, "6")])
+
+    def test_registries_are_independent(self):
+        other = SubscriptionRegistry()
+        self.registry.add(1, [{"exchangeType": 1, "tokens": ["26009"]}])
+        self.assertEqual(other.snapshot(), {})
+
+if __name__ == '__main__':
+    unittest.main()
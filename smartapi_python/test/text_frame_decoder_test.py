@@ -0,0 +1,83 @@
+import unittest
+import os
+import sys
+import json
+import zlib
+import base64
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi.textFrameDecoder import TextFrameDecoder
+
+def legacy_decode(message):
+    # SmartWebSocket._parse_text_message before the single pass decoder
+    data = base64.b64decode(message)
+    try:
+        data = bytes((zlib.decompress(data)).decode("utf-8"), 'utf-8')
+        data = json.loads(data.decode('utf8').replace("'", '"'))
+        data = json.loads(json.dumps(data, indent=4, sort_keys=True))
+    except ValueError:
+        return
+    return data
+
+def frame_of(data, single_quotes=True):
+    text = json.dumps(data, ensure_ascii=False)
+    if single_quotes:
+        text = text.replace('"', "'")
+    return base64.b64encode(zlib.compress(text.encode("utf-8")))
+
+RECORDS = [
+    {"name": "sf", "tk": "3045", "e": "nse_cm", "ltp": "500.05", "v": "100000", "bp": "499.95",
+     "ltt": "19/10/2026 10:15:00", "nc": "-0.52"},
+    {"name": "sf", "tk": "26009", "e": "nse_cm", "ltp": "44210.35", "v": "0", "to": "1.5e7"},
+    {"name": "cn", "msg": "cn"},
+]
+
+class TestTextFrameDecoder(unittest.TestCase):
+    def test_matches_the_legacy_path(self):
+        decoder = TextFrameDecoder()
+        frames = [
+            frame_of(RECORDS),
+            frame_of(RECORDS, single_quotes=False),
+            frame_of(RECORDS[:1]),
+            frame_of([{"name": "ak", "msg": "Übertragung ₹"}]),
+            frame_of([{"tk": str(3045 + i), "ltp": "%.2f" % (500 + i * 0.05)} for i in range(500)]),
+        ]
+        for frame in frames:
+            self.assertEqual(decoder.decode(frame), legacy_decode(frame))
+            # Also a str payload, as the websocket client may hand over
+            self.assertEqual(decoder.decode(frame.decode("ascii")), legacy_decode(frame))
+
+    def test_a_single_object_is_passed_on_as_it_is(self):
+        decoder = TextFrameDecoder()
+        frame = frame_of(RECORDS[2])
+        self.assertEqual(decoder.decode(frame), legacy_decode(frame))
+        self.assertEqual(decoder.decode(frame_of({})), {})
+        self.assertEqual((decoder.stats()["frames"], decoder.stats()["records"]), (2, 2))
+
+    def test_frames_are_decoded_independently(self):
+        # Each frame is its own zlib stream; a bad frame in between must not affect the next one
+        decoder = TextFrameDecoder()
+        first, second = frame_of(RECORDS[:1]), frame_of(RECORDS[1:])
+        self.assertEqual(decoder.decode(first), RECORDS[:1])
+        self.assertIsNone(decoder.decode(base64.b64encode(zlib.compress(b"[1, 2")[:-4])))
+        self.assertEqual(decoder.decode(second), RECORDS[1:])
+        self.assertEqual(decoder.decode(first), RECORDS[:1])
+
+    def test_invalid_frames_are_counted(self):
+        decoder = TextFrameDecoder()
+        self.assertIsNone(decoder.decode(b"not base64!"))
+        self.assertIsNone(decoder.decode(base64.b64encode(b"not zlib")))
+        self.assertIsNone(decoder.decode(base64.b64encode(zlib.compress(b"{'tk': "))))
+        self.assertIsNone(decoder.decode(base64.b64encode(zlib.compress(b"null"))))
+        self.assertEqual(decoder.decode(frame_of([])), [])
+        frame = frame_of(RECORDS)
+        decoder.decode(frame)
+        stats = decoder.stats()
+        self.assertEqual((stats["errors"], stats["frames"], stats["records"]), (3, 2, 3))
+        self.assertEqual(stats["compressed_bytes"], len(frame_of([])) + len(frame))
+        self.assertGreater(stats["records_per_second"], 0)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+import os
+import sys
+import struct
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi import tickDecoder
+
+def frame_of(*packets):
+    parts = [struct.pack(">H", len(packets))]
+    for packet in packets:
+        parts.append(struct.pack(">H", len(packet)))
+        parts.append(packet)
+    return b"".join(parts)
+
+class TestTickDecoder(unittest.TestCase):
+    def test_split_packets_offsets(self):
+        frame = frame_of(b"\x00" * 8, b"\x00" * 44)
+        self.assertEqual(tickDecoder.split_packets(frame), [(4, 12), (14, 58)])
+        self.assertEqual(tickDecoder.split_packets(b"\x00"), [])
+
+    def test_ltp_and_quote_packets(self):
+        token = 408065 << 8 | 1
+        ltp = tickDecoder.LTP_PACKET.pack(token, 123450)
+        quote = tickDecoder.QUOTE_PACKET.pack(token, 123450, 5, 123000, 9000, 10, 20, 120000, 125000, 119000, 122000)
+        ticks = tickDecoder.decode_frame(frame_of(ltp, quote))
+        self.assertEqual(len(ticks), 2)
+        self.assertEqual(ticks[0], {"tradable": True, "mode": "ltp", "instrument_token": token, "last_price": 1234.5})
+        self.assertEqual(ticks[1]["mode"], "quote")
+        self.assertEqual(ticks[1]["ohlc"], {"open": 1200.0, "high": 1250.0, "low": 1190.0, "close": 1220.0})
+        self.assertEqual(ticks[1]["volume_traded"], 9000)
+
+    def test_full_packet_depth(self):
+        token = 1234 << 8 | 3
+        depth = []
+        for i in range(10):
+            depth.extend([100 + i, 7500000 + i, i])
+        full = tickDecoder.FULL_PACKET.pack(token, 7500000, 1, 7500000, 10, 1, 1, 1, 1, 1, 7400000,
+                                            1700000000, 50, 60, 40, 1700000001, *depth)
+        tick = tickDecoder.decode_frame(frame_of(full))[0]
+        self.assertEqual(tick["mode"], "full")
+        self.assertEqual(tick["oi"], 50)
+        self.assertEqual(len(tick["depth"]["buy"]), 5)
+        self.assertEqual(len(tick["depth"]["sell"]), 5)
+        self.assertEqual(tick["depth"]["sell"][0], {"quantity": 105, "price": 0.7500005, "orders": 5})
+        self.assertAlmostEqual(tick["last_price"], 0.75)
+
+    def test_index_packet_is_not_tradable(self):
+        token = 256265 << 8 | 9
+        index = tickDecoder.INDEX_QUOTE_PACKET.pack(token, 2000000, 2010000, 1990000, 1995000, 1990000, 500)
+        tick = tickDecoder.decode_frame(frame_of(index))[0]
+        self.assertFalse(tick["tradable"])
+        self.assertEqual(tick["last_price"], 20000.0)
+
+if __name__ == '__main__':
+    unittest.main()
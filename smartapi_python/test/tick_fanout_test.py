@@ -0,0 +1,121 @@
+import unittest
+import os
+import sys
+import uuid
+
+root_directory = os.path.abspath(os.path.join(os.path.dirname(__file__), os.pardir))
+sys.path.append(root_directory)
+
+from SmartApi.tickFanout import TickRingReader, TickRingWriter
+
+def tick(token, price, exchange_type=1):
+    return {"subscription_mode": 2, "exchange_type": exchange_type, "token": token, "sequence_number": price,
+            "last_traded_price": price, "total_buy_quantity": 1.5}
+
+class TestTickFanout(unittest.TestCase):
+    def setUp(self):
+        self.name = f"tick_ring_test_{uuid.uuid4().hex[:12]}"
+        self.writer = TickRingWriter(self.name, capacity=8, max_tokens=4)
+        self.readers = []
+
+    def tearDown(self):
+        for reader in self.readers:
+            reader.close()
+        self.writer.close()
+
+    def reader(self, **kwargs):
+        reader = TickRingReader(self.name, **kwargs)
+        self.readers.append(reader)
+        return reader
+
+    def publish(self, prices, token="3045"):
+        for price in prices:
+            self.writer.publish(tick(token, price), received_at_ns=price)
+
+    def read(self, reader, **kwargs):
+        views, position, lost = reader.poll(**kwargs)
+        prices = []
+        for view in views:
+            prices.extend(reader.copy_valid(view, position)["last_traded_price"].tolist())
+            position += len(view)
+        return prices, lost
+
+    def test_poll_returns_the_position_of_its_views(self):
+        self.publish(range(1, 4))
+        reader = self.reader()
+        self.publish([4, 5])
+        views, position, lost = reader.poll()
+        self.assertEqual((position, lost), (3, 0))
+        self.assertEqual(reader.copy_valid(views[0], position)["last_traded_price"].tolist(), [4, 5])
+        self.assertEqual(int(views[0]["received_at_ns"][0]), 4)
+
+    def test_poll_across_the_end_of_the_ring(self):
+        reader = self.reader(start_at_end=False, safety_margin=0)
+        self.publish(range(1, 6))
+        views, position, lost = reader.poll()
+        self.assertEqual(([len(view) for view in views], position, lost), ([5], 0, 0))
+        self.publish(range(6, 12))
+        views, position, lost = reader.poll()
+        # Positions 5-7 sit at the end of the ring, 8-10 wrapped to its start
+        self.assertEqual(([len(view) for view in views], position, lost), ([3, 3], 5, 0))
+        self.assertEqual(reader.copy_valid(views[1], position + 3)["seq"].tolist(), [9, 10, 11])
+        self.assertEqual(reader.copy_valid(views[1], position)["seq"].tolist(), [])
+        self.assertEqual(reader.poll(), ([], 11, 0))
+
+        self.publish(range(12, 16))
+        self.assertEqual(self.read(reader, max_records=3), ([12, 13, 14], 0))
+        self.assertEqual(reader.lag(), 1)
+        self.assertEqual(self.read(reader), ([15], 0))
+
+    def test_a_reader_that_falls_behind_skips_ahead(self):
+        reader = self.reader(start_at_end=False, safety_margin=2)
+        self.publish(range(1, 21))
+        prices, lost = self.read(reader)
+        # Only capacity - safety_margin records are kept for a late reader
+        self.assertEqual((prices, lost, reader.overruns), (list(range(15, 21)), 14, 14))
+        self.assertEqual(self.read(reader), ([], 0))
+
+    def test_copy_valid_drops_records_overwritten_while_held(self):
+        reader = self.reader(start_at_end=False, safety_margin=0)
+        self.publish(range(1, 7))
+        views, position, lost = reader.poll()
+        self.publish(range(7, 11))
+        # Positions 8 and 9 went to the first two slots of the view
+        self.assertEqual(reader.copy_valid(views[0], position)["last_traded_price"].tolist(), [3, 4, 5, 6])
+
+    def test_latest(self):
+        reader = self.reader()
+        self.publish([100, 101])
+        self.writer.publish(tick("35001", 7, exchange_type=2))
+        latest = reader.latest(1, "3045")
+        self.assertEqual((int(latest["last_traded_price"]), float(latest["total_buy_quantity"])), (101, 1.5))
+        self.assertEqual(int(reader.latest(2, b"35001")["last_traded_price"]), 7)
+        self.assertIsNone(reader.latest(2, "3045"))
+
+        # Tokens past max_tokens are still published but not indexed
+        for token in ("1", "2", "3"):
+            self.writer.publish(tick(token, 1))
+        self.assertIsNone(reader.latest(1, "3"))
+        # Once the token's last record is overwritten there is no latest record to return
+        self.publish(range(8), token="1")
+        self.assertIsNone(reader.latest(1, "3045"))
+        self.assertEqual(int(reader.latest(1, "1")["last_traded_price"]), 7)
+
+    def test_attach_publishes_ticks_before_passing_them_on(self):
+        class FakeWebSocket(object):
+            def __init__(self):
+                self.received = []
+
+            def on_data(self, wsapp, data):
+                self.received.append(data)
+
+        reader = self.reader()
+        sws = FakeWebSocket()
+        self.writer.attach(sws)
+        sws.on_data(None, tick("3045", 5))
+        sws.on_data(None, {"depth_book": None})
+        self.assertEqual(len(sws.received), 2)
+        self.assertEqual(self.read(reader), ([5], 0))
+
+if __name__ == '__main__':
+    unittest.main()